@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test pitch-preserving time-stretch and segment-aligned TTS tracks
+"""
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from scipy.io import wavfile
+
+from utils import tts_tools
+from utils.audio_tools import build_aligned_track, time_stretch
+from utils.tts_engine import TTSEngine
+
+SAMPLE_RATE = 24000
+
+
+def _tone(seconds, frequency=440.0):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (0.5 * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def _peak_frequency(pcm):
+    spectrum = np.abs(np.fft.rfft(pcm * np.hanning(len(pcm))))
+    return np.argmax(spectrum) * SAMPLE_RATE / len(pcm)
+
+
+def test_stretch_changes_length_not_pitch():
+    source = _tone(2.0)
+    for rate in (0.8, 1.25, 1.8):
+        stretched = time_stretch(source, rate)
+        assert len(stretched) == round(len(source) / rate)
+        assert abs(_peak_frequency(stretched) - 440) < 5, f"pitch moved at {rate}x"
+    print("✅ Duration changed, 440 Hz kept")
+
+
+def test_segments_placed_at_source_times():
+    speech = [(1.0, 2.0, _tone(1.5)), (3.0, 4.0, _tone(0.5))]
+    track = build_aligned_track(speech, SAMPLE_RATE, 5.0)
+
+    assert len(track) == 5 * SAMPLE_RATE
+    level = np.abs(track).reshape(-1, SAMPLE_RATE // 10).max(axis=1)
+    active = [round(i / 10, 1) for i in np.nonzero(level > 0.1)[0]]
+    first = [a for a in active if a < 3.0]
+    # The long first segment runs on into the gap instead of being squeezed into 1s
+    assert first[0] == 1.0 and first[-1] > 2.0
+    # The short second segment is slowed down only a little and never starts early
+    assert min(a for a in active if a >= 3.0) == 3.0 and max(active) < 4.0
+    print(f"✅ Speech active from {active[0]}s to {max(active)}s")
+
+
+class FixedLengthEngine(TTSEngine):
+    """Half a second of tone per text, no backend needed"""
+
+    def synthesize_segments(self, texts, settings, tone_style='default'):
+        return [_tone(0.5) for _ in texts]
+
+
+def test_audio_track_follows_segments():
+    output_path = os.path.join(tempfile.mkdtemp(), "speaking.mp4")
+    segments = [{'start': 0.5, 'end': 1.0, 'text': "你好"}, {'start': 2.0, 'end': 2.5, 'text': "再见"},
+                {'start': 2.6, 'end': 2.8, 'text': " "}]
+    original = tts_tools.get_tts_engine
+    tts_tools.get_tts_engine = lambda: FixedLengthEngine(sample_rate=SAMPLE_RATE)
+    try:
+        audio_path = tts_tools.create_chinese_audio_track("", 4.0, output_path, segments=segments)
+    finally:
+        tts_tools.get_tts_engine = original
+
+    sample_rate, track = wavfile.read(audio_path)
+    assert sample_rate == SAMPLE_RATE and len(track) == 4 * SAMPLE_RATE
+    assert not track[:SAMPLE_RATE // 2].any() and track[SAMPLE_RATE // 2:SAMPLE_RATE].any()
+    assert not track[int(1.1 * SAMPLE_RATE):2 * SAMPLE_RATE].any() and track[2 * SAMPLE_RATE:].any()
+    print(f"✅ Aligned track written: {audio_path}")
+
+
+if __name__ == "__main__":
+    test_stretch_changes_length_not_pitch()
+    test_segments_placed_at_source_times()
+    test_audio_track_follows_segments()
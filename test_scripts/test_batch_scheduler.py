@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Test batch input expansion and per-resource stage limits with stubbed pipelines
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.dirname(__file__))
+
+from utils import whisper_tools
+from utils.batch_tools import BatchScheduler, expand_inputs, tts_resource
+from utils.cache_tools import TranscriptCache
+from utils.pipeline import VideoPipeline
+from utils.video_tools import probe_media, run_ffmpeg
+from test_pipeline_resume import StubPipeline
+
+
+class SlowStubPipeline(StubPipeline):
+    """Stub pipeline that records how many jobs are transcribing at the same time"""
+
+    lock = threading.Lock()
+    transcribing = 0
+    max_transcribing = 0
+
+    def run_transcribe(self):
+        cls = SlowStubPipeline
+        with cls.lock:
+            cls.transcribing += 1
+            cls.max_transcribing = max(cls.max_transcribing, cls.transcribing)
+        time.sleep(0.05)
+        with cls.lock:
+            cls.transcribing -= 1
+        super().run_transcribe()
+
+    def run_translate(self):
+        if self.source.endswith("broken.mp4"):
+            raise RuntimeError("Ollama unreachable")
+        super().run_translate()
+
+
+def test_expand_inputs_from_folder_and_list():
+    folder = tempfile.mkdtemp()
+    for name in ("a.mp4", "b.mkv", "notes.md"):
+        open(os.path.join(folder, name), "w").close()
+    url_list = os.path.join(folder, "urls.txt")
+    with open(url_list, "w") as f:
+        f.write("# shorts\nhttps://www.youtube.com/shorts/abc\n\nhttps://www.youtube.com/shorts/abc\n")
+
+    sources = expand_inputs([folder, url_list])
+    assert sources == [os.path.join(folder, "a.mp4"), os.path.join(folder, "b.mkv"),
+                       "https://www.youtube.com/shorts/abc"]
+    print(f"✅ Expanded inputs: {sources}")
+
+
+def test_batch_limits_whisper_and_reports_failures():
+    output_dir = tempfile.mkdtemp()
+    sources = []
+    for name in ("one.mp4", "two.mp4", "three.mp4", "four.mp4", "broken.mp4"):
+        path = os.path.join(output_dir, name)
+        with open(path, "w") as f:
+            f.write(name)
+        sources.append(path)
+
+    def factory(source, **kwargs):
+        # Separate output folders so the stubs' fixed filenames don't collide
+        job_dir = os.path.join(output_dir, os.path.basename(source) + "_out")
+        os.makedirs(job_dir, exist_ok=True)
+        kwargs['output_dir'] = job_dir
+        return SlowStubPipeline(source, **kwargs)
+
+    scheduler = BatchScheduler(max_jobs=5, resource_limits={'whisper': 2}, pipeline_factory=factory,
+                               output_dir=output_dir)
+    results = scheduler.run(sources)
+
+    assert [r.source for r in results] == sources
+    assert [r.ok for r in results] == [True, True, True, True, False]
+    assert "Ollama unreachable" in results[-1].error
+    assert 1 <= SlowStubPipeline.max_transcribing <= 2
+    print(f"✅ Whisper concurrency capped at {SlowStubPipeline.max_transcribing}")
+
+
+def test_tts_scheduled_by_tone_backend():
+    """A TTS_BACKEND_<TONE> override decides whether TTS takes a network or a CPU slot"""
+    overrides = {'TTS_BACKEND_NEWS': 'espeak', 'TTS_BACKEND_SPORT': 'gtts'}
+    os.environ.update(overrides)
+    try:
+        assert tts_resource('news') == 'encode' and tts_resource('sport') == 'network'
+
+        output_dir = tempfile.mkdtemp()
+        source = os.path.join(output_dir, "video.mp4")
+        with open(source, "w") as f:
+            f.write("video")
+        limits = {}
+
+        def factory(source, stage_limits, **kwargs):
+            limits[kwargs['tone_style']] = stage_limits['tts']
+            return StubPipeline(source, **kwargs)
+
+        for tone in ('news', 'sport'):
+            scheduler = BatchScheduler(pipeline_factory=factory, output_dir=os.path.join(output_dir, tone),
+                                       tone_style=tone)
+            scheduler.run([source])
+            assert limits[tone] is scheduler.semaphores[tts_resource(tone)]
+    finally:
+        for name in overrides:
+            del os.environ[name]
+    print("✅ TTS slot follows the tone's backend")
+
+
+class SpeechStubPipeline(VideoPipeline):
+    """Real pipeline with Whisper and Ollama replaced by a fixed transcript"""
+
+    def run_transcribe(self):
+        self.segments = [{'start': 0.0, 'end': 1.5, 'text': "hello"}]
+        self.transcript = "hello"
+        self.segments_path = os.path.join(self.manifest.job_dir, "segments.json")
+        with open(self.segments_path, "w", encoding="utf-8") as f:
+            f.write('[{"start": 0.0, "end": 1.5, "text": "hello"}]')
+
+    def run_translate(self):
+        self.translated_segments = [{'start': 0.0, 'end': 1.5, 'text': "你好"}]
+        self.chinese_text = "你好"
+        self.text_path = os.path.join(self.output_dir, f"{self.video_title}.txt")
+        with open(self.text_path, "w", encoding="utf-8") as f:
+            f.write(self.chinese_text)
+
+
+def test_batch_mkv_input_gets_separate_outputs():
+    """A local .mkv keeps its SRT and subtitled MP4 apart, in both subtitle modes"""
+    output_dir = tempfile.mkdtemp()
+    source = os.path.join(output_dir, "clip.mkv")
+    run_ffmpeg(['-f', 'lavfi', '-i', 'testsrc=size=160x120:rate=25:duration=2',
+                '-f', 'lavfi', '-i', 'sine=frequency=440:duration=2', '-c:v', 'libx264', '-c:a', 'aac', source])
+    original_cache = whisper_tools._transcript_cache
+    whisper_tools._transcript_cache = TranscriptCache(os.path.join(output_dir, "cache"))
+    try:
+        for mode in ('soft', 'burn'):
+            mode_dir = os.path.join(output_dir, mode)
+            [result] = BatchScheduler(pipeline_factory=SpeechStubPipeline, output_dir=mode_dir, subtitle_mode=mode,
+                                      deliverables=('subtitled',)).run([source])
+            pipeline = result.pipeline
+            assert result.ok, result.error
+            assert pipeline.srt_path == os.path.join(mode_dir, "clip_zh.srt")
+            assert pipeline.subtitled_video_path == os.path.join(mode_dir, "clip_with_zh_subtitles.mp4")
+            with open(pipeline.srt_path, encoding="utf-8") as f:
+                assert "你好" in f.read()
+            assert probe_media(pipeline.subtitled_video_path)['video_codec'] == 'h264'
+    finally:
+        whisper_tools._transcript_cache = original_cache
+    print("✅ MKV source subtitled in soft and burn mode")
+
+
+if __name__ == "__main__":
+    test_expand_inputs_from_folder_and_list()
+    test_batch_limits_whisper_and_reports_failures()
+    test_tts_scheduled_by_tone_backend()
+    test_batch_mkv_input_gets_separate_outputs()
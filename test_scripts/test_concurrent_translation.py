@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Test concurrent chunk translation against a local fake Ollama server
+"""
+import os
+import sys
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.cache_tools import TranslationCache
+from utils.metrics_tools import RequestMetrics, TranslationMetrics
+from utils.translate_tools import (TranslationEngine, is_simplified_chinese, split_into_chunks, translate_segments,
+                                   translate_text)
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Answers /api/generate with a Chinese-tagged echo of the text to translate"""
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with server.lock:
+            server.requests += 1
+            if server.fail_first > 0:
+                server.fail_first -= 1
+                self.send_error(503, "busy")
+                return
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+
+        # Reverse the delays so later chunks finish first
+        text = body['prompt'].split("\n\n", 1)[1]
+        time.sleep(server.delay(text))
+
+        with server.lock:
+            server.in_flight -= 1
+
+        if text.startswith("["):
+            # Numbered segment batch: answer line by line, dropping any line listed in server.drop
+            lines = [line.split("] ", 1) for line in text.splitlines()]
+            response = "\n".join(f"{n}] 译文[{line}]" for n, line in lines if line not in server.drop)
+        else:
+            response = f"译文[{text}]"
+        reply = json.dumps({
+            "response": response,
+            "eval_count": 20,
+            "eval_duration": 100_000_000,
+            "prompt_eval_count": 40,
+            "prompt_eval_duration": 50_000_000,
+            "total_duration": 200_000_000,
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_ollama(delay=lambda text: 0.05):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.delay = delay
+    server.fail_first = 0
+    server.drop = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/generate"
+    return server, url
+
+
+def test_chunks_translated_concurrently_in_order():
+    """Chunks run in parallel up to the in-flight limit and come back in order"""
+    chunks = [f"Sentence number {i}." for i in range(8)]
+    server, url = start_fake_ollama(delay=lambda text: 0.2 - 0.02 * int(text.split()[2].rstrip('.')))
+    engine = TranslationEngine(url=url, max_in_flight=3)
+    try:
+        results = engine.translate_chunks(chunks)
+    finally:
+        engine.close()
+        server.shutdown()
+
+    assert results == [f"译文[{chunk}]" for chunk in chunks]
+    assert 1 < server.max_in_flight <= 3
+    print(f"✅ {len(chunks)} chunks translated in order, max {server.max_in_flight} in flight")
+
+
+def test_shared_engine_caps_requests_across_callers():
+    """Several batch jobs translating at once share the engine's in-flight limit"""
+    server, url = start_fake_ollama(delay=lambda text: 0.1)
+    engine = TranslationEngine(url=url, max_in_flight=2)
+    jobs = [[f"Job {j} sentence {i}." for i in range(3)] for j in range(3)]
+    try:
+        threads = [threading.Thread(target=engine.translate_chunks, args=(chunks,)) for chunks in jobs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        engine.close()
+        server.shutdown()
+
+    assert server.requests == 9 and server.max_in_flight == 2
+    print(f"✅ {len(jobs)} callers, max {server.max_in_flight} requests in flight")
+
+
+def test_long_text_split_and_reassembled():
+    """Long text is split on sentence boundaries and joined back in order"""
+    text = " ".join(f"This is sentence {i} of a long transcript." for i in range(80))
+    chunks = split_into_chunks(text)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    assert " ".join(chunks) == text
+
+    server, url = start_fake_ollama()
+    engine = TranslationEngine(url=url, max_in_flight=4)
+    try:
+        translated = engine.translate(text)
+    finally:
+        engine.close()
+        server.shutdown()
+
+    assert translated == " ".join(f"译文[{chunk}]" for chunk in chunks)
+    print(f"✅ {len(chunks)} chunks reassembled into {len(translated)} chars")
+
+
+def test_one_request_per_chunk_with_metrics():
+    """Each chunk costs exactly one generate call and its token counts are recorded"""
+    server, url = start_fake_ollama()
+    engine = TranslationEngine(url=url, max_in_flight=2)
+    try:
+        engine.translate_chunks(["First chunk.", "Second chunk."])
+    finally:
+        engine.close()
+        server.shutdown()
+
+    assert server.requests == 2
+    summary = engine.metrics.summary()
+    assert summary['requests'] == 2 and summary['failures'] == 0
+    assert summary['eval_tokens'] == 40
+    assert abs(summary['tokens_per_second'] - 200.0) < 1e-6
+    print(f"✅ Metrics: {summary}")
+
+
+def test_retries_are_counted():
+    """A transient HTTP error is retried and shows up in the metrics"""
+    server, url = start_fake_ollama()
+    server.fail_first = 1
+    engine = TranslationEngine(url=url, max_in_flight=1, retry_backoff=0.01)
+    try:
+        result = engine.translate_chunk("Retry me please.")
+    finally:
+        engine.close()
+        server.shutdown()
+
+    assert result == "译文[Retry me please.]"
+    assert server.requests == 2
+    assert engine.metrics.summary()['retries'] == 1
+    print("✅ Transient failure retried once")
+
+
+def test_metrics_history_bounded():
+    """Only recent requests are kept, but lifetime totals still count every request"""
+    metrics = TranslationMetrics(max_requests=5)
+    for n in range(20):
+        request = RequestMetrics(started_at=1000.0 + n, latency=0.5, success=n % 4 != 0, retries=1)
+        request.update_from_response({'eval_count': 10, 'eval_duration': 50_000_000})
+        metrics.record(request)
+
+    assert len(metrics.requests) == 5
+    summary = metrics.summary()
+    assert summary['requests'] == 20 and summary['failures'] == 5 and summary['retries'] == 20
+    assert summary['eval_tokens'] == 150 and abs(summary['tokens_per_second'] - 200.0) < 1e-6
+    assert abs(summary['wall_tokens_per_second'] - 150 / 19.5) < 1e-6
+    assert metrics.summary(since=1017.0)['requests'] == 3
+    metrics.reset()
+    assert metrics.summary()['requests'] == 0 and not metrics.requests
+    print(f"✅ {summary['requests']} requests summarised from 5 kept")
+
+
+def test_cache_skips_ollama_on_rerun():
+    """A rerun with the same cache translates without calling Ollama, and the cache stays bounded"""
+    cache_path = os.path.join(tempfile.mkdtemp(), "translations.sqlite3")
+    chunks = ["Welcome back to the channel.", "Don't forget to subscribe.", "Welcome back  to the channel."]
+    server, url = start_fake_ollama()
+    try:
+        engine = TranslationEngine(url=url, max_in_flight=1, cache=TranslationCache(cache_path))
+        first = engine.translate_chunks(chunks)
+        engine.close()
+        # Whitespace-only differences share a key, so only two requests were made
+        assert server.requests == 2
+
+        cache = TranslationCache(cache_path, max_entries=1)
+        engine = TranslationEngine(url=url, max_in_flight=2, cache=cache)
+        second = engine.translate_chunks(chunks[:2])
+        stats = cache.stats()
+        engine.close()
+    finally:
+        server.shutdown()
+
+    assert server.requests == 2
+    assert second == first[:2]
+    assert stats['hits'] == 2 and stats['misses'] == 0
+    print(f"✅ Rerun served from cache: {stats}")
+
+
+def test_segments_translated_in_batches_keep_timing():
+    """Segments go out in numbered batches and come back mapped to their own timing"""
+    segments = [{'start': float(i), 'end': i + 0.8, 'text': f"Line {i}."} for i in range(7)]
+    segments.append({'start': 7.0, 'end': 7.5, 'text': "  "})
+    server, url = start_fake_ollama()
+    server.drop = {"Line 4."}
+    engine = TranslationEngine(url=url, max_in_flight=3)
+    try:
+        translated = translate_segments(segments, engine=engine)
+        translations = engine.translate_segments(segments, batch_size=3)
+    finally:
+        engine.close()
+        server.shutdown()
+
+    assert [(s['start'], s['end']) for s in translated] == [(s['start'], s['end']) for s in segments]
+    assert [s['text'] for s in translated[:7]] == [f"译文[Line {i}.]" for i in range(7)]
+    assert translated[7]['text'] == ""
+    # The line missing from its batch reply is asked for on its own
+    assert sorted(translations) == list(range(7))
+    assert translations[4] == "译文[Line 4.]"
+    print(f"✅ {len(segments)} segments translated with timing kept")
+
+
+def test_simplified_chinese_source_skips_ollama():
+    """A Chinese source in Simplified characters is passed through; Traditional still goes to Ollama"""
+    assert is_simplified_chinese("这是简体中文，说得很清楚。") and not is_simplified_chinese("這是繁體中文，說得很清楚。")
+    assert not is_simplified_chinese("No Chinese here")
+    segments = [{'start': 0.0, 'end': 1.0, 'text': "大家好。"}, {'start': 1.0, 'end': 2.0, 'text': "欢迎收看。"}]
+    server, url = start_fake_ollama()
+    engine = TranslationEngine(url=url, max_in_flight=2)
+    try:
+        assert translate_segments(segments, engine=engine, source_language='zh') == segments
+        assert translate_text("大家好。欢迎收看。", engine=engine, source_language='zh') == "大家好。欢迎收看。"
+        assert server.requests == 0
+        translate_text("這是繁體中文。", engine=engine, source_language='zh')
+        assert server.requests == 1
+    finally:
+        engine.close()
+        server.shutdown()
+    print("✅ Simplified Chinese source skipped translation")
+
+
+if __name__ == "__main__":
+    test_chunks_translated_concurrently_in_order()
+    test_shared_engine_caps_requests_across_callers()
+    test_long_text_split_and_reassembled()
+    test_one_request_per_chunk_with_metrics()
+    test_retries_are_counted()
+    test_metrics_history_bounded()
+    test_cache_skips_ollama_on_rerun()
+    test_segments_translated_in_batches_keep_timing()
+    test_simplified_chinese_source_skips_ollama()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test that the output planner renders every deliverable from one encode and swaps audio by stream copy
+"""
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from utils.output_planner import plan_outputs, render_outputs
+from utils.subtitle_tools import create_subtitles
+from utils.tts_tools import mux_chinese_audio
+from utils.video_tools import probe_media, run_ffmpeg
+
+BASE_VIDEO = os.path.join(os.path.dirname(__file__), "test_base_video.mp4")
+
+
+def _make_inputs(output_dir):
+    dub_path = os.path.join(output_dir, "dub.wav")
+    run_ffmpeg(['-f', 'lavfi', '-i', 'sine=frequency=440:duration=4', dub_path])
+    srt_path = create_subtitles(BASE_VIDEO, "", output_dir, segments=[{'start': 0.0, 'end': 2.0, 'text': "你好"}],
+                                render_video=False)
+    return srt_path, dub_path
+
+
+def test_plan_encodes_only_burned_outputs():
+    targets = {'subtitled': 'a.mp4', 'dubbed': 'b.mp4', 'subtitled_dubbed': 'c.mp4'}
+    assert plan_outputs(targets, 'burn') == {'encode': ['subtitled', 'subtitled_dubbed'], 'copy': ['dubbed']}
+    assert plan_outputs(targets, 'soft') == {'encode': [], 'copy': ['subtitled', 'dubbed', 'subtitled_dubbed']}
+    print("✅ Only burned-in deliverables are encoded")
+
+
+def test_render_all_deliverables():
+    output_dir = tempfile.mkdtemp()
+    srt_path, dub_path = _make_inputs(output_dir)
+    targets = {d: os.path.join(output_dir, f"{d}.mp4") for d in ('subtitled', 'dubbed', 'subtitled_dubbed')}
+
+    written = render_outputs(BASE_VIDEO, targets, srt_path=srt_path, dub_audio_path=dub_path, subtitle_mode='burn')
+
+    assert written == targets
+    # The base video has no audio, so only the dubbed outputs carry a track
+    assert probe_media(targets['subtitled'])['audio_codec'] is None
+    for deliverable in ('dubbed', 'subtitled_dubbed'):
+        media = probe_media(targets[deliverable])
+        assert media['video_codec'] == 'h264' and media['audio_codec'] == 'aac'
+    print(f"✅ Rendered {sorted(written)}")
+
+
+def test_composite_dubbed_subtitles_alone():
+    """Without the subtitled video, the composite burn must not be muxed onto itself"""
+    output_dir = tempfile.mkdtemp()
+    srt_path, dub_path = _make_inputs(output_dir)
+    target = os.path.join(output_dir, "subtitled_dubbed.mp4")
+
+    written = render_outputs(BASE_VIDEO, {'subtitled_dubbed': target}, srt_path=srt_path, dub_audio_path=dub_path,
+                             subtitle_mode='burn', backend='composite')
+
+    assert written == {'subtitled_dubbed': target}
+    assert probe_media(target)['audio_codec'] == 'aac'
+    assert sorted(os.listdir(output_dir)) == sorted([os.path.basename(p) for p in (srt_path, dub_path, target)])
+    print("✅ Composite subtitled + dubbed video rendered on its own")
+
+
+def test_audio_swap_copies_video_bitstream():
+    output_dir = tempfile.mkdtemp()
+    _, dub_path = _make_inputs(output_dir)
+    output_path = os.path.join(output_dir, "dubbed.mp4")
+
+    assert mux_chinese_audio(BASE_VIDEO, dub_path, output_path) == output_path
+
+    def video_bitstream(path):
+        return run_ffmpeg(['-i', path, '-map', '0:v:0', '-c', 'copy', '-f', 'h264', '-'])
+    assert video_bitstream(output_path) == video_bitstream(BASE_VIDEO)
+    assert probe_media(output_path)['audio_codec'] == 'aac'
+    print("✅ Audio swapped without touching the video stream")
+
+
+def test_pcm_muxed_from_memory():
+    output_dir = tempfile.mkdtemp()
+    output_path = os.path.join(output_dir, "dubbed.mp4")
+    # 2s of tone for a longer video: the pipe is padded with silence to the video length
+    pcm = (0.5 * np.sin(2 * np.pi * 440 * np.arange(48000) / 24000)).astype(np.float32)
+
+    assert mux_chinese_audio(BASE_VIDEO, (pcm, 24000), output_path) == output_path
+    assert os.listdir(output_dir) == ["dubbed.mp4"]
+    media = probe_media(output_path)
+    assert media['video_codec'] == 'h264' and media['audio_codec'] == 'aac'
+    print("✅ PCM piped into the mux without an audio file")
+
+
+if __name__ == "__main__":
+    test_plan_encodes_only_burned_outputs()
+    test_render_all_deliverables()
+    test_composite_dubbed_subtitles_alone()
+    test_audio_swap_copies_video_bitstream()
+    test_pcm_muxed_from_memory()
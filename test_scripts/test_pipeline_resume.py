@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Test stage checkpointing and --resume in VideoPipeline using stubbed stages
+"""
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.pipeline import VideoPipeline
+
+
+class StubPipeline(VideoPipeline):
+    """Pipeline whose stages write small files instead of running the real tools"""
+
+    fail_stage = None
+
+    def __init__(self, source, output_dir, **kwargs):
+        super().__init__(source, output_dir=output_dir, **kwargs)
+        self.ran = []
+
+    def _write(self, name, content):
+        path = os.path.join(self.output_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def _stage(self, name):
+        self.ran.append(name)
+        if name == self.fail_stage:
+            raise RuntimeError(f"{name} crashed")
+
+    def run_download(self):
+        self._stage('download')
+        self.video_path = self.source
+
+    def run_extract(self):
+        self._stage('extract')
+        self.video_duration = 3.0
+        self.audio_pcm = [0.0] * 48000
+
+    def run_transcribe(self):
+        self._stage('transcribe')
+        self.segments = [{'start': 0.0, 'end': 3.0, 'text': 'hello'}]
+        self.transcript = "hello"
+        self.segments_path = self._write("segments.json", '[{"start": 0.0, "end": 3.0, "text": "hello"}]')
+
+    def run_translate(self):
+        self._stage('translate')
+        self.chinese_text = "你好"
+        self.text_path = self._write("video.txt", self.chinese_text)
+
+    def run_subtitles(self):
+        self._stage('subtitles')
+        self.srt_path = self._write("video_zh.srt", "1")
+
+    def run_tts(self):
+        self._stage('tts')
+        assert self.chinese_text == "你好" and self.video_duration == 3.0
+        self.chinese_audio_path = self._write("video_chinese_audio.wav", "zh")
+
+    def run_mux(self):
+        self._stage('mux')
+        assert self.srt_path and os.path.exists(self.srt_path)
+        if 'subtitled' in self.deliverables:
+            self.subtitled_video_path = self._write("video_with_zh_subtitles.mp4", "v")
+        if 'dubbed' in self.deliverables:
+            assert self.chinese_audio_path and os.path.exists(self.chinese_audio_path)
+            self.speaking_video_path = self._write(f"video_chinese_speaking_{self.tone_style}.mp4", "dub")
+        if 'subtitled_dubbed' in self.deliverables:
+            self.subtitled_speaking_video_path = self._write("video_chinese_speaking_with_zh_subtitles.mp4", "both")
+
+
+def _make_source(output_dir):
+    source = os.path.join(output_dir, "video.mp4")
+    with open(source, "w") as f:
+        f.write("video")
+    return source
+
+
+def test_resume_after_crash_skips_completed_stages():
+    """A crash in mux resumes straight at mux, reusing the kept TTS track"""
+    output_dir = tempfile.mkdtemp()
+    source = _make_source(output_dir)
+
+    first = StubPipeline(source, output_dir)
+    first.fail_stage = 'mux'
+    try:
+        first.run()
+        assert False, "mux should have failed"
+    except RuntimeError:
+        pass
+    assert first.ran == list(VideoPipeline.STAGES)
+
+    second = StubPipeline(source, output_dir, resume=True)
+    second.run()
+    assert second.ran == ['mux']
+    assert second.chinese_text == "你好" and second.transcript == "hello"
+    print(f"✅ Resumed run only ran: {second.ran}")
+
+
+def test_resume_after_success_runs_nothing():
+    """A deleted intermediate (the TTS track) does not force reruns"""
+    output_dir = tempfile.mkdtemp()
+    source = _make_source(output_dir)
+
+    StubPipeline(source, output_dir).run()
+    second = StubPipeline(source, output_dir, resume=True)
+    second.run()
+    assert second.ran == []
+    print("✅ Completed job fully skipped on resume")
+
+
+def test_changed_artifact_reruns_dependents():
+    """Editing the translation reruns subtitles, TTS and mux but not Whisper"""
+    output_dir = tempfile.mkdtemp()
+    source = _make_source(output_dir)
+
+    StubPipeline(source, output_dir).run()
+    os.remove(os.path.join(output_dir, "video.txt"))
+    second = StubPipeline(source, output_dir, resume=True)
+    second.run()
+    assert second.ran == ['translate', 'subtitles', 'tts', 'mux']
+    print(f"✅ Missing translation reran: {second.ran}")
+
+
+def test_subtitle_only_deliverable_skips_tts():
+    """Without a dubbed deliverable TTS never runs, and resume does not keep retrying it"""
+    output_dir = tempfile.mkdtemp()
+    source = _make_source(output_dir)
+
+    first = StubPipeline(source, output_dir, deliverables=('subtitled',))
+    first.run()
+    assert 'tts' not in first.ran and not first.failed_stages
+    assert first.subtitled_video_path and first.speaking_video_path is None
+
+    second = StubPipeline(source, output_dir, resume=True, deliverables=('subtitled',))
+    second.run()
+    assert second.ran == []
+    print("✅ Subtitle-only run skipped TTS")
+
+
+def test_changed_settings_rerun_affected_stages():
+    """A new tone redubs, a new subtitle mode redoes subtitles, a new deliverable remuxes
+
+    TTS reruns alongside any mux after a successful run, since that run deleted its track
+    """
+    output_dir = tempfile.mkdtemp()
+    source = _make_source(output_dir)
+
+    StubPipeline(source, output_dir).run()
+    second = StubPipeline(source, output_dir, resume=True, tone_style='news')
+    second.run()
+    assert second.ran == ['tts', 'mux']
+    assert second.speaking_video_path.endswith("_news.mp4")
+
+    third = StubPipeline(source, output_dir, resume=True, tone_style='news', subtitle_mode='soft')
+    third.run()
+    assert third.ran == ['subtitles', 'tts', 'mux']
+
+    fourth = StubPipeline(source, output_dir, resume=True, tone_style='news', subtitle_mode='soft',
+                          deliverables=('subtitled', 'dubbed', 'subtitled_dubbed'))
+    fourth.run()
+    assert fourth.ran == ['tts', 'mux'] and fourth.subtitled_speaking_video_path
+    print(f"✅ Changed settings reran: {second.ran}, {third.ran}, {fourth.ran}")
+
+
+if __name__ == "__main__":
+    test_resume_after_crash_skips_completed_stages()
+    test_resume_after_success_runs_nothing()
+    test_changed_artifact_reruns_dependents()
+    test_subtitle_only_deliverable_skips_tts()
+    test_changed_settings_rerun_affected_stages()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Test that Whisper segments flow into translation and TTS while transcription is still running
+"""
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from utils import tts_tools, whisper_tools
+from utils.cache_tools import TranscriptCache
+from utils.streaming_pipeline import growing_batches, ordered_map, stream_dubbing
+from utils.tts_engine import TTSBackend, TTSEngine
+
+SEGMENT_COUNT = 10
+SEGMENT_DELAY = 0.05
+
+
+class SlowModel:
+    """Stand-in Whisper model producing one segment every SEGMENT_DELAY seconds"""
+
+    def __init__(self):
+        self.finished_at = None
+
+    def detect_language(self, audio, **kwargs):
+        return "en", 0.9, []
+
+    def transcribe(self, audio, language=None, **kwargs):
+        def segments():
+            for n in range(SEGMENT_COUNT):
+                time.sleep(SEGMENT_DELAY)
+                yield SimpleNamespace(start=float(n), end=n + 0.8, text=f" line {n} ")
+            self.finished_at = time.perf_counter()
+        return segments(), SimpleNamespace(language="en")
+
+
+class EchoTranslator:
+    """Stand-in TranslationEngine answering every numbered batch at once"""
+
+    max_in_flight = 2
+
+    def __init__(self):
+        self.batches = []
+
+    def translate_segment_batch(self, batch):
+        self.batches.append([i for i, _ in batch])
+        time.sleep(0.01)
+        return {i: f"第{text.split()[-1]}句" for i, text in batch}
+
+    def translate_chunk(self, text):
+        return text
+
+
+class ToneBackend(TTSBackend):
+    name = 'tone'
+
+    def synthesize(self, text, settings, sample_rate):
+        return np.ones(len(text) * 10, dtype=np.float32)
+
+
+def test_ordered_map_yields_in_input_order():
+    delays = [0.05, 0.0, 0.03, 0.0]
+
+    def work(n):
+        time.sleep(delays[n])
+        return n
+    assert list(ordered_map(work, iter(range(4)), max_workers=4)) == [0, 1, 2, 3]
+
+    def fail(n):
+        raise ValueError(f"item {n}")
+    try:
+        list(ordered_map(fail, iter(range(2)), max_workers=2))
+        assert False, "worker errors should reach the consumer"
+    except ValueError:
+        pass
+    print("✅ Results kept input order and errors propagated")
+
+
+def test_batches_grow_from_one_segment():
+    segments = [{'text': "x"} for _ in range(20)]
+    sizes = [len(batch) for batch in growing_batches(segments, batch_size=6)]
+    assert sizes == [1, 2, 4, 6, 6, 1]
+    print(f"✅ Batch sizes: {sizes}")
+
+
+def _stream(model, translator, backend):
+    output_dir = tempfile.mkdtemp()
+    audio_path = os.path.join(output_dir, "audio.raw")
+    with open(audio_path, "wb") as f:
+        f.write(b"\0" * 64)
+
+    original_cache = whisper_tools._transcript_cache
+    whisper_tools._MODEL_CACHE[whisper_tools._model_key()] = model
+    whisper_tools._transcript_cache = TranscriptCache(os.path.join(output_dir, "cache"))
+    try:
+        first_at = None
+        results = []
+        for result in stream_dubbing(audio_path, audio=np.zeros(16000, dtype=np.float32),
+                                     translation_engine=translator,
+                                     tts_engine=TTSEngine(backend=backend, sample_rate=1000)):
+            first_at = first_at or time.perf_counter()
+            results.append(result)
+    finally:
+        whisper_tools.clear_whisper_models()
+        whisper_tools._transcript_cache = original_cache
+    return results, first_at
+
+
+def test_first_segment_ready_before_transcription_ends():
+    model = SlowModel()
+    translator = EchoTranslator()
+    results, first_at = _stream(model, translator, ToneBackend())
+
+    assert first_at < model.finished_at - SEGMENT_DELAY * 5
+    assert [segment['text'] for segment, _, _ in results] == [f"line {n}" for n in range(SEGMENT_COUNT)]
+    assert [translated['text'] for _, translated, _ in results] == [f"第{n}句" for n in range(SEGMENT_COUNT)]
+    assert all(translated['start'] == segment['start'] for segment, translated, _ in results)
+    assert all(len(pcm) == len(translated['text']) * 10 for _, translated, pcm in results)
+    assert translator.batches[0] == [0]
+    print(f"✅ First segment {model.finished_at - first_at:.2f}s before Whisper finished")
+
+
+class RateLimitedBackend(ToneBackend):
+    """Refuses the first request for one line, like a 429 from a TTS service"""
+
+    def __init__(self, refused):
+        self.refused = refused
+
+    def synthesize(self, text, settings, sample_rate):
+        if text in self.refused:
+            self.refused.discard(text)
+            raise RuntimeError("429 Too Many Requests")
+        return super().synthesize(text, settings, sample_rate)
+
+
+def test_failed_segment_spoken_again_after_streaming():
+    backend = RateLimitedBackend({"第3句"})
+    results, _ = _stream(SlowModel(), EchoTranslator(), backend)
+
+    # The transcript and every other segment's speech survive the failure
+    assert len(results) == SEGMENT_COUNT
+    assert results[3][2] is None and all(pcm is not None for n, (_, _, pcm) in enumerate(results) if n != 3)
+
+    speech = [(t['start'], t['end'], pcm) for _, t, pcm in results if pcm is not None]
+    original = tts_tools.get_tts_engine
+    tts_tools.get_tts_engine = lambda: TTSEngine(backend=backend, sample_rate=1000)
+    try:
+        track, sample_rate = tts_tools.synthesize_chinese_audio_track("", SEGMENT_COUNT, segments=[results[3][1]],
+                                                                      speech=speech)
+    finally:
+        tts_tools.get_tts_engine = original
+    assert sample_rate == 1000 and track[3000:3800].any()
+    print("✅ Rate-limited segment left for the TTS stage and spoken there")
+
+
+if __name__ == "__main__":
+    test_ordered_map_yields_in_input_order()
+    test_batches_grow_from_one_segment()
+    test_first_segment_ready_before_transcription_ends()
+    test_failed_segment_spoken_again_after_streaming()
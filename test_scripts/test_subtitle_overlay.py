@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test the in-place subtitle overlay, the streaming burn-in backend and soft subtitles
+"""
+import datetime
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import srt
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from utils import subtitle_tools
+from utils.subtitle_tools import SubtitleOverlay, burn_subtitles_overlay, create_subtitles, render_subtitle_bitmap
+from utils.video_tools import run_ffmpeg
+
+BASE_VIDEO = os.path.join(os.path.dirname(__file__), "test_base_video.mp4")
+
+
+def test_overlay_touches_only_active_cue_band():
+    width, height = 320, 240
+    overlay = SubtitleOverlay([(3.0, 6.0, "第二句"), (0.0, 3.0, "第一句")], width, height)
+    assert overlay.active_cue(0.0)[2] == "第一句"
+    assert overlay.active_cue(4.5)[2] == "第二句"
+    assert overlay.active_cue(6.0) is None
+
+    frame = np.full((height, width, 3), 40, dtype=np.uint8)
+    result = overlay.apply(frame, 1.0)
+    assert result is frame
+
+    # Rows above the band are untouched, the band matches a straight alpha blend
+    top = height * 2 // 3
+    assert (frame[:top] == 40).all()
+    bitmap = render_subtitle_bitmap("第一句", width).astype(np.float32)
+    rows = min(bitmap.shape[0], height - top)
+    alpha = bitmap[:rows, :, 3:4] / 255.0
+    expected = bitmap[:rows, :, :3] * alpha + 40 * (1.0 - alpha)
+    assert np.abs(frame[top:top + rows].astype(np.float32) - expected).max() <= 1.0
+
+    untouched = np.full((height, width, 3), 40, dtype=np.uint8)
+    overlay.apply(untouched, 7.0)
+    assert (untouched == 40).all()
+    print("✅ Overlay blends only the active cue's band")
+
+
+def _frame_at(path, seconds):
+    """Decode one RGB frame through an ffmpeg rawvideo pipe"""
+    width, height = ffmpeg_parse_infos(path)['video_size']
+    raw = run_ffmpeg(['-ss', str(seconds), '-i', path, '-frames:v', '1', '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-'])
+    return np.frombuffer(raw, dtype=np.uint8)[:width * height * 3].reshape(height, width, 3).astype(np.int16)
+
+
+def test_burn_subtitles_overlay():
+    output_path = os.path.join(tempfile.mkdtemp(), "burned.mp4")
+    subtitles = [srt.Subtitle(index=1, start=datetime.timedelta(seconds=0), end=datetime.timedelta(seconds=3),
+                              content="你好世界")]
+    burn_subtitles_overlay(BASE_VIDEO, subtitles, output_path)
+
+    # Compare against the source at the same timestamps; the re-encode adds only small differences
+    for seconds, burned in ((1.5, True), (5.0, False)):
+        source, result = _frame_at(BASE_VIDEO, seconds), _frame_at(output_path, seconds)
+        height, width = source.shape[:2]
+        top = height * 2 // 3
+        assert np.abs(result[:top] - source[:top]).mean() < 3
+
+        bitmap = render_subtitle_bitmap("你好世界", width).astype(np.float32)
+        rows = min(bitmap.shape[0], height - top)
+        alpha = bitmap[:rows, :, 3:4] / 255.0
+        expected = bitmap[:rows, :, :3] * alpha + source[top:top + rows] * (1.0 - alpha)
+        drawn = alpha[:, :, 0] > 0.5
+        assert drawn.any()
+        band = result[top:top + rows]
+        if burned:
+            # Where the text is drawn the frame follows the blend, not the source
+            assert np.abs(band - expected)[drawn].mean() < np.abs(source[top:top + rows] - expected)[drawn].mean() / 4
+        else:
+            assert np.abs(band - source[top:top + rows]).mean() < 3
+            assert np.abs(band - source[top:top + rows])[drawn].mean() < 10, f"band changed at {seconds}s"
+    print(f"✅ Burned subtitles into {output_path}")
+
+
+def test_soft_subtitles_add_track_without_reencode():
+    output_dir = tempfile.mkdtemp()
+    srt_path = create_subtitles(BASE_VIDEO, "你好世界。第二句", output_dir, mode="soft", extra_formats=("vtt",))
+    assert os.path.exists(srt_path.replace(".srt", ".vtt"))
+
+    output_path = os.path.join(output_dir, "test_base_video_with_zh_subtitles.mp4")
+    extracted = run_ffmpeg(['-i', output_path, '-map', '0:s:0', '-f', 'srt', '-']).decode('utf-8')
+    assert "你好世界" in extracted and "第二句" in extracted
+    print("✅ Soft subtitle track muxed by stream copy")
+
+
+def test_subtitles_follow_segment_timing():
+    output_dir = tempfile.mkdtemp()
+    segments = [{'start': 0.4, 'end': 2.1, 'text': "第一句"}, {'start': 2.1, 'end': 2.5, 'text': ""},
+                {'start': 5.25, 'end': 7.0, 'text': "第二句"}]
+    srt_path = create_subtitles(BASE_VIDEO, "", output_dir, mode="soft", segments=segments)
+    with open(srt_path, encoding="utf-8") as f:
+        cues = list(srt.parse(f.read()))
+    assert [(c.start.total_seconds(), c.end.total_seconds(), c.content) for c in cues] == \
+        [(0.4, 2.1, "第一句"), (5.25, 7.0, "第二句")]
+    print("✅ Cues follow Whisper segment timing")
+
+
+def test_bitmap_cache_follows_font():
+    """Changing the subtitle font must not reuse bitmaps drawn with the old one"""
+    from PIL import ImageFont
+
+    def load_font(font_size=32, font_paths=()):
+        # Two stand-in "font files": Pillow's bundled font at two sizes
+        path = font_paths[0] if font_paths else None
+        return ImageFont.load_default(20 if path == "small.ttf" else 40), path
+
+    original_loader, original_paths = subtitle_tools.load_subtitle_font, subtitle_tools.SUBTITLE_FONT_PATHS
+    subtitle_tools.load_subtitle_font = load_font
+    try:
+        subtitle_tools.SUBTITLE_FONT_PATHS = ("small.ttf",)
+        small = render_subtitle_bitmap("Font test", 320)
+        subtitle_tools.SUBTITLE_FONT_PATHS = ("large.ttf",)
+        large = render_subtitle_bitmap("Font test", 320)
+        assert render_subtitle_bitmap("Font test", 320, font_path="small.ttf") is small
+    finally:
+        subtitle_tools.load_subtitle_font, subtitle_tools.SUBTITLE_FONT_PATHS = original_loader, original_paths
+    assert (large[:, :, 3] > 0).sum() > (small[:, :, 3] > 0).sum()
+    print("✅ Bitmap cache keyed by font")
+
+
+if __name__ == "__main__":
+    test_overlay_touches_only_active_cue_band()
+    test_burn_subtitles_overlay()
+    test_soft_subtitles_add_track_without_reencode()
+    test_subtitles_follow_segment_timing()
+    test_bitmap_cache_follows_font()
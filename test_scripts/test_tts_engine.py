@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test chunked concurrent TTS, its audio cache and backend selection with an offline stand-in synthesiser
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from utils.cache_tools import TTSCache
+from utils import tts_engine
+from utils.tts_engine import (TTS_BACKENDS, TTS_CHUNK_PAUSE, EspeakBackend, TTSBackend, TTSEngine,
+                              benchmark_tts_backend, get_tts_backend, split_tts_chunks)
+from utils.tts_tools import get_tts_settings
+
+
+class StandInBackend(TTSBackend):
+    """Offline synthesiser: 10 ms of a constant level per character, so chunks are identifiable"""
+
+    name = 'stand-in'
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def synthesize(self, text, settings, sample_rate):
+        with self.lock:
+            self.calls.append(text)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        return np.full(len(text) * sample_rate // 100, len(text) / 100, dtype=np.float32)
+
+
+TEXT = "今天天气很好。我们去公园散步吧！" * 6 + "这是一个非常长的句子，" * 12 + "最后一句。"
+
+
+def test_split_at_sentence_boundaries():
+    chunks = split_tts_chunks(TEXT, max_chars=40)
+    assert "".join(chunks) == TEXT
+    assert all(0 < len(chunk) <= 40 for chunk in chunks)
+    # Short sentences are never cut in the middle
+    assert chunks[0].endswith(("。", "！"))
+    print(f"✅ Split {len(TEXT)} chars into {len(chunks)} chunks")
+
+
+def test_chunks_synthesised_concurrently_in_order():
+    backend = StandInBackend()
+    engine = TTSEngine(backend=backend, max_workers=3, sample_rate=1000, chunk_size=40)
+    pcm, sample_rate = engine.synthesize(TEXT, get_tts_settings('default'))
+
+    chunks = split_tts_chunks(TEXT, max_chars=40)
+    assert sorted(backend.calls) == sorted(chunks)
+    assert 1 < backend.max_in_flight <= 3
+    pause = int(TTS_CHUNK_PAUSE * sample_rate)
+    assert len(pcm) == sum(len(c) * 10 for c in chunks) + pause * (len(chunks) - 1)
+
+    # Each chunk's level sits where it belongs, separated by silence
+    position = 0
+    for chunk in chunks:
+        assert np.allclose(pcm[position:position + len(chunk) * 10], len(chunk) / 100)
+        position += len(chunk) * 10 + pause
+    print(f"✅ {len(chunks)} chunks joined in order, max {backend.max_in_flight} in flight")
+
+
+def test_cache_skips_backend_on_rerun():
+    cache = TTSCache(tempfile.mkdtemp())
+    settings = get_tts_settings('news')
+    first_backend = StandInBackend(delay=0)
+    first, _ = TTSEngine(backend=first_backend, cache=cache, sample_rate=1000).synthesize(TEXT, settings, 'news')
+
+    second_backend = StandInBackend(delay=0)
+    second, _ = TTSEngine(backend=second_backend, cache=cache, sample_rate=1000).synthesize(TEXT, settings, 'news')
+    assert second_backend.calls == []
+    assert np.array_equal(first, second)
+
+    # A different tone is a different voice, so it is not served from the cache
+    third_backend = StandInBackend(delay=0)
+    TTSEngine(backend=third_backend, cache=cache, sample_rate=1000).synthesize(TEXT, settings, 'sport')
+    assert third_backend.calls
+    print(f"✅ Rerun served from cache: {cache.stats()}")
+
+
+def test_profile_selects_backend():
+    TTS_BACKENDS['stand-in'] = StandInBackend
+    try:
+        os.environ['TTS_BACKEND_NEWS'] = 'stand-in'
+        settings = get_tts_settings('news')
+        assert settings['backend'] == 'stand-in'
+        assert get_tts_settings('sport')['backend'] != 'stand-in'
+
+        pcm, _ = TTSEngine(sample_rate=1000).synthesize("新闻联播。", settings, 'news')
+        assert len(pcm) == 50
+        assert get_tts_backend('stand-in').calls == ["新闻联播。"]
+    finally:
+        del os.environ['TTS_BACKEND_NEWS']
+        del TTS_BACKENDS['stand-in']
+        tts_engine._backend_instances.pop('stand-in', None)
+
+    try:
+        get_tts_backend('missing')
+        assert False, "unknown backend should be rejected"
+    except ValueError:
+        pass
+    print("✅ Tone profile picked the stand-in backend")
+
+
+class RecordingEspeakBackend(EspeakBackend):
+    """espeak backend that records its command-line parameters instead of running espeak-ng"""
+
+    def synthesize(self, text, settings, sample_rate):
+        self.calls = getattr(self, 'calls', []) + [self.cache_params(settings)]
+        return np.zeros(sample_rate // 10, dtype=np.float32)
+
+
+def test_cache_keyed_by_espeak_voice_and_rate():
+    cache = TTSCache(tempfile.mkdtemp())
+    settings = get_tts_settings('default')
+
+    def run(backend, settings):
+        TTSEngine(backend=backend, cache=cache, sample_rate=1000).synthesize("你好。", settings)
+        return getattr(backend, 'calls', [])
+
+    assert run(RecordingEspeakBackend(), settings)
+    assert run(RecordingEspeakBackend(), settings) == []
+    # Each of these produces different audio, so none may be served the cached chunk
+    assert run(RecordingEspeakBackend(voice='yue'), settings)
+    assert run(RecordingEspeakBackend(rate=120), settings)
+    assert run(RecordingEspeakBackend(), {**settings, 'espeak_voice': 'en'})[0]['voice'] == 'en'
+    assert run(RecordingEspeakBackend(), {**settings, 'slow': not settings.get('slow')})
+    print(f"✅ espeak voice, rate and slow flag kept apart in the cache: {cache.stats()}")
+
+
+def test_espeak_backend_synthesises():
+    backend = EspeakBackend()
+    if not backend.binary:
+        print("⏭️  espeak-ng not installed, skipping")
+        return
+    pcm = backend.synthesize("你好，世界。", get_tts_settings('default'), 16000)
+    assert pcm.dtype == np.float32 and len(pcm) > 16000 // 4
+    assert np.abs(pcm).max() > 0.01
+    print(f"✅ espeak-ng produced {len(pcm) / 16000:.2f}s of audio")
+
+
+def test_benchmark_reports_real_time_factor():
+    result = benchmark_tts_backend(StandInBackend(delay=0.01), TEXT, get_tts_settings('default'))
+    assert result['backend'] == 'stand-in' and result['chars'] == len(TEXT)
+    assert result['audio_seconds'] > 0 and result['real_time_factor'] > 1
+    print(f"✅ Benchmark: {result}")
+
+
+if __name__ == "__main__":
+    test_split_at_sentence_boundaries()
+    test_chunks_synthesised_concurrently_in_order()
+    test_cache_skips_backend_on_rerun()
+    test_profile_selects_backend()
+    test_cache_keyed_by_espeak_voice_and_rate()
+    test_espeak_backend_synthesises()
+    test_benchmark_reports_real_time_factor()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test that downloads are made H.264/AAC MP4 with the least work, and that videos split into clips,
+using small generated clips
+"""
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from utils.video_tools import ensure_compatible_mp4, probe_media, run_ffmpeg, split_video
+
+
+def _make_clip(output_dir, name, video_codec, audio_codec, seconds=2, keyframe_every=25):
+    path = os.path.join(output_dir, name)
+    run_ffmpeg(['-f', 'lavfi', '-i', f'testsrc=size=160x120:rate=25:duration={seconds}',
+                '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+                '-c:v', video_codec, '-g', str(keyframe_every), '-pix_fmt', 'yuv420p', '-c:a', audio_codec, path])
+    return path
+
+
+def _video_bitstream(path):
+    return run_ffmpeg(['-i', path, '-map', '0:v:0', '-c', 'copy', '-f', 'h264', '-'])
+
+
+def test_compatible_mp4_untouched():
+    path = _make_clip(tempfile.mkdtemp(), "video.mp4", 'libx264', 'aac')
+    mtime = os.path.getmtime(path)
+    assert ensure_compatible_mp4(path) == path and os.path.getmtime(path) == mtime
+    print("✅ H.264/AAC MP4 returned as is")
+
+
+def test_compatible_codecs_remuxed_by_stream_copy():
+    output_dir = tempfile.mkdtemp()
+    path = _make_clip(output_dir, "video.mkv", 'libx264', 'aac')
+    source_video = _video_bitstream(path)
+
+    fixed = ensure_compatible_mp4(path)
+
+    assert fixed == os.path.join(output_dir, "video.mp4") and os.listdir(output_dir) == ["video.mp4"]
+    assert 'mp4' in probe_media(fixed)['container']
+    assert _video_bitstream(fixed) == source_video
+    print("✅ MKV remuxed into MP4 without an encode")
+
+
+def test_incompatible_audio_reencoded_alone():
+    output_dir = tempfile.mkdtemp()
+    path = _make_clip(output_dir, "video.mkv", 'libx264', 'pcm_s16le')
+    source_video = _video_bitstream(path)
+
+    fixed = ensure_compatible_mp4(path)
+
+    media = probe_media(fixed)
+    assert media['video_codec'] == 'h264' and media['audio_codec'] == 'aac'
+    assert _video_bitstream(fixed) == source_video
+    print("✅ PCM audio encoded to AAC, H.264 video copied")
+
+
+def test_incompatible_video_reencoded():
+    output_dir = tempfile.mkdtemp()
+    path = _make_clip(output_dir, "video.avi", 'mpeg4', 'pcm_s16le')
+
+    fixed = ensure_compatible_mp4(path)
+
+    media = probe_media(fixed)
+    assert fixed.endswith("video.mp4") and not os.path.exists(path)
+    assert media['video_codec'] == 'h264' and media['pix_fmt'] == 'yuv420p' and media['audio_codec'] == 'aac'
+    print("✅ MPEG-4 Part 2 video re-encoded to H.264")
+
+
+def _durations(paths):
+    return [ffmpeg_parse_infos(path)['duration'] for path in paths]
+
+
+def test_fast_split_cuts_on_keyframes():
+    output_dir = tempfile.mkdtemp()
+    # A keyframe every second, so 2s boundaries land exactly on one
+    path = _make_clip(output_dir, "video.mp4", 'libx264', 'aac', seconds=5)
+    clips_dir = os.path.join(output_dir, "clips")
+
+    clips = split_video(path, clips_dir, clip_length=2, mode="fast")
+
+    assert clips == [os.path.join(clips_dir, f"clip_{n}.mp4") for n in (1, 2, 3)]
+    assert sorted(os.listdir(clips_dir)) == ["clip_1.mp4", "clip_2.mp4", "clip_3.mp4"]
+    durations = _durations(clips)
+    assert all(abs(d - expected) < 0.15 for d, expected in zip(durations, (2, 2, 1))), durations
+    print(f"✅ Stream-copied clips of {durations}s")
+
+
+def test_accurate_split_cuts_exactly():
+    output_dir = tempfile.mkdtemp()
+    # Keyframes only every 4s, so exact 2s cuts need an encode
+    path = _make_clip(output_dir, "video.mp4", 'libx264', 'aac', seconds=5, keyframe_every=100)
+    clips_dir = os.path.join(output_dir, "clips")
+
+    clips = split_video(path, clips_dir, clip_length=2, mode="accurate", max_workers=2)
+
+    assert clips == [os.path.join(clips_dir, f"clip_{n}.mp4") for n in (1, 2, 3)]
+    durations = _durations(clips)
+    assert all(abs(d - expected) < 0.1 for d, expected in zip(durations, (2, 2, 1))), durations
+    assert all(probe_media(clip)['video_codec'] == 'h264' for clip in clips)
+    try:
+        split_video(path, clips_dir, mode="slow")
+        assert False, "unknown modes should be rejected"
+    except ValueError:
+        pass
+    print(f"✅ Encoded clips of {durations}s")
+
+
+if __name__ == "__main__":
+    test_compatible_mp4_untouched()
+    test_compatible_codecs_remuxed_by_stream_copy()
+    test_incompatible_audio_reencoded_alone()
+    test_incompatible_video_reencoded()
+    test_fast_split_cuts_on_keyframes()
+    test_accurate_split_cuts_exactly()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Test that one Whisper model is loaded per configuration, that Whisper gets 16 kHz mono float32
+decoded through an ffmpeg pipe, that long audio is split on silence and transcribed in parallel
+chunks, and that many short clips share batched decodes, with stand-in models
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from utils import whisper_tools
+from utils.cache_tools import TranscriptCache
+from utils.pipeline import VideoPipeline
+from utils.video_tools import run_ffmpeg
+
+BASE_VIDEO = os.path.join(os.path.dirname(__file__), "test_base_video.mp4")
+SPEECH_VIDEO = os.path.join(os.path.dirname(__file__), "5sec_dynamic_chinese.mp4")
+
+
+class StandInModel:
+    """Records what it was asked to transcribe and answers with one segment"""
+
+    def __init__(self):
+        self.inputs = []
+        self.languages = []
+        self.detections = 0
+
+    def detect_language(self, audio, **kwargs):
+        self.detections += 1
+        assert len(audio) <= whisper_tools.LANGUAGE_DETECTION_SCAN_SECONDS * 16000
+        return "en", 0.9, []
+
+    def transcribe(self, audio, language=None, **kwargs):
+        self.inputs.append(audio)
+        self.languages.append(language)
+        segment = SimpleNamespace(start=0.0, end=len(audio) / 16000, text=" hello ")
+        return iter([segment]), SimpleNamespace(language=language)
+
+
+class StubWhisperModel:
+    """Stands in for faster_whisper.WhisperModel; records each load and decode"""
+
+    loads = []
+
+    def __init__(self, size, **kwargs):
+        StubWhisperModel.loads.append((size, kwargs))
+        self.decodes = 0
+
+    def transcribe(self, audio, language=None, **kwargs):
+        self.decodes += 1
+        return iter(()), SimpleNamespace(language=language)
+
+
+def test_model_cache_loads_once_per_key():
+    original = whisper_tools.WhisperModel
+    whisper_tools.WhisperModel = StubWhisperModel
+    StubWhisperModel.loads = []
+    whisper_tools.clear_whisper_models()
+    try:
+        model = whisper_tools.warmup_whisper_model()
+        assert model.decodes == 1
+        assert whisper_tools.get_whisper_model() is model
+        assert whisper_tools.get_whisper_model(compute_type="int8") is not model
+        assert [size for size, _ in StubWhisperModel.loads] == [whisper_tools.WHISPER_MODEL_SIZE] * 2
+        assert StubWhisperModel.loads[0][1]['num_workers'] == whisper_tools.WHISPER_NUM_WORKERS
+
+        # Evicting drops only that key; the next caller loads it again
+        assert whisper_tools.evict_whisper_model() and not whisper_tools.evict_whisper_model()
+        assert whisper_tools.get_whisper_model(compute_type="int8") is not None and len(StubWhisperModel.loads) == 2
+        assert whisper_tools.get_whisper_model() is not model and len(StubWhisperModel.loads) == 3
+    finally:
+        whisper_tools.clear_whisper_models()
+        whisper_tools.WhisperModel = original
+    print(f"✅ {len(StubWhisperModel.loads)} model loads for 2 keys and 1 eviction")
+
+
+def _make_audio(output_dir):
+    path = os.path.join(output_dir, "speech.mp4")
+    # 44.1 kHz stereo AAC, so the pipe has to downmix and resample
+    run_ffmpeg(['-f', 'lavfi', '-i', 'sine=frequency=440:duration=2:sample_rate=44100', '-ac', '2',
+                '-c:a', 'aac', path])
+    return path
+
+
+def test_decode_to_whisper_format():
+    path = _make_audio(tempfile.mkdtemp())
+    pcm = whisper_tools.extract_audio_pcm(path)
+    assert pcm.dtype == np.float32 and pcm.ndim == 1
+    assert abs(len(pcm) - 2 * whisper_tools.WHISPER_SAMPLE_RATE) < 2048
+    assert whisper_tools.extract_audio_pcm(BASE_VIDEO) is None
+    print(f"✅ Decoded {len(pcm)} samples at 16 kHz")
+
+
+def test_transcribe_from_buffer_without_temp_files():
+    output_dir = tempfile.mkdtemp()
+    path = _make_audio(output_dir)
+    model = StandInModel()
+    original_cache = whisper_tools._transcript_cache
+    whisper_tools._MODEL_CACHE[whisper_tools._model_key()] = model
+    whisper_tools._transcript_cache = TranscriptCache(os.path.join(output_dir, "cache"))
+    try:
+        assert not whisper_tools.has_cached_transcript(path)
+        detected = {}
+        segments = whisper_tools.transcribe_segments(path, detected=detected)
+        assert segments == [{'start': 0.0, 'end': len(model.inputs[0]) / 16000, 'text': "hello"}]
+        assert isinstance(model.inputs[0], np.ndarray)
+        assert sorted(os.listdir(output_dir)) == ["cache", "speech.mp4"]
+        # The language is detected once up front and fixed for the decode
+        assert model.detections == 1 and model.languages == ["en"] and detected == {'language': "en"}
+
+        # A cache hit does not decode or transcribe again, and still reports the language
+        detected = {}
+        assert whisper_tools.transcribe_segments(path, detected=detected) == segments
+        assert len(model.inputs) == 1 and model.detections == 1 and detected == {'language': "en"}
+        assert whisper_tools.transcribe_segments(BASE_VIDEO) == []
+
+        # The key is the audio stream, so the same audio remuxed into MKV is a hit too
+        remuxed = os.path.join(output_dir, "speech.mkv")
+        run_ffmpeg(['-i', path, '-c', 'copy', remuxed])
+        assert whisper_tools.transcribe_segments(remuxed) == segments and len(model.inputs) == 1
+        os.remove(remuxed)
+
+        # The pipeline's extract stage does not decode audio Whisper will never see
+        assert whisper_tools.has_cached_transcript(path)
+        pipeline = VideoPipeline(path, output_dir=os.path.join(output_dir, "output"))
+        pipeline.video_path = path
+        pipeline.run_extract()
+        assert pipeline.audio_pcm is None and abs(pipeline.video_duration - 2) < 0.1
+    finally:
+        whisper_tools.clear_whisper_models()
+        whisper_tools._transcript_cache = original_cache
+    print("✅ Whisper transcribed the in-memory buffer")
+
+
+class ChunkModel:
+    """Answers one segment per chunk and records chunk lengths, languages and concurrency"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def transcribe(self, audio, language=None, **kwargs):
+        with self.lock:
+            self.calls.append((len(audio), language))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight -= 1
+        segment = SimpleNamespace(start=0.5, end=len(audio) / 16000 - 0.5, text=f"chunk {len(self.calls)}")
+        return iter([segment]), SimpleNamespace(language=language or "zh")
+
+
+def test_long_audio_chunked_on_silence():
+    speech = whisper_tools.extract_audio_pcm(SPEECH_VIDEO)
+    silence = np.zeros(10 * 16000, dtype=np.float32)
+    audio = np.concatenate([silence, speech, silence, speech, silence, speech])
+    model = ChunkModel()
+
+    segments, info = whisper_tools.transcribe_chunked(model, audio, max_workers=2)
+    segments = list(segments)
+
+    # Every 10s pause is skipped: three chunks, each about one clip of speech
+    assert len(model.calls) == 3
+    assert all(length < len(speech) + 16000 for length, _ in model.calls)
+    # The first chunk's detected language is used for the others, which run in parallel
+    assert [language for _, language in model.calls] == [None, "zh", "zh"] and info.language == "zh"
+    assert model.max_in_flight == 2
+    # Timestamps are stitched back into file time and stay in order
+    starts = [segment.start for segment in segments]
+    assert starts == sorted(starts) and 10 < starts[0] < 11 and starts[2] > 30
+
+    # With the language known up front, every chunk runs at once
+    model = ChunkModel()
+    segments, info = whisper_tools.transcribe_chunked(model, audio, language="en", max_workers=3)
+    assert [segment.start for segment in segments] == starts
+    assert [language for _, language in model.calls] == ["en"] * 3 and model.max_in_flight == 3
+    print(f"✅ {len(audio) / 16000:.0f}s of audio transcribed as chunks starting at {starts}")
+
+
+class StandInBatchedPipeline:
+    """Stand-in BatchedInferencePipeline: one segment per window, language by clip length"""
+
+    def __init__(self):
+        self.calls = []
+        self.model = SimpleNamespace(
+            detect_language=lambda audio, **kwargs: ("en" if len(audio) > 6 * 16000 else "zh", 1.0, []))
+
+    def transcribe(self, audio, language=None, clip_timestamps=None, batch_size=None, **kwargs):
+        self.calls.append((language, len(clip_timestamps)))
+        segments = [SimpleNamespace(start=round(w['start'] + 0.2, 3), end=round(w['end'] - 0.2, 3),
+                                    text=f" {language} ") for w in clip_timestamps]
+        return iter(segments), SimpleNamespace(language=language)
+
+
+def test_short_clips_transcribed_in_shared_batches():
+    speech = whisper_tools.extract_audio_pcm(SPEECH_VIDEO)
+    clips = [speech, np.concatenate([np.zeros(3 * 16000, dtype=np.float32), speech]), speech,
+             np.zeros(16000, dtype=np.float32), None]
+    pipeline = StandInBatchedPipeline()
+
+    results, languages = zip(*whisper_tools.transcribe_batch(clips, pipeline=pipeline))
+
+    # One batched decode per language, not one call per clip
+    assert sorted(language for language, _ in pipeline.calls) == ["en", "zh"]
+    assert languages == ("zh", "en", "zh", "zh", None)
+    assert [len(segments) for segments in results[:3]] == [1, 1, 1] and results[3] == results[4] == []
+    assert results[0][0]['text'] == results[2][0]['text'] == "zh" and results[1][0]['text'] == "en"
+    assert abs(results[0][0]['end'] - results[2][0]['end']) < 0.01
+    # Timestamps are relative to each clip
+    assert results[0][0]['start'] < 1 and 2.5 < results[1][0]['start'] < 4
+    assert all(segments[0]['end'] <= len(clip) / 16000 for segments, clip in zip(results[:3], clips))
+    print(f"✅ {len(clips)} clips in {len(pipeline.calls)} batched decodes")
+
+
+def test_batched_transcripts_cache_detected_language():
+    output_dir = tempfile.mkdtemp()
+    path = os.path.join(output_dir, "short.mp4")
+    run_ffmpeg(['-i', SPEECH_VIDEO, '-c', 'copy', path])
+    original_cache, original_pipeline = whisper_tools._transcript_cache, whisper_tools.BatchedInferencePipeline
+    whisper_tools._MODEL_CACHE[whisper_tools._model_key()] = StandInModel()
+    whisper_tools._transcript_cache = TranscriptCache(os.path.join(output_dir, "cache"))
+    pipelines = []
+
+    def make_pipeline(model):
+        pipelines.append(StandInBatchedPipeline())
+        return pipelines[-1]
+
+    whisper_tools.BatchedInferencePipeline = make_pipeline
+    try:
+        [segments] = whisper_tools.transcribe_files([path])
+        # A rerun is served from the cache, which kept the detected language
+        assert whisper_tools.transcribe_files([path]) == [segments] and len(pipelines) == 1
+        entry = whisper_tools._transcript_cache.get(whisper_tools._transcript_key(path, mode='batched'))
+        assert entry['language'] == "zh"
+
+        # Batched windows are not what a single-file run would produce, so it does not reuse them
+        assert not whisper_tools.has_cached_transcript(path)
+        whisper_tools.transcribe_segments(path)
+        assert len(whisper_tools._MODEL_CACHE[whisper_tools._model_key()].inputs) == 1
+    finally:
+        whisper_tools.clear_whisper_models()
+        whisper_tools._transcript_cache = original_cache
+        whisper_tools.BatchedInferencePipeline = original_pipeline
+    print("✅ Batched transcript cached apart, with its detected language")
+
+
+if __name__ == "__main__":
+    test_model_cache_loads_once_per_key()
+    test_decode_to_whisper_format()
+    test_transcribe_from_buffer_without_temp_files()
+    test_long_audio_chunked_on_silence()
+    test_short_clips_transcribed_in_shared_batches()
+    test_batched_transcripts_cache_detected_language()
@@ -0,0 +1,124 @@
+"""
+PCM audio helpers: pitch-preserving time-stretch and segment-aligned tracks
+
+All audio is mono float32 NumPy arrays plus a sample rate.
+"""
+import numpy as np
+from scipy import signal
+
+# Phase vocoder frame and hop, in samples at 24 kHz (~43 ms frames, 75% overlap)
+STRETCH_FRAME = 1024
+STRETCH_HOP = 256
+
+# Bounds on how far a segment is squeezed or stretched to fit its slot; beyond
+# these speech stops sounding natural, so the rest is trimmed or left silent
+MAX_SPEEDUP = 1.8
+MAX_SLOWDOWN = 0.85
+
+
+def time_stretch(pcm: np.ndarray, rate: float, frame: int = STRETCH_FRAME, hop: int = STRETCH_HOP) -> np.ndarray:
+    """
+    Change the duration of audio without changing its pitch (phase vocoder)
+
+    The whole signal is processed as arrays: one STFT, magnitudes interpolated
+    at the new frame positions, phases advanced with a cumulative sum, one
+    inverse STFT.
+
+    Args:
+        pcm: Mono float32 samples
+        rate: Speed factor; 2.0 halves the duration, 0.5 doubles it
+
+    Returns:
+        numpy.ndarray: Stretched float32 samples, about len(pcm) / rate long
+    """
+    if rate <= 0:
+        raise ValueError("rate must be positive")
+    target_length = int(round(len(pcm) / rate))
+    if abs(rate - 1.0) < 1e-3 or len(pcm) < frame:
+        return _fit_length(pcm.astype(np.float32, copy=False), target_length)
+
+    window = signal.get_window('hann', frame)
+    _, _, spectrum = signal.stft(pcm, window=window, nperseg=frame, noverlap=frame - hop, boundary='zeros',
+                                 padded=True)
+
+    # Fractional source frame for every output frame
+    positions = np.arange(0, spectrum.shape[1] - 1, rate)
+    base = positions.astype(int)
+    fraction = (positions - base)[np.newaxis, :]
+
+    left = spectrum[:, base]
+    right = spectrum[:, base + 1]
+    magnitude = (1 - fraction) * np.abs(left) + fraction * np.abs(right)
+
+    # Expected phase advance per hop for each bin, plus the measured deviation
+    expected = 2 * np.pi * hop * np.arange(spectrum.shape[0])[:, np.newaxis] / frame
+    advance = np.angle(right) - np.angle(left) - expected
+    advance = expected + (advance + np.pi) % (2 * np.pi) - np.pi
+    phase = np.angle(spectrum[:, :1]) + np.concatenate(
+        [np.zeros((spectrum.shape[0], 1)), np.cumsum(advance[:, :-1], axis=1)], axis=1)
+
+    _, stretched = signal.istft(magnitude * np.exp(1j * phase), window=window, nperseg=frame,
+                                noverlap=frame - hop, boundary=True)
+    return _fit_length(stretched.astype(np.float32), target_length)
+
+
+def _fit_length(pcm: np.ndarray, length: int) -> np.ndarray:
+    """Trim or zero-pad to exactly length samples"""
+    if len(pcm) >= length:
+        return pcm[:length]
+    padded = np.zeros(length, dtype=np.float32)
+    padded[:len(pcm)] = pcm
+    return padded
+
+
+def fit_to_duration(pcm: np.ndarray, sample_rate: int, duration: float,
+                    max_speedup: float = MAX_SPEEDUP, max_slowdown: float = MAX_SLOWDOWN) -> np.ndarray:
+    """
+    Time-stretch audio towards a target duration within natural-sounding limits
+
+    Returns:
+        numpy.ndarray: Samples no longer than duration; shorter if the audio
+            could not be slowed down enough (the caller leaves the rest silent)
+    """
+    target = int(round(duration * sample_rate))
+    if target <= 0 or len(pcm) == 0:
+        return np.zeros(0, dtype=np.float32)
+    rate = min(max(len(pcm) / target, max_slowdown), max_speedup)
+    return time_stretch(pcm, rate)[:target]
+
+
+def build_aligned_track(segments, sample_rate: int, duration: float) -> np.ndarray:
+    """
+    Lay speech segments onto one silent track at their start times
+
+    Each segment is stretched to its source duration, except that speech
+    longer than that may run on into the silence before the next segment
+    instead of being sped up. Speech never overlaps and keeps its pitch.
+
+    Args:
+        segments: (start, end, pcm) tuples in seconds, sorted by start
+        sample_rate: Rate of every pcm and of the track
+        duration: Track length in seconds
+
+    Returns:
+        numpy.ndarray: float32 track of duration * sample_rate samples
+    """
+    track = np.zeros(int(round(duration * sample_rate)), dtype=np.float32)
+    for i, (start, end, pcm) in enumerate(segments):
+        next_start = segments[i + 1][0] if i + 1 < len(segments) else duration
+        available = min(max(end, next_start), duration) - start
+        target = min(max(len(pcm) / sample_rate, end - start), available)
+        fitted = fit_to_duration(pcm, sample_rate, target)
+        offset = int(round(start * sample_rate))
+        length = min(len(fitted), len(track) - offset)
+        if length > 0:
+            track[offset:offset + length] = fitted[:length]
+    return track
+
+
+def write_wav(path: str, pcm: np.ndarray, sample_rate: int) -> str:
+    """Write mono float32 PCM as a 16-bit WAV file"""
+    from scipy.io import wavfile
+
+    wavfile.write(path, sample_rate, (np.clip(pcm, -1.0, 1.0) * 32767).astype(np.int16))
+    return path
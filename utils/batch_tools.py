@@ -0,0 +1,219 @@
+"""
+Batch processing of many URLs, playlists and local media files
+
+Jobs run concurrently, but each pipeline stage takes a slot from the pool
+matching the resource it is bound by: network for downloads and gTTS, CPU
+cores for Whisper and encodes, and server slots for Ollama.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, List, Optional
+
+from .pipeline import VideoPipeline
+from .translate_tools import OLLAMA_NUM_PARALLEL
+from .tts_tools import get_tts_settings
+from .whisper_tools import WHISPER_NUM_WORKERS
+
+MEDIA_EXTENSIONS = ('.mp4', '.mkv', '.mov', '.webm', '.avi', '.m4v')
+
+CPU_COUNT = os.cpu_count() or 1
+
+
+def default_resource_limits() -> dict:
+    """
+    Default concurrent slots per resource
+
+    Returns:
+        dict: Resource name → number of stages allowed to run at once
+    """
+    return {
+        'network': int(os.environ.get("BATCH_NETWORK_SLOTS", "4")),
+        # Every job shares one WhisperModel, which only serves num_workers transcriptions at once
+        'whisper': WHISPER_NUM_WORKERS,
+        # Requests across all translate stages are capped by the shared TranslationEngine
+        'ollama': OLLAMA_NUM_PARALLEL,
+        # x264 already threads each encode, so only a few run side by side
+        'encode': max(1, CPU_COUNT // 4),
+    }
+
+
+# Resource each pipeline stage is bound by
+STAGE_RESOURCES = {
+    'download': 'network',
+    'extract': 'encode',
+    'transcribe': 'whisper',
+    'translate': 'ollama',
+    'subtitles': 'encode',
+    # Depends on the job's TTS backend, see tts_resource()
+    'tts': None,
+    'mux': 'encode',
+}
+
+
+def tts_resource(tone_style: str = 'default') -> str:
+    """
+    Resource the TTS stage of a job is bound by
+
+    gTTS waits on the network; the local espeak backend competes for CPU with
+    encodes. The backend comes from the tone profile, so a TTS_BACKEND_<TONE>
+    override is scheduled by what it actually runs.
+    """
+    return 'network' if get_tts_settings(tone_style)['backend'] == 'gtts' else 'encode'
+
+
+def _is_url(value: str) -> bool:
+    return value.startswith(("http://", "https://"))
+
+
+def _is_playlist_url(url: str) -> bool:
+    return "list=" in url or "/playlist" in url or "/@" in url or "/channel/" in url
+
+
+def expand_playlist(url: str) -> List[str]:
+    """List the video URLs of a playlist or channel without downloading anything"""
+    import yt_dlp
+
+    with yt_dlp.YoutubeDL({"quiet": True, "extract_flat": "in_playlist"}) as ydl:
+        info = ydl.extract_info(url, download=False)
+    urls = []
+    for entry in info.get('entries') or []:
+        if not entry:
+            continue
+        entry_url = entry.get('url') or entry.get('webpage_url')
+        if entry_url and not _is_url(entry_url):
+            entry_url = f"https://www.youtube.com/watch?v={entry_url}"
+        if not entry_url and entry.get('id'):
+            entry_url = f"https://www.youtube.com/watch?v={entry['id']}"
+        if entry_url:
+            urls.append(entry_url)
+    print(f"📃 Playlist {url}: {len(urls)} videos")
+    return urls
+
+
+def expand_inputs(inputs: Iterable[str]) -> List[str]:
+    """
+    Expand batch inputs into individual job sources
+
+    Args:
+        inputs: Video URLs, playlist/channel URLs, directories of media files,
+            media files, or .txt files listing any of these one per line
+
+    Returns:
+        list: Video URLs and local media paths, duplicates removed, order kept
+    """
+    sources = []
+    for item in inputs:
+        item = item.strip()
+        if not item or item.startswith("#"):
+            continue
+        if _is_url(item):
+            sources.extend(expand_playlist(item) if _is_playlist_url(item) else [item])
+        elif os.path.isdir(item):
+            for name in sorted(os.listdir(item)):
+                path = os.path.join(item, name)
+                if os.path.isfile(path) and name.lower().endswith(MEDIA_EXTENSIONS):
+                    sources.append(path)
+        elif item.lower().endswith(".txt") and os.path.isfile(item):
+            with open(item, encoding="utf-8") as f:
+                sources.extend(expand_inputs(f.read().splitlines()))
+        elif os.path.isfile(item):
+            sources.append(item)
+        else:
+            print(f"⚠️  Skipping unknown batch input: {item}")
+    return list(dict.fromkeys(sources))
+
+
+class BatchJobResult:
+    """Outcome of one batch job"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.status = 'pending'
+        self.error: Optional[str] = None
+        self.elapsed = 0.0
+        self.pipeline: Optional[VideoPipeline] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 'done'
+
+
+class BatchScheduler:
+    """Run a VideoPipeline per source with per-resource concurrency limits"""
+
+    def __init__(self, max_jobs: Optional[int] = None, resource_limits: Optional[dict] = None,
+                 pipeline_factory: Callable[..., VideoPipeline] = VideoPipeline, **pipeline_kwargs):
+        """
+        Args:
+            max_jobs: Jobs in progress at once (default: enough to keep every resource busy)
+            resource_limits: Overrides for default_resource_limits()
+            pipeline_factory: Callable building the pipeline for one source
+            **pipeline_kwargs: Passed to every pipeline (output_dir, tone_style, resume, subtitle_mode,
+                deliverables, streaming)
+        """
+        limits = default_resource_limits()
+        limits.update(resource_limits or {})
+        self.resource_limits = limits
+        self.semaphores = {name: threading.BoundedSemaphore(max(1, n)) for name, n in limits.items()}
+        self.stage_limits = {stage: self.semaphores[res] for stage, res in STAGE_RESOURCES.items() if res}
+        self.max_jobs = max_jobs or sum(limits.values())
+        self.pipeline_factory = pipeline_factory
+        self.pipeline_kwargs = pipeline_kwargs
+
+    def run(self, sources: List[str]) -> List[BatchJobResult]:
+        """
+        Process every source and report progress and failures per job
+
+        Returns:
+            list: BatchJobResult per source, in input order
+        """
+        results = [BatchJobResult(source) for source in sources]
+        total = len(results)
+        print(f"🚚 Batch of {total} jobs, {self.max_jobs} at a time, limits {self.resource_limits}")
+
+        finished = 0
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_jobs, total))) as executor:
+            futures = [executor.submit(self._run_job, result) for result in results]
+            for future in as_completed(futures):
+                result = future.result()
+                finished += 1
+                if result.ok:
+                    print(f"[{finished}/{total}] ✅ {result.source} ({result.elapsed:.1f}s)")
+                else:
+                    print(f"[{finished}/{total}] ❌ {result.source} ({result.elapsed:.1f}s): {result.error}")
+
+        failed = [r for r in results if not r.ok]
+        print(f"\n📊 Batch finished: {total - len(failed)} succeeded, {len(failed)} failed")
+        for result in failed:
+            print(f"   ❌ {result.source}: {result.error}")
+        return results
+
+    def _run_job(self, result: BatchJobResult) -> BatchJobResult:
+        start = time.perf_counter()
+        result.status = 'running'
+        try:
+            tts = self.semaphores[tts_resource(self.pipeline_kwargs.get('tone_style', 'default'))]
+            pipeline = self.pipeline_factory(result.source, stage_limits={**self.stage_limits, 'tts': tts},
+                                             **self.pipeline_kwargs)
+            result.pipeline = pipeline.run()
+            if pipeline.failed_stages:
+                result.status = 'failed'
+                result.error = f"stages failed: {', '.join(pipeline.failed_stages)}"
+            else:
+                result.status = 'done'
+        except Exception as e:
+            result.status = 'failed'
+            result.error = f"{type(e).__name__}: {e}"
+        result.elapsed = time.perf_counter() - start
+        return result
+
+
+def run_batch(inputs: Iterable[str], max_jobs: Optional[int] = None, **pipeline_kwargs) -> List[BatchJobResult]:
+    """Expand inputs and process them with a BatchScheduler"""
+    sources = expand_inputs(inputs)
+    if not sources:
+        print("⚠️  No videos found in batch inputs")
+        return []
+    return BatchScheduler(max_jobs=max_jobs, **pipeline_kwargs).run(sources)
@@ -0,0 +1,232 @@
+"""
+Persistent caches shared across runs
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Optional
+
+# Cache directory next to the temp directory used by tts_tools
+CACHE_DIR = os.environ.get("VIDEO_AGENT_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache'))
+
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.environ.get("TRANSLATION_CACHE_MAX_ENTRIES", "50000"))
+
+
+def normalize_text(text: str) -> str:
+    """Normalise unicode and whitespace so trivially different copies share a cache key"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def hash_key(*parts) -> str:
+    """Stable SHA-256 hex digest of JSON-serialisable key parts"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """Content-addressed SQLite cache of chunk translations with LRU eviction"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = TRANSLATION_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            path: SQLite database file (default: cache/translations.sqlite3)
+            max_entries: Entries kept before the least recently used are evicted
+        """
+        self.path = path or os.path.join(CACHE_DIR, "translations.sqlite3")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY,"
+            " translation TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS translations_last_access ON translations(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text: str, model: str, prompt_template: str, options: dict) -> str:
+        """Key a translation by (normalised source text, model, prompt template, options)"""
+        return hash_key(normalize_text(text), model, prompt_template, options)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT translation FROM translations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE translations SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, translation: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (key, translation, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, translation, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM translations WHERE key IN "
+                "(SELECT key FROM translations ORDER BY last_access ASC LIMIT ?)",
+                (excess,),
+            )
+            self.evictions += excess
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {'entries': len(self), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+FINGERPRINT_BLOCK_SIZE = 1 << 20  # Bytes hashed from the start, middle and end of a file
+
+
+def media_fingerprint(path: str) -> str:
+    """
+    Fast content fingerprint of a media file
+
+    Hashes the file size plus three 1 MiB blocks (start, middle, end) instead
+    of the whole file, so multi-GB inputs are fingerprinted in milliseconds.
+    A renamed or moved copy of the same bytes still matches, a remux does
+    not; transcripts are keyed by whisper_tools.audio_fingerprint() instead.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        if size <= 3 * FINGERPRINT_BLOCK_SIZE:
+            digest.update(f.read())
+        else:
+            for offset in (0, (size - FINGERPRINT_BLOCK_SIZE) // 2, size - FINGERPRINT_BLOCK_SIZE):
+                f.seek(offset)
+                digest.update(f.read(FINGERPRINT_BLOCK_SIZE))
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """Segment-level Whisper results stored as JSON, keyed by media fingerprint and model settings"""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        """
+        Args:
+            cache_dir: Directory holding one JSON file per transcript (default: cache/transcripts)
+        """
+        self.cache_dir = cache_dir or os.path.join(CACHE_DIR, "transcripts")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(fingerprint: str, **params) -> str:
+        """Key a transcript by media fingerprint plus Whisper model/language/decode-mode parameters"""
+        return hash_key(fingerprint, params)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Returns:
+            dict with 'segments' (list of 'start'/'end'/'text' dicts) and 'language', or None
+        """
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def contains(self, key: str) -> bool:
+        """True if a transcript is stored under key; not counted as a hit or miss"""
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, segments: list, language: Optional[str] = None):
+        # Write then rename so a crash never leaves a truncated entry behind
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({'segments': segments, 'language': language}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class TTSCache:
+    """Synthesised speech per text chunk, stored as float32 PCM .npy files"""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        """
+        Args:
+            cache_dir: Directory holding one .npy file per chunk (default: cache/tts)
+        """
+        self.cache_dir = cache_dir or os.path.join(CACHE_DIR, "tts")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(text: str, **params) -> str:
+        """Key a chunk by its normalised text plus voice parameters (backend, lang, tld, tone, rate)"""
+        return hash_key(normalize_text(text), params)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key: str):
+        """
+        Returns:
+            numpy.ndarray: Mono float32 PCM, or None
+        """
+        import numpy as np
+
+        try:
+            pcm = np.load(self._path(key), allow_pickle=False)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return pcm
+
+    def put(self, key: str, pcm):
+        import numpy as np
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, pcm, allow_pickle=False)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,91 @@
+"""
+Per-video job manifest recording completed pipeline stages and their artifacts
+"""
+import json
+import os
+import time
+from typing import Iterable, Optional
+
+from .cache_tools import hash_key, media_fingerprint
+
+
+class JobManifest:
+    """JSON record of each completed stage's artifacts, their hashes and small result values"""
+
+    def __init__(self, source: str, jobs_dir: str):
+        """
+        Args:
+            source: URL or local path identifying the job
+            jobs_dir: Folder holding one sub-folder per job
+        """
+        if os.path.exists(source):
+            source = os.path.abspath(source)
+        self.source = source
+        self.job_id = hash_key(source)[:16]
+        self.job_dir = os.path.join(jobs_dir, self.job_id)
+        self.path = os.path.join(self.job_dir, "manifest.json")
+        os.makedirs(self.job_dir, exist_ok=True)
+
+        self.data = {'source': source, 'stages': {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Ignoring unreadable job manifest {self.path}: {e}")
+
+    def stage(self, name: str) -> Optional[dict]:
+        return self.data['stages'].get(name)
+
+    def is_recorded(self, name: str) -> bool:
+        return name in self.data['stages']
+
+    def artifacts_valid(self, name: str) -> bool:
+        """True if the stage is recorded and every artifact still exists with the recorded hash"""
+        entry = self.stage(name)
+        if entry is None:
+            return False
+        for key, path in entry['artifacts'].items():
+            if not os.path.exists(path) or media_fingerprint(path) != entry['hashes'].get(key):
+                return False
+        return True
+
+    def settings_match(self, name: str, settings: dict) -> bool:
+        """True if the stage is recorded with the same settings (tone, subtitle mode, ...)"""
+        entry = self.stage(name)
+        return entry is not None and entry.get('settings', {}) == settings
+
+    def record(self, name: str, artifacts: dict, values: Optional[dict] = None, settings: Optional[dict] = None):
+        """
+        Mark a stage complete
+
+        Args:
+            name: Stage name
+            artifacts: Files produced by the stage, hashed so later edits are detected
+            values: Small JSON-serialisable results (durations, counts)
+            settings: Options the stage's output depends on; a resumed run with
+                different settings reruns the stage
+        """
+        artifacts = {key: os.path.abspath(path) for key, path in artifacts.items() if path}
+        self.data['stages'][name] = {
+            'completed_at': time.time(),
+            'artifacts': artifacts,
+            'hashes': {key: media_fingerprint(path) for key, path in artifacts.items()},
+            'values': values or {},
+            'settings': settings or {},
+        }
+        self.save()
+
+    def discard(self, names: Iterable[str]):
+        """Forget stages, e.g. everything downstream of a stage that is about to rerun"""
+        stages = self.data['stages']
+        removed = [name for name in names if stages.pop(name, None) is not None]
+        if removed:
+            self.save()
+
+    def save(self):
+        # Write then rename so a crash mid-write keeps the previous manifest
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,138 @@
+"""
+Request-level metrics for Ollama translation calls
+"""
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Optional
+
+NS_PER_SECOND = 1_000_000_000
+# Per-request records kept for windowed summaries; older ones only count towards the totals
+MAX_RECORDED_REQUESTS = 10_000
+
+
+@dataclass
+class RequestMetrics:
+    """Timing and token counts for one Ollama generate request"""
+    chars: int = 0
+    started_at: float = field(default_factory=time.time)
+    latency: float = 0.0              # Wall-clock seconds including retries
+    retries: int = 0
+    success: bool = False
+    prompt_eval_count: int = 0        # Prompt tokens processed
+    prompt_eval_duration: float = 0.0 # Seconds spent on the prompt
+    eval_count: int = 0               # Tokens generated
+    eval_duration: float = 0.0        # Seconds spent generating
+    total_duration: float = 0.0       # Server-side seconds for the request
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Generation throughput as reported by the Ollama server"""
+        return self.eval_count / self.eval_duration if self.eval_duration else 0.0
+
+    @property
+    def prompt_tokens_per_second(self) -> float:
+        return self.prompt_eval_count / self.prompt_eval_duration if self.prompt_eval_duration else 0.0
+
+    def update_from_response(self, result: dict):
+        """Copy Ollama's token counters (durations are in nanoseconds) from a response body"""
+        self.prompt_eval_count = result.get("prompt_eval_count", 0) or 0
+        self.prompt_eval_duration = (result.get("prompt_eval_duration", 0) or 0) / NS_PER_SECOND
+        self.eval_count = result.get("eval_count", 0) or 0
+        self.eval_duration = (result.get("eval_duration", 0) or 0) / NS_PER_SECOND
+        self.total_duration = (result.get("total_duration", 0) or 0) / NS_PER_SECOND
+
+
+@dataclass
+class MetricsTotals:
+    """Running aggregates over any number of RequestMetrics"""
+    requests: int = 0
+    failures: int = 0
+    retries: int = 0
+    prompt_tokens: int = 0
+    eval_tokens: int = 0
+    eval_seconds: float = 0.0
+    latency: float = 0.0
+    first_started: Optional[float] = None
+    last_finished: Optional[float] = None
+
+    def add(self, m: RequestMetrics):
+        self.requests += 1
+        self.retries += m.retries
+        self.latency += m.latency
+        if m.success:
+            self.prompt_tokens += m.prompt_eval_count
+            self.eval_tokens += m.eval_count
+            self.eval_seconds += m.eval_duration
+        else:
+            self.failures += 1
+        finished = m.started_at + m.latency
+        self.first_started = m.started_at if self.first_started is None else min(self.first_started, m.started_at)
+        self.last_finished = finished if self.last_finished is None else max(self.last_finished, finished)
+
+    def summary(self) -> dict:
+        wall_seconds = self.last_finished - self.first_started if self.requests else 0.0
+        return {
+            'requests': self.requests,
+            'failures': self.failures,
+            'retries': self.retries,
+            'prompt_tokens': self.prompt_tokens,
+            'eval_tokens': self.eval_tokens,
+            'avg_latency': self.latency / self.requests if self.requests else 0.0,
+            # Per-slot generation speed reported by Ollama
+            'tokens_per_second': self.eval_tokens / self.eval_seconds if self.eval_seconds else 0.0,
+            # Effective throughput including concurrency, queueing and network time
+            'wall_tokens_per_second': self.eval_tokens / wall_seconds if wall_seconds else 0.0,
+        }
+
+
+class TranslationMetrics:
+    """
+    Thread-safe collection of RequestMetrics with throughput summaries
+
+    Lifetime totals are kept as running aggregates; only the most recent
+    max_requests records are kept for summaries of a time window, so a
+    long-running engine does not grow without bound.
+    """
+
+    def __init__(self, max_requests: int = MAX_RECORDED_REQUESTS):
+        self._lock = threading.Lock()
+        self.requests: Deque[RequestMetrics] = deque(maxlen=max_requests)
+        self.totals = MetricsTotals()
+
+    def record(self, metrics: RequestMetrics):
+        with self._lock:
+            self.requests.append(metrics)
+            self.totals.add(metrics)
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.totals = MetricsTotals()
+
+    def summary(self, since: Optional[float] = None) -> dict:
+        """
+        Summarise recorded requests
+
+        Args:
+            since: Only include requests started at or after this time.time() value;
+                limited to the most recent max_requests records
+
+        Returns:
+            dict: Request, retry and token counts plus latency and tokens/second
+        """
+        with self._lock:
+            if since is None:
+                return self.totals.summary()
+            window = MetricsTotals()
+            for m in self.requests:
+                if m.started_at >= since:
+                    window.add(m)
+        return window.summary()
+
+    def print_summary(self, since: Optional[float] = None):
+        s = self.summary(since)
+        print(f"📊 Translation metrics: {s['requests']} requests, {s['failures']} failed, {s['retries']} retries, "
+              f"{s['eval_tokens']} tokens, avg latency {s['avg_latency']:.2f}s, "
+              f"{s['tokens_per_second']:.1f} tok/s per slot, {s['wall_tokens_per_second']:.1f} tok/s overall")
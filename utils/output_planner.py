@@ -0,0 +1,223 @@
+"""
+Output planner: render every requested deliverable of a video in one pass
+
+Deliverables are the subtitled video (burned or soft subtitles, original
+audio), the dubbed video (Chinese audio) and the subtitled + dubbed video.
+Outputs that need new pixels share one decode and one H.264 encode, teed
+to a file per deliverable; outputs where only the audio or a subtitle
+track changes are stream-copied.
+"""
+import os
+from typing import Dict, Optional
+
+import srt
+
+from .subtitle_tools import (SUBTITLE_BACKEND, SUBTITLE_MODE, burn_subtitles_composite, stream_subtitle_overlay,
+                             subtitles_filter)
+from .video_tools import COMPATIBLE_VIDEO_CODECS, audio_encode_args, probe_media, run_ffmpeg, video_encode_args
+
+DELIVERABLES = ('subtitled', 'dubbed', 'subtitled_dubbed')
+# Comma-separated deliverables a pipeline run produces
+DEFAULT_DELIVERABLES = tuple(
+    d for d in os.environ.get("OUTPUT_DELIVERABLES", "subtitled,dubbed").split(",") if d
+)
+
+
+def plan_outputs(targets: Dict[str, str], subtitle_mode: str = SUBTITLE_MODE) -> dict:
+    """
+    Decide how each deliverable is produced
+
+    Args:
+        targets: Deliverable name → output path
+        subtitle_mode: "burn" or "soft"
+
+    Returns:
+        dict: 'encode' → deliverables rendered from the shared decode/encode pass,
+            'copy' → deliverables made by stream copy
+    """
+    unknown = set(targets) - set(DELIVERABLES)
+    if unknown:
+        raise ValueError(f"Unknown deliverables {sorted(unknown)}, use any of {DELIVERABLES}")
+    burned = [d for d in ('subtitled', 'subtitled_dubbed') if d in targets and subtitle_mode == 'burn']
+    copied = [d for d in DELIVERABLES if d in targets and d not in burned]
+    return {'encode': burned, 'copy': copied}
+
+
+def _load_subtitles(srt_path):
+    with open(srt_path, encoding="utf-8") as f:
+        return list(srt.parse(f.read()))
+
+
+def _tee_target(path, streams):
+    """One tee muxer slave writing the selected output streams to an MP4"""
+    return f"[select=\\'{','.join(streams)}\\':f=mp4:movflags=+faststart]{path}"
+
+
+def render_outputs(video_path: str, targets: Dict[str, str], srt_path: Optional[str] = None,
+                   dub_audio_path: Optional[str] = None, subtitle_mode: str = SUBTITLE_MODE,
+                   backend: str = SUBTITLE_BACKEND) -> Dict[str, str]:
+    """
+    Write every requested deliverable of a video
+
+    Args:
+        video_path: Path to the source video
+        targets: Deliverable name ('subtitled', 'dubbed', 'subtitled_dubbed') → output path
+        srt_path: Chinese SRT, required for the subtitled deliverables
+        dub_audio_path: Chinese audio track, required for the dubbed deliverables
+        subtitle_mode: "burn" draws the subtitles in, "soft" adds a mov_text track
+        backend: Burn-in renderer, "overlay", "ffmpeg" or "composite"
+
+    Returns:
+        dict: Deliverable name → written path
+    """
+    plan = plan_outputs(targets, subtitle_mode)
+    if any(d.startswith('subtitled') for d in targets) and not srt_path:
+        raise ValueError("Subtitled deliverables need an SRT file")
+    if any(d.endswith('dubbed') for d in targets) and not dub_audio_path:
+        raise ValueError("Dubbed deliverables need a Chinese audio track")
+    print(f"🗺️  Output plan: encode {plan['encode'] or 'nothing'}, stream copy {plan['copy'] or 'nothing'}")
+
+    media = probe_media(video_path)
+    duration = _duration(video_path)
+    written = {}
+
+    if plan['encode']:
+        encoded = {d: targets[d] for d in plan['encode']}
+        if backend == 'composite':
+            written.update(_render_composite(video_path, encoded, srt_path, dub_audio_path, media, duration))
+        else:
+            written.update(_render_shared_encode(video_path, encoded, srt_path, dub_audio_path, media, duration,
+                                                 backend))
+
+    for deliverable in plan['copy']:
+        subtitle_path = srt_path if deliverable.startswith('subtitled') else None
+        audio_path = dub_audio_path if deliverable.endswith('dubbed') else None
+        written[deliverable] = stream_copy_output(video_path, targets[deliverable], media, duration,
+                                                  audio_path=audio_path, subtitle_path=subtitle_path)
+
+    for deliverable, path in written.items():
+        print(f"✅ {deliverable} video: {path}")
+    return written
+
+
+def _duration(video_path):
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    return ffmpeg_parse_infos(video_path)['duration']
+
+
+def _render_shared_encode(video_path, encoded, srt_path, dub_audio_path, media, duration, backend):
+    """Burn subtitles once and tee the single H.264 stream to every burned deliverable"""
+    # Output streams: the video, then the original audio (if any), then the dub (if needed)
+    maps, audio_args, inputs = [], [], []
+    audio_streams = {}
+    source_input = 1 if backend == 'overlay' else 0
+    next_input = source_input + 1
+    if 'subtitled' in encoded and media['audio_codec']:
+        maps += ['-map', f'{source_input}:a:0']
+        audio_streams['subtitled'] = len(audio_streams)
+        audio_args += ([f'-c:a:{audio_streams["subtitled"]}', 'copy'] if media['audio_codec'] == 'aac'
+                       else _per_stream(audio_encode_args(), audio_streams['subtitled']))
+    if 'subtitled_dubbed' in encoded:
+        inputs += ['-i', dub_audio_path]
+        maps += ['-map', f'{next_input}:a:0']
+        index = audio_streams['subtitled_dubbed'] = len(audio_streams)
+        # The dub is padded with silence so it covers the whole video
+        audio_args += _per_stream(audio_encode_args(), index) + [f'-filter:a:{index}', 'apad']
+
+    tee = "|".join(
+        _tee_target(path, ['v:0'] + ([f'a:{audio_streams[d]}'] if d in audio_streams else []))
+        for d, path in encoded.items()
+    )
+    output_args = [*maps, *video_encode_args(), *audio_args, '-t', f"{duration:.3f}", '-f', 'tee', tee]
+
+    print(f"🎞️  One encode for {', '.join(encoded)} ({backend} subtitles)...")
+    if backend == 'overlay':
+        stream_subtitle_overlay(video_path, _load_subtitles(srt_path),
+                                ['-i', video_path, *inputs, '-map', '0:v:0', *output_args])
+    else:
+        from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+        height = ffmpeg_parse_infos(video_path)['video_size'][1]
+        run_ffmpeg(['-i', video_path, *inputs, '-filter:v', subtitles_filter(srt_path, height), '-map', '0:v:0',
+                    *output_args])
+    return dict(encoded)
+
+
+def _per_stream(args, index):
+    """Scope codec options like ['-c:a', 'aac', '-b:a', '192k'] to one output audio stream"""
+    return [f"{arg}:{index}" if arg.startswith('-') and arg.endswith(':a') else arg for arg in args]
+
+
+def _render_composite(video_path, encoded, srt_path, dub_audio_path, media, duration):
+    """MoviePy can only write one file, so burn once and swap the dub in by stream copy"""
+    written = {}
+    # Without a subtitled deliverable the burn goes to a scratch file: ffmpeg cannot
+    # swap the audio of a file in place
+    subtitled_path = encoded.get('subtitled') or f"{os.path.splitext(encoded['subtitled_dubbed'])[0]}_burned.mp4"
+    burn_subtitles_composite(video_path, _load_subtitles(srt_path), subtitled_path)
+    try:
+        if 'subtitled' in encoded:
+            written['subtitled'] = subtitled_path
+        if 'subtitled_dubbed' in encoded:
+            written['subtitled_dubbed'] = stream_copy_output(subtitled_path, encoded['subtitled_dubbed'],
+                                                             probe_media(subtitled_path), duration,
+                                                             audio_path=dub_audio_path)
+    finally:
+        if 'subtitled' not in encoded and os.path.exists(subtitled_path):
+            os.remove(subtitled_path)
+    return written
+
+
+def stream_copy_output(video_path: str, output_path: str, media: Optional[dict] = None,
+                       duration: Optional[float] = None, audio_path: Optional[str] = None,
+                       subtitle_path: Optional[str] = None, audio_pcm: Optional[tuple] = None) -> str:
+    """
+    Copy the video stream into a new MP4, optionally swapping the audio and adding a subtitle track
+
+    Only the replacement audio is encoded, so the cost does not depend on the
+    video's resolution or length beyond reading it once.
+
+    Args:
+        video_path: Source video
+        output_path: Where to write the MP4
+        media: probe_media() result for the source (probed if not given)
+        duration: Source duration in seconds, the replacement audio is padded or trimmed to it
+        audio_path: Replacement audio track (the source audio is kept if not given)
+        subtitle_path: Subtitle file muxed as a mov_text track
+        audio_pcm: Replacement audio as a (mono float32 PCM, sample rate) tuple,
+            piped to ffmpeg's stdin instead of read from a file
+
+    Returns:
+        str: output_path
+    """
+    media = media or probe_media(video_path)
+    args = ['-i', video_path]
+    maps = ['-map', '0:v:0']
+    # Anything but H.264 is re-encoded so the MP4 plays everywhere
+    codecs = ['-c:v', 'copy'] if media['video_codec'] in COMPATIBLE_VIDEO_CODECS else video_encode_args()
+    next_input = 1
+
+    stdin = None
+    if audio_pcm is not None:
+        pcm, sample_rate = audio_pcm
+        stdin = pcm.astype('<f4', copy=False).tobytes()
+        audio_path = 'pipe:0'
+        args += ['-f', 'f32le', '-ar', str(sample_rate), '-ac', '1']
+    if audio_path:
+        args += ['-i', audio_path]
+        maps += ['-map', f'{next_input}:a:0']
+        codecs += [*audio_encode_args(), '-af', 'apad']
+        next_input += 1
+        if duration is None:
+            duration = _duration(video_path)
+    elif media['audio_codec']:
+        maps += ['-map', '0:a:0']
+        codecs += ['-c:a', 'copy'] if media['audio_codec'] == 'aac' else audio_encode_args()
+
+    if subtitle_path:
+        args += ['-i', subtitle_path]
+        maps += ['-map', f'{next_input}:0']
+        codecs += ['-c:s', 'mov_text', '-metadata:s:s:0', 'language=chi']
+
+    trim = ['-t', f"{duration:.3f}"] if audio_path else []
+    run_ffmpeg([*args, *maps, *codecs, *trim, '-movflags', '+faststart', output_path], input_bytes=stdin)
+    return output_path
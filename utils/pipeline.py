@@ -0,0 +1,409 @@
+"""
+Single-pass video pipeline
+
+Runs every stage (download, extract, transcribe, translate, subtitles, TTS,
+mux) exactly once per video and passes each result downstream, so the
+subtitle and dubbing outputs share one transcript and one translation. The
+mux stage renders every requested deliverable with utils.output_planner,
+so burned-in subtitles cost one encode however many outputs use them.
+
+With streaming=True the transcribe stage feeds each Whisper segment
+straight into translation and TTS (utils.streaming_pipeline), and the
+translate and TTS stages only save what was produced along the way.
+
+Completed stages are recorded in a per-video JobManifest; with resume=True
+a rerun after a crash skips every stage whose artifacts are still intact.
+"""
+import json
+import os
+from contextlib import nullcontext
+from typing import Iterable, Optional
+
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from .job_manifest import JobManifest
+from .video_tools import download_video
+from .whisper_tools import (WHISPER_SAMPLE_RATE, extract_audio_pcm, has_cached_transcript, segments_to_text,
+                            transcribe_segments)
+from .translate_tools import join_translations, translate_segments, translate_text
+from .subtitle_tools import SUBTITLE_MODE, create_subtitles, get_subtitle_output_paths
+from .tts_tools import create_chinese_audio_track, get_tone_output_path
+from .output_planner import DEFAULT_DELIVERABLES, plan_outputs, render_outputs
+from .streaming_pipeline import stream_dubbing
+
+
+# Pipeline attribute holding each deliverable's output path
+DELIVERABLE_ATTRIBUTES = {
+    'subtitled': 'subtitled_video_path',
+    'dubbed': 'speaking_video_path',
+    'subtitled_dubbed': 'subtitled_speaking_video_path',
+}
+
+
+class VideoPipeline:
+    """Download → extract → transcribe → translate → subtitles → TTS → mux, each stage once"""
+
+    STAGES = ("download", "extract", "transcribe", "translate", "subtitles", "tts", "mux")
+
+    # Upstream stages whose results each stage consumes
+    STAGE_DEPENDENCIES = {
+        'download': (),
+        'extract': ('download',),
+        'transcribe': ('extract',),
+        'translate': ('transcribe',),
+        'subtitles': ('download', 'translate'),
+        'tts': ('download', 'translate'),
+        'mux': ('download', 'subtitles', 'tts'),
+    }
+
+    # Attributes each stage produces: files are hashed into the manifest, values stored
+    # as-is; optional artifacts may legitimately be absent (a video without audio)
+    STAGE_OUTPUTS = {
+        'download': {'artifacts': ('video_path',), 'values': ()},
+        'extract': {'artifacts': (), 'values': ('video_duration',)},
+        'transcribe': {'artifacts': ('segments_path',), 'values': ('source_language',)},
+        'translate': {'artifacts': ('text_path',), 'optional_artifacts': ('translated_segments_path',), 'values': ()},
+        'subtitles': {'artifacts': ('srt_path',), 'values': ()},
+        'tts': {'artifacts': ('chinese_audio_path',), 'values': ()},
+        # Which videos mux must produce depends on the requested deliverables
+        'mux': {'artifacts': (), 'optional_artifacts': tuple(DELIVERABLE_ATTRIBUTES.values()), 'values': ()},
+    }
+
+    # Options each stage's output depends on; changing one on resume reruns the stage
+    STAGE_SETTINGS = {
+        'subtitles': ('subtitle_mode',),
+        'tts': ('tone_style',),
+        'mux': ('tone_style', 'subtitle_mode', 'deliverables'),
+    }
+
+    # Stages whose outputs are intermediate: once every consumer is complete they
+    # may be deleted without forcing a rerun (like make's .INTERMEDIATE)
+    INTERMEDIATE_STAGES = ('extract', 'tts')
+
+    def __init__(self, source: str, output_dir: str = "output", tone_style: str = 'default', resume: bool = False,
+                 stage_limits: Optional[dict] = None, subtitle_mode: str = SUBTITLE_MODE,
+                 deliverables: Iterable[str] = DEFAULT_DELIVERABLES, streaming: bool = False):
+        """
+        Args:
+            source: YouTube URL or path to a local video file
+            output_dir: Folder for text, subtitle and video outputs
+            tone_style: TTS tone style - 'default', 'sport', 'movie', 'nature', 'news', 'casual'
+            resume: Skip stages the job manifest records as complete
+            stage_limits: Stage name → context manager held while the stage runs, used by
+                utils.batch_tools to share CPU, Ollama and network slots between jobs
+            subtitle_mode: "burn" to draw subtitles into the video, "soft" to mux them as a track
+            deliverables: Videos to produce - 'subtitled', 'dubbed', 'subtitled_dubbed'
+            streaming: Translate and speak segments while Whisper is still transcribing;
+                the transcribe stage then holds its stage limit for all three
+        """
+        self.source = source
+        self.output_dir = output_dir
+        self.tone_style = tone_style
+        self.resume = resume
+        self.stage_limits = stage_limits or {}
+        self.subtitle_mode = subtitle_mode
+        self.deliverables = tuple(deliverables)
+        self.streaming = streaming
+        plan_outputs(dict.fromkeys(self.deliverables, ""), subtitle_mode)  # Reject unknown deliverables early
+        self.failed_stages = []
+        self.manifest = JobManifest(source, os.path.join(output_dir, "jobs"))
+
+        # Stage results, filled in as the pipeline runs or restored from the manifest
+        self.video_path: Optional[str] = None
+        self.video_duration: Optional[float] = None
+        self.audio_pcm = None  # Decoded audio, held only until transcribe
+        self.segments: Optional[list] = None
+        self.segments_path: Optional[str] = None
+        self.source_language: Optional[str] = None
+        self.transcript: Optional[str] = None
+        self.chinese_text: Optional[str] = None
+        self.text_path: Optional[str] = None
+        self.translated_segments: Optional[list] = None
+        self.translated_segments_path: Optional[str] = None
+        self.srt_path: Optional[str] = None
+        self.subtitled_video_path: Optional[str] = None
+        self.chinese_audio_path: Optional[str] = None
+        self.speaking_video_path: Optional[str] = None
+        self.subtitled_speaking_video_path: Optional[str] = None
+        # Translations and speech produced while streaming, consumed by the translate and TTS stages
+        self._streamed_translation: Optional[list] = None
+        self._streamed_speech: Optional[list] = None
+        self._unspoken_segments: Optional[list] = None  # Streamed segments whose TTS failed
+
+    @property
+    def video_title(self) -> str:
+        return os.path.splitext(os.path.basename(self.video_path))[0]
+
+    def run(self) -> "VideoPipeline":
+        """Run all stages in order and return the pipeline with its results"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        plan = self.plan()
+        completed = False
+        try:
+            for stage in self.STAGES:
+                if not self._stage_needed(stage):
+                    print(f"⏭️  Stage '{stage}' not needed for {', '.join(self.deliverables)}")
+                    continue
+                if not plan[stage]:
+                    print(f"⏭️  Skipping completed stage '{stage}'")
+                    self._restore_stage(stage)
+                    continue
+
+                # Anything downstream of a rerun stage is stale
+                self.manifest.discard((stage,) + self._dependents(stage))
+                with self.stage_limits.get(stage) or nullcontext():
+                    getattr(self, f"run_{stage}")()
+                self._record_stage(stage)
+            completed = True
+        finally:
+            self._cleanup(completed)
+        return self
+
+    def plan(self) -> dict:
+        """
+        Decide which stages to run
+
+        A stage runs when it is not recorded as complete, when its artifacts
+        changed or disappeared, when it was recorded with a different tone,
+        subtitle mode or set of deliverables, or when a stage it depends on
+        runs. Without resume every stage runs.
+
+        Returns:
+            dict: Stage name → True if it must run
+        """
+        if not self.resume:
+            return {stage: True for stage in self.STAGES}
+
+        runs = {}
+        for stage in self.STAGES:
+            if not self._stage_needed(stage):
+                runs[stage] = False
+                continue
+            complete = self._stage_complete(stage)
+            runs[stage] = not complete or any(runs[dep] for dep in self.STAGE_DEPENDENCIES[stage])
+
+        # An intermediate stage whose outputs are gone must rerun if a consumer
+        # runs; repeat until no more stages are pulled in
+        changed = True
+        while changed:
+            changed = False
+            for stage in self.STAGES:
+                if runs[stage] or not self._stage_needed(stage):
+                    continue
+                if stage in self.INTERMEDIATE_STAGES:
+                    consumers = [s for s in self.STAGES if stage in self.STAGE_DEPENDENCIES[s]]
+                    if any(runs[s] for s in consumers) and not self.manifest.artifacts_valid(stage):
+                        runs[stage] = changed = True
+                elif any(runs[dep] for dep in self.STAGE_DEPENDENCIES[stage]):
+                    runs[stage] = changed = True
+        return runs
+
+    def _stage_complete(self, stage: str) -> bool:
+        """True if the manifest records the stage with the current settings and its outputs"""
+        if not self.manifest.settings_match(stage, self._stage_settings(stage)):
+            return False
+        if stage in self.INTERMEDIATE_STAGES:
+            return self.manifest.is_recorded(stage)
+        if stage == 'mux':
+            # Every requested video must have been written, not just the recorded ones
+            recorded = self.manifest.stage(stage)['artifacts']
+            if any(DELIVERABLE_ATTRIBUTES[d] not in recorded for d in self.deliverables):
+                return False
+        return self.manifest.artifacts_valid(stage)
+
+    def _stage_settings(self, stage: str) -> dict:
+        settings = {name: getattr(self, name) for name in self.STAGE_SETTINGS.get(stage, ())}
+        if 'deliverables' in settings:
+            settings['deliverables'] = sorted(settings['deliverables'])
+        return settings
+
+    @property
+    def dubbing(self) -> bool:
+        return any(d.endswith('dubbed') for d in self.deliverables)
+
+    def _stage_needed(self, stage: str) -> bool:
+        """TTS only runs when a dubbed deliverable is requested"""
+        return stage != 'tts' or self.dubbing
+
+    def run_download(self):
+        if os.path.exists(self.source):
+            print(f"📂 Using local video: {self.source}")
+            self.video_path = self.source
+        else:
+            print("📥 Downloading video...")
+            self.video_path = download_video(self.source)
+        return self.video_path
+
+    def run_extract(self):
+        self.video_duration = ffmpeg_parse_infos(self.video_path)['duration']
+        if has_cached_transcript(self.video_path):
+            # Transcribe answers from the cache, so there is nothing to decode for
+            print("🗄️  Transcript cached, skipping the audio decode")
+            return self.video_duration
+
+        print("🎧 Decoding audio for transcription...")
+        # 16 kHz mono float32 in memory, handed straight to Whisper
+        self.audio_pcm = extract_audio_pcm(self.video_path)
+        if self.audio_pcm is None:
+            print("⚠️  Video has no audio track")
+        else:
+            print(f"✅ Audio decoded: {len(self.audio_pcm) / WHISPER_SAMPLE_RATE:.2f}s")
+        return self.video_duration
+
+    def run_transcribe(self):
+        print(f"🗣️ Transcribing {self.video_path}...")
+        # Segment-level results (with timestamps) are cached, so reruns skip Whisper; a
+        # resumed run that skipped extract decodes the audio here instead
+        detected = {}
+        if self.streaming:
+            self._stream_transcribe(detected)
+        else:
+            self.segments = transcribe_segments(self.video_path, audio=self.audio_pcm, detected=detected)
+        self.source_language = detected.get('language')
+        self.audio_pcm = None
+        self.transcript = segments_to_text(self.segments)
+        print(f"📝 Transcript: {self.transcript[:100]}...")
+
+        self.segments_path = os.path.join(self.manifest.job_dir, "segments.json")
+        with open(self.segments_path, "w", encoding="utf-8") as f:
+            json.dump(self.segments, f, ensure_ascii=False)
+        return self.transcript
+
+    def _stream_transcribe(self, detected: dict):
+        """Transcribe, translate and (when dubbing) speak every segment in one overlapped pass"""
+        segments, translated, speech, unspoken = [], [], [], []
+        for segment, translated_segment, pcm in stream_dubbing(self.video_path, self.tone_style, audio=self.audio_pcm,
+                                                               dub=self.dubbing, detected=detected):
+            segments.append(segment)
+            translated.append(translated_segment)
+            if pcm is None:
+                if translated_segment['text'].strip():
+                    unspoken.append(translated_segment)
+            elif len(pcm):
+                speech.append((translated_segment['start'], translated_segment['end'], pcm))
+        self.segments = segments
+        self._streamed_translation = translated
+        self._streamed_speech = speech if self.dubbing else None
+        self._unspoken_segments = unspoken if self.dubbing else None
+
+    def run_translate(self):
+        print("🌏 Translating to Chinese...")
+        if self.segments:
+            # Segment by segment, so subtitles keep Whisper's timing
+            self.translated_segments = (self._streamed_translation
+                                        or translate_segments(self.segments, source_language=self.source_language))
+            self.chinese_text = join_translations(s['text'] for s in self.translated_segments)
+            self.translated_segments_path = os.path.join(self.manifest.job_dir, "translated_segments.json")
+            with open(self.translated_segments_path, "w", encoding="utf-8") as f:
+                json.dump(self.translated_segments, f, ensure_ascii=False)
+        else:
+            self.chinese_text = translate_text(self.transcript, source_language=self.source_language)
+
+        print("📝 Saving Chinese text...")
+        self.text_path = os.path.join(self.output_dir, f"{self.video_title}.txt")
+        with open(self.text_path, "w", encoding="utf-8") as f:
+            f.write(self.chinese_text)
+        print(f"✅ Chinese text saved to: {self.text_path}")
+        return self.chinese_text
+
+    def run_subtitles(self):
+        print("📝 Creating subtitles...")
+        # Only the subtitle files; the mux stage renders the videos in one pass
+        self.srt_path = create_subtitles(self.video_path, self.chinese_text, self.output_dir, mode=self.subtitle_mode,
+                                         segments=self.translated_segments, render_video=False)
+        return self.srt_path
+
+    def run_tts(self):
+        print("🎵 Generating Chinese TTS with MoviePy (Python 3.13 compatible)...")
+        segments = self.translated_segments
+        if self._streamed_speech is not None:
+            # Only the segments whose TTS failed while streaming are synthesised again
+            segments = self._unspoken_segments
+            if segments:
+                print(f"🔁 Retrying TTS for {len(segments)} segments that failed while streaming...")
+        self.chinese_audio_path = create_chinese_audio_track(
+            self.chinese_text, self.video_duration, self._speaking_video_target(), self.tone_style,
+            segments=segments, speech=self._streamed_speech
+        )
+        return self.chinese_audio_path
+
+    def run_mux(self):
+        targets = self._deliverable_targets()
+        if self.dubbing and not self.chinese_audio_path:
+            print("❌ No Chinese audio track, skipping the dubbed videos")
+            targets = {d: path for d, path in targets.items() if not d.endswith('dubbed')}
+        if not targets:
+            return None
+
+        written = render_outputs(self.video_path, targets, srt_path=self.srt_path,
+                                 dub_audio_path=self.chinese_audio_path, subtitle_mode=self.subtitle_mode)
+        for deliverable, path in written.items():
+            setattr(self, DELIVERABLE_ATTRIBUTES[deliverable], path)
+        if self.speaking_video_path:
+            print(f"✅ Chinese speaking video created: {self.speaking_video_path}")
+        return written
+
+    def _deliverable_targets(self) -> dict:
+        """Output path per requested deliverable"""
+        paths = {
+            'subtitled': get_subtitle_output_paths(self.video_path, self.output_dir)[1],
+            'dubbed': self._speaking_video_target(),
+            'subtitled_dubbed': get_tone_output_path(
+                os.path.join(self.output_dir, f"{self.video_title}_chinese_speaking_with_zh_subtitles.mp4"),
+                self.tone_style),
+        }
+        return {d: paths[d] for d in self.deliverables}
+
+    def _dependents(self, stage: str) -> tuple:
+        """Stages that consume this stage's results, directly or transitively, in pipeline order"""
+        affected = {stage}
+        for candidate in self.STAGES:
+            if any(dep in affected for dep in self.STAGE_DEPENDENCIES[candidate]):
+                affected.add(candidate)
+        return tuple(s for s in self.STAGES if s in affected and s != stage)
+
+    def _record_stage(self, stage: str):
+        outputs = self.STAGE_OUTPUTS[stage]
+        required = outputs['artifacts']
+        if stage == 'mux':
+            required += tuple(DELIVERABLE_ATTRIBUTES[d] for d in self.deliverables)
+        artifacts = {name: getattr(self, name) for name in required}
+        missing = [name for name, path in artifacts.items() if not path or not os.path.exists(path)]
+        if missing:
+            # Leave the stage unrecorded so a resumed run tries it again
+            print(f"⚠️  Stage '{stage}' produced no {', '.join(missing)}, not checkpointing it")
+            self.failed_stages.append(stage)
+            return
+        for name in outputs.get('optional_artifacts', ()):
+            artifacts.setdefault(name, getattr(self, name))
+        values = {name: getattr(self, name) for name in outputs['values']}
+        self.manifest.record(stage, artifacts, values, self._stage_settings(stage))
+
+    def _restore_stage(self, stage: str):
+        entry = self.manifest.stage(stage)
+        for name, path in entry['artifacts'].items():
+            setattr(self, name, path)
+        for name, value in entry['values'].items():
+            setattr(self, name, value)
+
+        if stage == 'transcribe':
+            with open(self.segments_path, encoding="utf-8") as f:
+                self.segments = json.load(f)
+            self.transcript = segments_to_text(self.segments)
+        elif stage == 'translate':
+            with open(self.text_path, encoding="utf-8") as f:
+                self.chinese_text = f.read()
+            if self.translated_segments_path and os.path.exists(self.translated_segments_path):
+                with open(self.translated_segments_path, encoding="utf-8") as f:
+                    self.translated_segments = json.load(f)
+
+    def _speaking_video_target(self) -> str:
+        chinese_video_name = f"{self.video_title}_chinese_speaking.mp4"
+        return get_tone_output_path(os.path.join(self.output_dir, chinese_video_name), self.tone_style)
+
+    def _cleanup(self, completed: bool):
+        # The dubbed track is kept after a failure so a resumed run can go straight to muxing
+        if not (completed and self.manifest.is_recorded('mux')):
+            return
+        if self.chinese_audio_path and os.path.exists(self.chinese_audio_path):
+            os.remove(self.chinese_audio_path)
@@ -0,0 +1,216 @@
+"""
+Streaming transcription → translation → TTS
+
+faster-whisper yields segments lazily. Here each finished segment flows on
+into a translation batch and then into TTS without waiting for the rest of
+the file. Each stage runs in its own threads and hands results over through
+bounded queues, so Whisper (CPU) keeps decoding while Ollama and the TTS
+backend (I/O) work on earlier segments. Output always follows transcript
+order.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+from .translate_tools import MAX_CHUNK_SIZE, SEGMENT_BATCH_SIZE, get_translation_engine, needs_translation
+from .tts_engine import get_tts_engine
+from .tts_tools import get_tts_settings
+from .whisper_tools import iter_segments
+
+# Items buffered between two stages; bounds memory when a downstream stage is slower
+STREAM_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", "32"))
+
+_DONE = object()
+
+
+class _Failure:
+    """An exception raised in a producer thread, re-raised in the consumer"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def run_in_background(iterable: Iterable, maxsize: int = STREAM_QUEUE_SIZE) -> Iterator:
+    """
+    Drain an iterable in a daemon thread and yield its items through a bounded queue
+
+    Errors in the producer are re-raised in the consumer. A consumer that
+    stops early stops the producer at its next item.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
+
+
+def ordered_map(func, iterable: Iterable, max_workers: int) -> Iterator:
+    """
+    Like executor.map() over a lazy iterable
+
+    Items are submitted as they arrive, at most max_workers run at once, and
+    each result is yielded as soon as it and every result before it are done.
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        futures = (executor.submit(func, item) for item in iterable)
+        for future in run_in_background(futures, maxsize=max(1, max_workers)):
+            yield future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def growing_batches(segments: Iterable[dict], batch_size: int = SEGMENT_BATCH_SIZE,
+                    max_chars: int = MAX_CHUNK_SIZE) -> Iterator[list]:
+    """
+    Group segments into (segment index, segment) batches as they arrive
+
+    The first batch holds one segment and each later one doubles, up to
+    batch_size, so the first translation is not held back waiting for a
+    full batch while later ones still get the benefit of batching.
+    """
+    size = 1
+    batch, chars = [], 0
+    for i, segment in enumerate(segments):
+        batch.append((i, segment))
+        chars += len(segment['text'])
+        if len(batch) >= size or chars >= max_chars:
+            yield batch
+            batch, chars = [], 0
+            size = min(size * 2, batch_size)
+    if batch:
+        yield batch
+
+
+def _translate_batch(engine, batch, source_language=None):
+    """Translate one batch, falling back to one request per segment for lines the reply missed"""
+    if not needs_translation("".join(segment['text'] for _, segment in batch), source_language):
+        return [(segment, dict(segment)) for _, segment in batch]
+    items = [(i, segment['text'].strip()) for i, segment in batch if segment['text'].strip()]
+    translations = engine.translate_segment_batch(items) if items else {}
+    for i, text in items:
+        if not translations.get(i):
+            translations[i] = engine.translate_chunk(text)
+    return [(segment, {**segment, 'text': translations.get(i, "")}) for i, segment in batch]
+
+
+def stream_translations(segments: Iterable[dict], engine=None, batch_size: int = SEGMENT_BATCH_SIZE,
+                        detected: Optional[dict] = None) -> Iterator[tuple]:
+    """
+    Translate segments in numbered batches while more segments are still arriving
+
+    Args:
+        segments: Segments in transcript order
+        engine: TranslationEngine to use (default: the process-wide engine)
+        batch_size: Largest number of segments per request
+        detected: Filled in by whisper_tools.iter_segments; batches of a Simplified
+            Chinese source are passed through without calling Ollama
+
+    Yields:
+        tuple: (segment, copy of the segment with its Chinese translation as text)
+    """
+    engine = engine or get_translation_engine()
+    detected = {} if detected is None else detected
+    batches = growing_batches(segments, batch_size)
+
+    def translate(batch):
+        return _translate_batch(engine, batch, detected.get('language'))
+
+    for translated in ordered_map(translate, batches, engine.max_in_flight):
+        yield from translated
+
+
+def stream_speech(pairs: Iterable[tuple], tone_style: str = 'default', engine=None) -> Iterator[tuple]:
+    """
+    Speak translated segments as they arrive, several at a time
+
+    Args:
+        pairs: (segment, translated segment) tuples from stream_translations
+
+    Yields:
+        tuple: (segment, translated segment, mono float32 PCM at the engine's sample rate,
+            or None if synthesis failed so the segment can be spoken again later)
+    """
+    engine = engine or get_tts_engine()
+    settings = get_tts_settings(tone_style)
+
+    def speak(pair):
+        segment, translated = pair
+        try:
+            return segment, translated, engine.synthesize_text(translated['text'], settings, tone_style)
+        except Exception as e:
+            # One failed request (rate limit, network) must not cost the transcript
+            print(f"⚠️  TTS failed for segment at {translated['start']:.2f}s, leaving it for later: {e}")
+            return segment, translated, None
+
+    yield from ordered_map(speak, pairs, engine.max_workers)
+
+
+def stream_dubbing(audio_path: str, tone_style: str = 'default', language: Optional[str] = None,
+                   audio: Optional[np.ndarray] = None, dub: bool = True, translation_engine=None,
+                   tts_engine=None, detected: Optional[dict] = None) -> Iterator[tuple]:
+    """
+    Transcribe, translate and speak a file with every stage overlapping
+
+    Args:
+        audio_path: Path to audio or video file
+        tone_style: TTS tone style - 'default', 'sport', 'movie', 'nature', 'news', 'casual'
+        language: Source language code, or None to let Whisper detect it
+        audio: audio_path already decoded by whisper_tools.extract_audio_pcm (optional)
+        dub: Also synthesise speech; without it the PCM is None, as it is for
+            segments whose synthesis failed
+        translation_engine: TranslationEngine to use (default: the process-wide engine)
+        tts_engine: TTSEngine to use (default: the process-wide engine)
+        detected: Dict that receives the source language under 'language' (optional)
+
+    Yields:
+        tuple: (segment, translated segment, PCM or None), in transcript order
+    """
+    started_at = time.perf_counter()
+    detected = {} if detected is None else detected
+    segments = run_in_background(iter_segments(audio_path, language=language, audio=audio, detected=detected))
+    results = stream_translations(segments, translation_engine, detected=detected)
+    if dub:
+        results = stream_speech(results, tone_style, tts_engine)
+    else:
+        results = ((segment, translated, None) for segment, translated in results)
+
+    count = 0
+    for result in results:
+        if count == 0:
+            print(f"⚡ First segment through the pipeline after {time.perf_counter() - started_at:.2f}s")
+        count += 1
+        yield result
+    print(f"✅ Streamed {count} segments in {time.perf_counter() - started_at:.2f}s")
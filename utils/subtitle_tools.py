@@ -1,7 +1,93 @@
 import srt
 import datetime
+import functools
+import os
+import numpy as np
 from moviepy import VideoFileClip, TextClip, CompositeVideoClip
 
+# Fonts tried in order for Chinese subtitles - prefer bold fonts
+SUBTITLE_FONT_PATHS = (
+    "C:/Windows/Fonts/msyhbd.ttc",  # Microsoft YaHei Bold (preferred for visibility)
+    "C:/Windows/Fonts/msyh.ttc",    # Microsoft YaHei (modern, clean)
+    "C:/Windows/Fonts/simhei.ttf",  # SimHei (bold style)
+    "C:/Windows/Fonts/simsun.ttc",  # SimSun (classic)
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Bold.ttc",  # Noto Sans CJK (Linux)
+    "/System/Library/Fonts/PingFang.ttc",                   # PingFang (macOS)
+)
+SUBTITLE_FONT_SIZE = 32      # Double the previous size from 16 to 32
+SUBTITLE_BAND_HEIGHT = 100   # Height of the rendered subtitle strip in pixels
+SUBTITLE_STYLE = {
+    'fill': '#FFFFFF',         # White main text
+    'stroke_fill': '#000000',  # Black outline for maximum readability
+    'stroke_width': 2,
+}
+# Burn-in backends for create_subtitles: "overlay", "ffmpeg" (libass) or "composite" (MoviePy)
+SUBTITLE_BACKENDS = ('overlay', 'ffmpeg', 'composite')
+SUBTITLE_BACKEND = os.environ.get("SUBTITLE_BACKEND", "overlay")
+# "burn" draws the text into the frames, "soft" muxes a selectable mov_text track without re-encoding
+SUBTITLE_MODES = ('burn', 'soft')
+SUBTITLE_MODE = os.environ.get("SUBTITLE_MODE", "burn")
+# Extra sidecar formats written next to the SRT, e.g. "vtt,ass"
+SUBTITLE_EXTRA_FORMATS = tuple(f for f in os.environ.get("SUBTITLE_EXTRA_FORMATS", "").split(",") if f)
+
+
+@functools.lru_cache(maxsize=None)
+def load_subtitle_font(font_size=SUBTITLE_FONT_SIZE, font_paths=SUBTITLE_FONT_PATHS):
+    """
+    Load the first usable subtitle font, once per process
+
+    Returns:
+        tuple: (PIL font, font path or None for PIL's default font)
+    """
+    from PIL import ImageFont
+
+    for font_path in font_paths:
+        if os.path.exists(font_path):
+            try:
+                return ImageFont.truetype(font_path, font_size), font_path
+            except Exception:
+                continue
+    return ImageFont.load_default(), None
+
+
+def render_subtitle_bitmap(text, width, height=SUBTITLE_BAND_HEIGHT, font_size=SUBTITLE_FONT_SIZE,
+                           style=tuple(sorted(SUBTITLE_STYLE.items())), font_path=None):
+    """
+    Render one subtitle line to an RGBA bitmap, cached by (text, width, height, font, font size, style)
+
+    The outline is a single stroked draw instead of one shadow pass per offset.
+
+    Args:
+        font_path: Font file to draw with (default: the first usable SUBTITLE_FONT_PATHS entry)
+
+    Returns:
+        np.ndarray: Read-only (height, width, 4) uint8 RGBA array
+    """
+    if font_path is None:
+        _, font_path = load_subtitle_font(font_size, SUBTITLE_FONT_PATHS)
+    return _render_subtitle_bitmap(text, width, height, font_path, font_size, style)
+
+
+@functools.lru_cache(maxsize=2048)
+def _render_subtitle_bitmap(text, width, height, font_path, font_size, style):
+    from PIL import Image, ImageDraw
+
+    style = dict(style)
+    font, _ = load_subtitle_font(font_size, (font_path,) if font_path else ())
+    img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+
+    # Get text dimensions and center it
+    bbox = draw.textbbox((0, 0), text, font=font)
+    x = (width - (bbox[2] - bbox[0])) // 2
+    y = (height - (bbox[3] - bbox[1])) // 2
+    draw.text((x, y), text, font=font, fill=style['fill'],
+              stroke_width=style['stroke_width'], stroke_fill=style['stroke_fill'])
+
+    bitmap = np.asarray(img)
+    bitmap.setflags(write=False)  # Shared between callers through the cache
+    return bitmap
+
 def test_subtitle_visibility():
     """Test function to create a simple video with visible Chinese subtitles"""
     print("🧪 Testing subtitle visibility...")
@@ -128,35 +214,387 @@ def test_subtitle_visibility():
     print("🎨 Improved contrast: white text with black shadow for better readability")
     return "subtitle_test.mp4"
 
-def create_subtitles(video_path, zh_text):
+def get_subtitle_output_paths(video_path, output_dir="output"):
+    """
+    Paths of the SRT file and subtitled video create_subtitles writes for a video
+
+    Returns:
+        tuple: (srt_path, output_video_path)
+    """
     import os
-    
+
+    # Any container works as a source (batch mode takes .mkv, .mov, ...); outputs are always SRT and MP4
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    srt_path = os.path.join(output_dir, f"{name}_zh.srt")
+    output_video_path = os.path.join(output_dir, f"{name}_with_zh_subtitles.mp4")
+    return srt_path, output_video_path
+
+def segments_to_subtitles(segments):
+    """
+    SRT cues timed by translated Whisper segments
+
+    Args:
+        segments: Dicts with start, end (seconds) and Chinese text
+
+    Returns:
+        list: srt.Subtitle per non-empty segment, numbered from 1
+    """
+    subtitles = []
+    for segment in segments:
+        content = segment['text'].strip()
+        if not content:
+            continue
+        subtitles.append(srt.Subtitle(index=len(subtitles) + 1,
+                                      start=datetime.timedelta(seconds=segment['start']),
+                                      end=datetime.timedelta(seconds=segment['end']),
+                                      content=content))
+    return subtitles
+
+
+def create_subtitles(video_path, zh_text, output_dir="output", backend=SUBTITLE_BACKEND, mode=SUBTITLE_MODE,
+                     extra_formats=SUBTITLE_EXTRA_FORMATS, segments=None, render_video=True):
+    """
+    Write the Chinese SRT and a video carrying the subtitles
+
+    Args:
+        video_path: Path to input video
+        zh_text: Chinese text, one cue per sentence
+        output_dir: Folder for the SRT and subtitled video
+        backend: Burn-in renderer: "overlay" (default; stream frames through ffmpeg,
+            blend only the active cue's band in place), "ffmpeg" (libass subtitles
+            filter) or "composite" (MoviePy CompositeVideoClip)
+        mode: "burn" (default) re-encodes with the text drawn in, "soft" stream-copies
+            the video and adds the SRT as a selectable mov_text track
+        extra_formats: Additional sidecar files to write next to the SRT ("vtt", "ass")
+        segments: Translated Whisper segments (start, end, text); when given, cues
+            follow their timing and zh_text is not used
+        render_video: False writes only the subtitle files, leaving the video to
+            utils.output_planner
+
+    Returns:
+        str: Path to the SRT file
+    """
+    if backend not in SUBTITLE_BACKENDS:
+        raise ValueError(f"Unknown subtitle backend '{backend}', use one of {SUBTITLE_BACKENDS}")
+    if mode not in SUBTITLE_MODES:
+        raise ValueError(f"Unknown subtitle mode '{mode}', use one of {SUBTITLE_MODES}")
+
     # Create output directory
-    output_dir = "output"
     os.makedirs(output_dir, exist_ok=True)
+    srt_path, output_video_path = get_subtitle_output_paths(video_path, output_dir)
     
     # Create subtitle segments
-    lines = zh_text.split("。")
-    subtitles = []
-    start = datetime.timedelta(seconds=0)
-    step = 3
-    for i, line in enumerate(lines):
-        end = start + datetime.timedelta(seconds=step)
-        subtitles.append(srt.Subtitle(index=i+1, start=start, end=end, content=line.strip()))
-        start = end
+    if segments:
+        subtitles = segments_to_subtitles(segments)
+    else:
+        # No timing available: one sentence per fixed 3-second slot
+        lines = zh_text.split("。")
+        subtitles = []
+        start = datetime.timedelta(seconds=0)
+        step = 3
+        for i, line in enumerate(lines):
+            end = start + datetime.timedelta(seconds=step)
+            subtitles.append(srt.Subtitle(index=i+1, start=start, end=end, content=line.strip()))
+            start = end
 
     # Create SRT file
     srt_text = srt.compose(subtitles)
-    filename = os.path.basename(video_path)
-    srt_filename = filename.replace(".mp4", "_zh.srt")
-    srt_path = os.path.join(output_dir, srt_filename)
     with open(srt_path, "w", encoding="utf-8") as f:
         f.write(srt_text)
+    for extension in extra_formats:
+        print(f"📄 Subtitles saved to: {convert_subtitles(srt_path, extension)}")
+
+    if not render_video:
+        print(f"✅ Subtitles saved to: {srt_path}")
+        return srt_path
+
+    if mode == 'soft':
+        print(f"🎞️  Muxing {len(subtitles)} subtitles as a soft subtitle track...")
+        mux_soft_subtitles(video_path, srt_path, output_video_path)
+    elif backend == 'overlay':
+        print(f"🎞️  Burning {len(subtitles)} subtitles with the '{backend}' backend...")
+        burn_subtitles_overlay(video_path, subtitles, output_video_path)
+    elif backend == 'ffmpeg':
+        print(f"🎞️  Burning {len(subtitles)} subtitles with the '{backend}' backend...")
+        burn_subtitles_ffmpeg(video_path, srt_path, output_video_path)
+    else:
+        print(f"🎞️  Burning {len(subtitles)} subtitles with the '{backend}' backend...")
+        burn_subtitles_composite(video_path, subtitles, output_video_path)
     
-    # Create video with embedded Chinese subtitles
-    output_filename = filename.replace(".mp4", "_with_zh_subtitles.mp4")
-    output_video_path = os.path.join(output_dir, output_filename)
+    print(f"✅ Video exported to: {output_video_path}")
+    print(f"✅ Subtitles saved to: {srt_path}")
+    if mode == 'burn' and backend in ('overlay', 'composite'):
+        # libass draws its own text; only these two render bitmaps
+        print(f"🗄️  Subtitle bitmap cache: {_render_subtitle_bitmap.cache_info()}")
     
+    return srt_path
+
+
+def convert_subtitles(srt_path, extension):
+    """
+    Write a copy of an SRT file in another subtitle format with ffmpeg
+
+    Args:
+        srt_path: Path to the SRT file
+        extension: Target format, "vtt" (WebVTT) or "ass"
+
+    Returns:
+        str: Path of the converted file, next to the SRT
+    """
+    from .video_tools import run_ffmpeg
+
+    output_path = os.path.splitext(srt_path)[0] + "." + extension.lstrip(".")
+    run_ffmpeg(['-i', srt_path, output_path])
+    return output_path
+
+
+def mux_soft_subtitles(video_path, subtitle_path, output_video_path, language="chi"):
+    """
+    Add a subtitle file to an MP4 as a selectable mov_text track
+
+    Video and audio are stream-copied, so this takes seconds regardless of length.
+
+    Args:
+        video_path: Path to input video
+        subtitle_path: SRT (or any format ffmpeg reads) to embed
+        output_video_path: Where to write the MP4
+        language: ISO 639-2 code tagged on the subtitle stream
+    """
+    from .video_tools import run_ffmpeg
+
+    run_ffmpeg(['-i', video_path, '-i', subtitle_path,
+                '-map', '0:v:0', '-map', '0:a?', '-map', '1:0',
+                '-c', 'copy', '-c:s', 'mov_text', '-metadata:s:s:0', f'language={language}',
+                '-movflags', '+faststart', output_video_path])
+    return output_video_path
+
+
+def _subtitle_cues(subtitles, video_duration):
+    """(start, end, text) for every non-empty subtitle, clipped to the video duration"""
+    cues = []
+    for subtitle in subtitles:
+        content = subtitle.content.strip()
+        start_time = subtitle.start.total_seconds()
+        end_time = min(subtitle.end.total_seconds(), video_duration)
+        if not content or start_time >= video_duration or end_time <= start_time:
+            continue
+        cues.append((start_time, end_time, content))
+    return cues
+
+
+class SubtitleOverlay:
+    """
+    Burns pre-rendered cues into RGB frames
+
+    Cues are kept in an interval index (sorted start times searched with
+    bisect), so each frame does one O(log n) lookup and touches only the
+    active cue. Blending writes into the frame's subtitle band in place.
+    """
+
+    def __init__(self, cues, frame_width, frame_height, top=None):
+        """
+        Args:
+            cues: (start, end, text) tuples that do not overlap
+            frame_width, frame_height: Frame size in pixels
+            top: Row of the subtitle band's top edge (default: 2/3 down the frame)
+        """
+        import bisect
+        self._bisect = bisect.bisect_right
+
+        self.cues = sorted(cues)
+        self.starts = [cue[0] for cue in self.cues]
+        self.top = frame_height * 2 // 3 if top is None else top
+        self.frame_height = frame_height
+        self.frame_width = frame_width
+        self._layers = {}
+        self._scratch = None
+
+    def _layer(self, text):
+        """Alpha and premultiplied colour for the opaque part of a cue's bitmap"""
+        layer = self._layers.get(text)
+        if layer is None:
+            bitmap = render_subtitle_bitmap(text, self.frame_width)
+            alpha = bitmap[:, :, 3]
+            rows = np.flatnonzero(alpha.any(axis=1))
+            cols = np.flatnonzero(alpha.any(axis=0))
+            if rows.size == 0:
+                layer = None
+            else:
+                r0, r1 = rows[0], rows[-1] + 1
+                c0, c1 = cols[0], cols[-1] + 1
+                # Keep the band inside the frame
+                r1 = min(r1, self.frame_height - self.top)
+                a = bitmap[r0:r1, c0:c1, 3:4].astype(np.float32) / 255.0
+                premultiplied = bitmap[r0:r1, c0:c1, :3].astype(np.float32) * a
+                layer = (self.top + r0, c0, 1.0 - a, premultiplied)
+            self._layers[text] = layer
+        return layer
+
+    def active_cue(self, t):
+        i = self._bisect(self.starts, t) - 1
+        if i >= 0 and t < self.cues[i][1]:
+            return self.cues[i]
+        return None
+
+    def apply(self, frame, t):
+        """Blend the cue active at time t into a writable (h, w, 3) uint8 frame in place"""
+        cue = self.active_cue(t)
+        if cue is None:
+            return frame
+        layer = self._layer(cue[2])
+        if layer is None:
+            return frame
+
+        y, x, inverse_alpha, premultiplied = layer
+        h, w = inverse_alpha.shape[:2]
+        if self._scratch is None or self._scratch.shape[0] < h or self._scratch.shape[1] < w:
+            self._scratch = np.empty((max(h, 1), self.frame_width, 3), dtype=np.float32)
+        scratch = self._scratch[:h, :w]
+
+        band = frame[y:y + h, x:x + w]
+        np.multiply(band, inverse_alpha, out=scratch)
+        scratch += premultiplied
+        np.copyto(band, scratch, casting='unsafe')
+        return frame
+
+
+def burn_subtitles_overlay(video_path, subtitles, output_video_path):
+    """
+    Burn subtitles by streaming raw frames from one ffmpeg process to another
+
+    Frames are read into a single reused buffer, the active cue is blended
+    into it in place, and the same buffer is written to the encoder; no
+    per-frame clip compositing or full-frame copies happen in Python.
+    """
+    from .video_tools import audio_encode_args, probe_media, video_encode_args
+
+    audio_args = ['-c:a', 'copy'] if probe_media(video_path)['audio_codec'] == 'aac' else audio_encode_args()
+    stream_subtitle_overlay(video_path, subtitles,
+                            ['-i', video_path, '-map', '0:v:0', '-map', '1:a:0?', *video_encode_args(), *audio_args,
+                             '-movflags', '+faststart', '-shortest', output_video_path])
+    return output_video_path
+
+
+def stream_subtitle_overlay(video_path, subtitles, encoder_args):
+    """
+    Decode a video, blend the subtitles into each frame and pipe the frames to an ffmpeg encoder
+
+    Args:
+        video_path: Path to input video
+        subtitles: srt.Subtitle cues to burn in
+        encoder_args: Encoder arguments after its raw-frame input (input 0);
+            further inputs (for audio) are numbered from 1
+
+    Returns:
+        int: Number of frames written
+    """
+    import subprocess
+    import tempfile
+    from moviepy.config import FFMPEG_BINARY
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+    infos = ffmpeg_parse_infos(video_path)
+    width, height = infos['video_size']
+    fps = infos['video_fps']
+    overlay = SubtitleOverlay(_subtitle_cues(subtitles, infos['duration']), width, height)
+
+    decoder_cmd = [FFMPEG_BINARY, '-loglevel', 'error', '-i', video_path, '-map', '0:v:0',
+                   '-r', str(fps), '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-']
+    encoder_cmd = [FFMPEG_BINARY, '-y', '-loglevel', 'error',
+                   '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f"{width}x{height}", '-r', str(fps), '-i', '-',
+                   *encoder_args]
+
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    view = memoryview(frame).cast('B')
+    frame_size = frame.nbytes
+
+    with tempfile.TemporaryFile() as decoder_log, tempfile.TemporaryFile() as encoder_log:
+        decoder = subprocess.Popen(decoder_cmd, stdout=subprocess.PIPE, stderr=decoder_log)
+        encoder = subprocess.Popen(encoder_cmd, stdin=subprocess.PIPE, stderr=encoder_log)
+        index = 0
+        try:
+            while True:
+                filled = 0
+                while filled < frame_size:
+                    n = decoder.stdout.readinto(view[filled:])
+                    if not n:
+                        break
+                    filled += n
+                if filled < frame_size:
+                    break
+                overlay.apply(frame, index / fps)
+                try:
+                    encoder.stdin.write(view)
+                except BrokenPipeError:
+                    # The encoder exited early; its log explains why
+                    break
+                index += 1
+        finally:
+            decoder.stdout.close()
+            try:
+                encoder.stdin.close()
+            except BrokenPipeError:
+                pass
+            decoder.wait()
+            encoder.wait()
+
+        if decoder.returncode != 0 or encoder.returncode != 0:
+            decoder_log.seek(0)
+            encoder_log.seek(0)
+            errors = (encoder_log.read() + decoder_log.read()).decode('utf-8', 'replace').strip()
+            raise RuntimeError(f"ffmpeg subtitle overlay failed: {errors}")
+    print(f"✅ Burned subtitles into {index} frames")
+    return index
+
+
+def _escape_filter_path(path):
+    """Escape a path for use inside an ffmpeg filter argument (handles Windows drive colons)"""
+    path = os.path.abspath(path).replace('\\', '/')
+    return path.replace(':', '\\:').replace("'", "\\'")
+
+
+def burn_subtitles_ffmpeg(video_path, subtitle_path, output_video_path):
+    """
+    Burn an SRT/ASS file with ffmpeg's libass subtitles filter in one ffmpeg pass
+
+    Styled to match the bitmap renderer: white text, black outline, centred
+    about two thirds of the way down the frame.
+    """
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    from .video_tools import audio_encode_args, probe_media, run_ffmpeg, video_encode_args
+
+    run_ffmpeg(['-i', video_path, '-vf', subtitles_filter(subtitle_path, ffmpeg_parse_infos(video_path)['video_size'][1]),
+                '-map', '0:v:0', '-map', '0:a:0?', *video_encode_args(),
+                *(['-c:a', 'copy'] if probe_media(video_path)['audio_codec'] == 'aac' else audio_encode_args()),
+                '-movflags', '+faststart', output_video_path])
+    return output_video_path
+
+
+def subtitles_filter(subtitle_path, frame_height):
+    """
+    ffmpeg subtitles filter expression for a subtitle file
+
+    libass lays out SRT input on a 288-line canvas, so pixel sizes are scaled to it.
+    """
+    font, font_path = load_subtitle_font()
+    scale = 288 / frame_height
+    font_size = round(SUBTITLE_FONT_SIZE * scale)
+    # Bottom of the text sits near the bottom of the bitmap band used by the overlay backend
+    margin_v = max(0, round((frame_height - frame_height * 2 // 3 - SUBTITLE_BAND_HEIGHT * 2 // 3) * scale))
+    style = (f"FontSize={font_size},PrimaryColour=&H00FFFFFF,OutlineColour=&H00000000,"
+             f"BorderStyle=1,Outline={SUBTITLE_STYLE['stroke_width']},Shadow=0,Alignment=2,MarginV={margin_v}")
+    if font_path:
+        style += f",FontName={font.getname()[0]}"
+    expression = f"subtitles='{_escape_filter_path(subtitle_path)}':force_style='{style}'"
+    if font_path:
+        expression += f":fontsdir='{_escape_filter_path(os.path.dirname(font_path))}'"
+    return expression
+
+
+def burn_subtitles_composite(video_path, subtitles, output_video_path):
+    """Burn subtitles with one MoviePy ImageClip per line over a CompositeVideoClip"""
+    from moviepy import ImageClip
+
     # Load video
     video = VideoFileClip(video_path)
     video_duration = video.duration
@@ -183,60 +621,10 @@ def create_subtitles(video_path, zh_text):
             if duration <= 0:
                 continue
                 
-            # Use PIL-based Chinese text rendering for better support
+            # Bitmaps are rendered once per distinct line and kept in memory, no PNG round trip
             try:
-                from PIL import Image, ImageDraw, ImageFont
-                import os
-                from moviepy import ImageClip
-                
-                # Create text image using PIL
-                img_width, img_height = video.w, 100  # Use video width, 100px height for text
-                img = Image.new('RGBA', (img_width, img_height), (0, 0, 0, 0))
-                draw = ImageDraw.Draw(img)
-                
-                # Try to find a system font that supports Chinese - prefer bold fonts
-                font_size = 32  # Double the previous size from 16 to 32
-                font = None
-                font_paths_to_try = [
-                    "C:/Windows/Fonts/msyhbd.ttc",  # Microsoft YaHei Bold (preferred for visibility)
-                    "C:/Windows/Fonts/msyh.ttc",    # Microsoft YaHei (modern, clean)
-                    "C:/Windows/Fonts/simhei.ttf",  # SimHei (bold style)
-                    "C:/Windows/Fonts/simsun.ttc",  # SimSun (classic)
-                ]
-                
-                for font_path in font_paths_to_try:
-                    if os.path.exists(font_path):
-                        try:
-                            font = ImageFont.truetype(font_path, font_size)
-                            break
-                        except:
-                            continue
-                
-                if font is None:
-                    font = ImageFont.load_default()
-                
-                # Get text dimensions and center it
-                bbox = draw.textbbox((0, 0), content, font=font)
-                text_width = bbox[2] - bbox[0]
-                text_height = bbox[3] - bbox[1]
-                
-                x = (img_width - text_width) // 2
-                y = (img_height - text_height) // 2
-                
-                # Better color scheme - white text with black shadow for maximum readability
-                stroke_width = 2
-                for adj in range(-stroke_width, stroke_width+1):
-                    for adj2 in range(-stroke_width, stroke_width+1):
-                        if adj != 0 or adj2 != 0:
-                            draw.text((x+adj, y+adj2), content, font=font, fill='#000000')  # Black shadow
-                draw.text((x, y), content, font=font, fill='#FFFFFF')  # White main text
-                
-                # Save temporary image
-                temp_img_path = f"temp_subtitle_{i}.png"
-                img.save(temp_img_path)
-                
-                # Create ImageClip from the text image
-                txt_clip = ImageClip(temp_img_path, duration=duration)
+                bitmap = render_subtitle_bitmap(content, video.w)
+                txt_clip = ImageClip(bitmap, duration=duration)
                 txt_clip = txt_clip.with_start(start_time)
                 txt_clip = txt_clip.with_position(('center', video.h * 2 // 3))
                 
@@ -259,17 +647,4 @@ def create_subtitles(video_path, zh_text):
     # Clean up
     final_video.close()
     video.close()
-    
-    # Clean up temporary image files
-    import glob
-    temp_files = glob.glob("temp_subtitle_*.png")
-    for temp_file in temp_files:
-        try:
-            os.remove(temp_file)
-        except:
-            pass
-    
-    print(f"✅ Video exported to: {output_video_path}")
-    print(f"✅ Subtitles saved to: {srt_path}")
-    
-    return srt_path
+    return output_video_path
@@ -1,98 +1,417 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-import json
+from requests.adapters import HTTPAdapter
+
+from .cache_tools import TranslationCache
+from .metrics_tools import RequestMetrics, TranslationMetrics
 
 # Ollama API endpoint
-OLLAMA_URL = "http://localhost:11434/api/generate"
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api/generate")
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.1:8b")
 
-def translate_text(text):
-    try:
-        # Handle long text by splitting into smaller chunks to avoid timeout
-        MAX_CHUNK_SIZE = 1000  # Process 1000 chars at a time for better reliability
-        
+# Chunk requests kept in flight at once; match the server's OLLAMA_NUM_PARALLEL
+# so requests are served in parallel slots instead of queueing behind each other
+OLLAMA_NUM_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", "4"))
+
+MAX_CHUNK_SIZE = 1000  # Process 1000 chars at a time for better reliability
+
+# Set TRANSLATION_CACHE=0 to always call Ollama
+TRANSLATION_CACHE_ENABLED = os.environ.get("TRANSLATION_CACHE", "1") != "0"
+
+PROMPT_TEMPLATE = "Please translate the following English text to Simplified Chinese. " \
+                  "Only return the Chinese translation, nothing else:\n\n{text}"
+# Whisper segments are translated a few at a time as numbered lines, so every
+# reply maps back to segment IDs and the batches can run in parallel
+SEGMENT_PROMPT_TEMPLATE = "Please translate each numbered English line below to Simplified Chinese. " \
+                          "Keep the [number] at the start of every line and return exactly one line per " \
+                          "number, nothing else:\n\n{text}"
+SEGMENT_BATCH_SIZE = int(os.environ.get("SEGMENT_BATCH_SIZE", "12"))
+NUMBERED_LINE_PATTERN = re.compile(r'^\s*\[(\d+)\]\s*(.*?)\s*$')
+GENERATE_OPTIONS = {
+    "temperature": 0.1,
+    "top_p": 0.9
+}
+
+
+class TranslationEngine:
+    """Translate text chunks concurrently through Ollama over one keep-alive session"""
+
+    def __init__(self, url=None, model=None, max_in_flight=None, timeout=180, max_retries=2, retry_backoff=1.0,
+                 cache=None):
+        """
+        Args:
+            url: Ollama generate endpoint (default: OLLAMA_URL)
+            model: Ollama model name (default: OLLAMA_MODEL)
+            max_in_flight: Concurrent chunk requests across every caller sharing the
+                engine (default: OLLAMA_NUM_PARALLEL)
+            timeout: Per-request timeout in seconds
+            max_retries: Extra attempts after a connection error or non-200 reply
+            retry_backoff: Seconds to wait before the first retry, doubled each time
+            cache: TranslationCache consulted before calling Ollama (optional)
+        """
+        self.url = url or OLLAMA_URL
+        self.model = model or OLLAMA_MODEL
+        self.max_in_flight = max(1, max_in_flight or OLLAMA_NUM_PARALLEL)
+        # Each caller fans out up to max_in_flight requests; batch jobs translating at
+        # once share this so the server never sees more than it has slots for
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.metrics = TranslationMetrics()
+        self.cache = cache
+
+        # One pooled session so chunk requests reuse TCP connections
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def translate(self, text):
+        """
+        Translate text, splitting long input into chunks translated concurrently
+
+        Args:
+            text: English text
+
+        Returns:
+            str: Chinese translation, chunks joined in their original order
+        """
         print(f"📝 Total text length: {len(text)} characters")
-        
+
         # If text is short enough, translate directly
         if len(text) <= MAX_CHUNK_SIZE:
             print(f"📝 Text is short, translating directly...")
-            return _translate_single_chunk(text)
-        
-        # For long text, split by sentences and translate in chunks
+            return self.translate_chunk(text)
+
         print(f"📦 Text is long, splitting into chunks...")
-        import re
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        
-        translated_chunks = []
-        current_chunk = ""
-        
-        for sentence in sentences:
-            # If adding this sentence exceeds chunk size, translate current chunk first
-            if len(current_chunk) + len(sentence) > MAX_CHUNK_SIZE and current_chunk:
-                print(f"📦 Translating chunk {len(translated_chunks) + 1} ({len(current_chunk)} chars)...")
-                chunk_result = _translate_single_chunk(current_chunk)
-                translated_chunks.append(chunk_result)
-                current_chunk = sentence
-            else:
-                current_chunk += " " + sentence if current_chunk else sentence
-        
-        # Translate remaining chunk
-        if current_chunk:
-            print(f"📦 Translating final chunk ({len(current_chunk)} chars)...")
-            chunk_result = _translate_single_chunk(current_chunk)
-            translated_chunks.append(chunk_result)
-        
+        started_at = time.time()
+        chunks = split_into_chunks(text)
+        translated_chunks = self.translate_chunks(chunks)
+
         # Combine all translated chunks
         translated_text = " ".join(translated_chunks)
         print(f"✅ Combined translation: {len(translated_text)} chars from {len(translated_chunks)} chunks")
+        self.metrics.print_summary(since=started_at)
+        if self.cache is not None:
+            print(f"🗄️  Translation cache: {self.cache.stats()}")
         return translated_text
-            
-    except Exception as e:
-        print(f"⚠️ Translation failed: {e}")
-        return _get_fallback_translation(text)
 
-def _translate_single_chunk(text):
-    """Translate a single chunk of text using Ollama"""
-    try:
-        prompt = f"Please translate the following English text to Simplified Chinese. " \
-                 f"Only return the Chinese translation, nothing else:\n\n{text}"
-        
+    def translate_chunks(self, chunks):
+        """
+        Translate chunks with at most max_in_flight requests outstanding
+
+        Returns:
+            list: Translations in the same order as chunks
+        """
+        if len(chunks) <= 1:
+            return [self.translate_chunk(chunk) for chunk in chunks]
+
+        workers = min(self.max_in_flight, len(chunks))
+        print(f"📦 Translating {len(chunks)} chunks with {workers} requests in flight...")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map() yields results in submission order, whatever order they finish in
+            return list(executor.map(self.translate_chunk, chunks))
+
+    def translate_segments(self, segments, batch_size=SEGMENT_BATCH_SIZE):
+        """
+        Translate Whisper segments in small numbered batches, keeping each segment's identity
+
+        Batches run concurrently like chunks do. Segments missing from a batch
+        reply are translated one at a time.
+
+        Args:
+            segments: Dicts with a 'text' key (start/end are left untouched)
+            batch_size: Segments per request
+
+        Returns:
+            dict: Segment index → Chinese translation
+        """
+        items = [(i, segment['text'].strip()) for i, segment in enumerate(segments)]
+        items = [(i, text) for i, text in items if text]
+        batches = split_segments_into_batches(items, batch_size)
+        print(f"📦 Translating {len(items)} segments in {len(batches)} batches...")
+
+        started_at = time.time()
+        translations = {}
+        workers = max(1, min(self.max_in_flight, len(batches)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for batch_translations in executor.map(self.translate_segment_batch, batches):
+                translations.update(batch_translations)
+
+        missing = [(i, text) for i, text in items if not translations.get(i)]
+        if missing:
+            print(f"⚠️  {len(missing)} segments missing from batch replies, translating them one by one")
+            for (i, _), translation in zip(missing, self.translate_chunks([text for _, text in missing])):
+                translations[i] = translation
+
+        self.metrics.print_summary(since=started_at)
+        if self.cache is not None:
+            print(f"🗄️  Translation cache: {self.cache.stats()}")
+        return translations
+
+    def translate_segment_batch(self, batch):
+        """
+        Translate one batch of (segment index, text) pairs in a single request
+
+        Returns:
+            dict: Segment index → translation for every line the reply numbered;
+                empty if the request failed
+        """
+        # Lines are numbered 1..n within the batch and mapped back to segment indexes
+        text = "\n".join(f"[{n}] {segment_text}" for n, (_, segment_text) in enumerate(batch, 1))
+        try:
+            key = None
+            if self.cache is not None:
+                key = TranslationCache.make_key(text, self.model, SEGMENT_PROMPT_TEMPLATE, GENERATE_OPTIONS)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    print(f"🗄️  Cache hit for segment batch: {text[:50]}...")
+                    return _map_numbered_lines(cached, batch)
+
+            reply = self._request_translation(text, SEGMENT_PROMPT_TEMPLATE)
+            translations = _map_numbered_lines(reply, batch)
+            # Only complete replies are cached, so a partial one is asked for again next time
+            if key is not None and len(translations) == len(batch):
+                self.cache.put(key, reply)
+            return translations
+        except Exception as e:
+            print(f"⚠️ Segment batch translation failed: {e}")
+            return {}
+
+    def translate_chunk(self, text):
+        """Translate a single chunk of text using Ollama, consulting the cache first"""
+        try:
+            if self.cache is None:
+                return self._request_translation(text)
+
+            key = TranslationCache.make_key(text, self.model, PROMPT_TEMPLATE, GENERATE_OPTIONS)
+            cached = self.cache.get(key)
+            if cached is not None:
+                print(f"🗄️  Cache hit for chunk: {text[:50]}...")
+                return cached
+
+            # Only successful translations are stored, never the fallback text
+            translated_text = self._request_translation(text)
+            self.cache.put(key, translated_text)
+            return translated_text
+        except Exception as e:
+            print(f"⚠️ Chunk translation failed: {e}")
+            return _get_fallback_translation(text)
+
+    def _request_translation(self, text, prompt_template=PROMPT_TEMPLATE):
+        """Send one generate request (retrying transport/HTTP errors) and validate the reply"""
         payload = {
-            "model": "llama3.1:8b",
-            "prompt": prompt,
+            "model": self.model,
+            "prompt": prompt_template.format(text=text),
             "stream": False,
-            "options": {
-                "temperature": 0.1,
-                "top_p": 0.9
-            }
+            "options": GENERATE_OPTIONS
         }
-        
-        print(f"🌐 Calling Ollama API at {OLLAMA_URL}...")
+
+        print(f"🌐 Calling Ollama API at {self.url}...")
         print(f"📝 Text to translate (first 100 chars): {text[:100]}...")
-        
-        response = requests.post(OLLAMA_URL, json=payload, timeout=180)
-        
-        response = requests.post(OLLAMA_URL, json=payload, timeout=180)
-        
-        if response.status_code == 200:
+
+        metrics = RequestMetrics(chars=len(text))
+        start = time.perf_counter()
+        # Recorded only once the reply is validated: the running totals cannot be corrected afterwards
+        try:
+            response = self._post_with_retries(payload, metrics)
             result = response.json()
+            metrics.update_from_response(result)
+            metrics.latency = time.perf_counter() - start
+
             translated_text = result.get("response", "").strip()
-            
-            print(f" Translated text length: {len(translated_text)}")
-            
+            print(f" Translated text length: {len(translated_text)} "
+                  f"({metrics.eval_count} tokens, {metrics.tokens_per_second:.1f} tok/s, {metrics.latency:.2f}s)")
+
             # Check if translation contains Chinese characters
             has_chinese = any('\u4e00' <= char <= '\u9fff' for char in translated_text)
-            
-            if translated_text and len(translated_text.strip()) > 3 and has_chinese:
-                print(f"✅ Chunk translation successful: {translated_text[:100]}...")
-                return translated_text
-            else:
-                raise Exception(f"Invalid translation response: '{translated_text}' (has_chinese: {has_chinese})")
+            metrics.success = bool(translated_text and len(translated_text.strip()) > 3 and has_chinese)
+        finally:
+            if not metrics.latency:
+                metrics.latency = time.perf_counter() - start
+            self.metrics.record(metrics)
+
+        if metrics.success:
+            print(f"✅ Chunk translation successful: {translated_text[:100]}...")
+            return translated_text
+        raise Exception(f"Invalid translation response: '{translated_text}' (has_chinese: {has_chinese})")
+
+    def _post_with_retries(self, payload, metrics):
+        """POST the payload once, retrying connection errors and non-200 replies with backoff"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._slots:
+                    response = self.session.post(self.url, json=payload, timeout=self.timeout)
+                if response.status_code == 200:
+                    return response
+                error = Exception(f"HTTP {response.status_code}: {response.text}")
+            except requests.RequestException as e:
+                error = e
+
+            if attempt == self.max_retries:
+                raise error
+            metrics.retries += 1
+            delay = self.retry_backoff * (2 ** attempt)
+            print(f"🔁 Ollama request failed ({error}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+
+def get_translation_engine():
+    """Get the process-wide TranslationEngine, creating it on first use"""
+    global _default_engine
+    with _default_engine_lock:
+        if _default_engine is None:
+            _default_engine = TranslationEngine(cache=TranslationCache() if TRANSLATION_CACHE_ENABLED else None)
+        return _default_engine
+
+
+def split_into_chunks(text, max_chunk_size=MAX_CHUNK_SIZE):
+    """
+    Split text on sentence boundaries into chunks of at most max_chunk_size chars
+
+    Returns:
+        list: Text chunks in order
+    """
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+
+    chunks = []
+    current_chunk = ""
+    for sentence in sentences:
+        # If adding this sentence exceeds chunk size, close the current chunk first
+        if len(current_chunk) + len(sentence) > max_chunk_size and current_chunk:
+            chunks.append(current_chunk)
+            current_chunk = sentence
         else:
-            raise Exception(f"HTTP {response.status_code}: {response.text}")
-            
+            current_chunk += " " + sentence if current_chunk else sentence
+
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+def split_segments_into_batches(items, batch_size=SEGMENT_BATCH_SIZE, max_chars=MAX_CHUNK_SIZE):
+    """
+    Group (segment index, text) pairs into batches of at most batch_size segments and max_chars chars
+
+    Returns:
+        list: Batches, each a list of (segment index, text) pairs in order
+    """
+    batches = []
+    current, current_chars = [], 0
+    for item in items:
+        if current and (len(current) >= batch_size or current_chars + len(item[1]) > max_chars):
+            batches.append(current)
+            current, current_chars = [], 0
+        current.append(item)
+        current_chars += len(item[1])
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _map_numbered_lines(reply, batch):
+    """Map "[n] translation" lines of a batch reply back to the batch's segment indexes"""
+    translations = {}
+    for line in reply.splitlines():
+        match = NUMBERED_LINE_PATTERN.match(line)
+        if not match or not match.group(2):
+            continue
+        n = int(match.group(1))
+        if 1 <= n <= len(batch):
+            translations[batch[n - 1][0]] = match.group(2)
+    return translations
+
+
+def join_translations(translations):
+    """Join per-segment Chinese translations into one text, ending each with sentence punctuation"""
+    parts = []
+    for translation in translations:
+        translation = translation.strip()
+        if not translation:
+            continue
+        if translation[-1] not in "。！？!?…":
+            translation = translation.rstrip("，,.;；") + "。"
+        parts.append(translation)
+    return "".join(parts)
+
+
+def is_simplified_chinese(text, min_ratio=0.95):
+    """
+    Whether text is written in Simplified Chinese
+
+    GB2312 covers Simplified characters only, so Traditional text (這, 說,
+    國...) fails to encode. A few rare Simplified characters outside GB2312
+    are tolerated by min_ratio.
+    """
+    han = [char for char in text if '\u4e00' <= char <= '\u9fff']
+    if not han:
+        return False
+    simplified = 0
+    for char in han:
+        try:
+            char.encode('gb2312')
+            simplified += 1
+        except UnicodeEncodeError:
+            pass
+    return simplified / len(han) >= min_ratio
+
+
+def needs_translation(text, source_language=None):
+    """False when Whisper heard Chinese and transcribed it in Simplified characters"""
+    return not (source_language == 'zh' and is_simplified_chinese(text))
+
+
+def translate_segments(segments, engine=None, source_language=None):
+    """
+    Translate Whisper segments, keeping their timing
+
+    Args:
+        segments: Dicts with start, end and text
+        engine: TranslationEngine to use (default: the process-wide engine)
+        source_language: Language Whisper detected; Simplified Chinese is
+            passed through without calling Ollama
+
+    Returns:
+        list: Copies of the segments with text replaced by its Chinese
+            translation, in the same order
+    """
+    if not needs_translation("".join(segment['text'] for segment in segments), source_language):
+        print("⏭️  Source is already Simplified Chinese, skipping translation")
+        return [dict(segment) for segment in segments]
+    engine = engine or get_translation_engine()
+    translations = engine.translate_segments(segments)
+    return [{**segment, 'text': translations.get(i, "")} for i, segment in enumerate(segments)]
+
+
+def translate_text(text, engine=None, source_language=None):
+    if not needs_translation(text, source_language):
+        print("⏭️  Source is already Simplified Chinese, skipping translation")
+        return text
+    try:
+        return (engine or get_translation_engine()).translate(text)
     except Exception as e:
-        print(f"⚠️ Chunk translation failed: {e}")
+        print(f"⚠️ Translation failed: {e}")
         return _get_fallback_translation(text)
 
+def _translate_single_chunk(text):
+    """Translate a single chunk of text using Ollama"""
+    return get_translation_engine().translate_chunk(text)
+
 def _get_fallback_translation(text):
     """Provide fallback translation when Ollama fails"""
     print("📝 Using fallback Chinese translation...")
@@ -0,0 +1,349 @@
+"""
+Chunked, concurrent text-to-speech with a per-chunk audio cache
+
+Text is split at sentence boundaries into chunks small enough for one TTS
+request each. Chunks are synthesised in parallel (bounded), cached by text
+and voice parameters, and joined as PCM in memory; nothing touches disk
+except the cache.
+
+Synthesis goes through a TTSBackend: gTTS over the network, or espeak-ng
+running locally on the CPU with no network round trips.
+"""
+import io
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .cache_tools import TTSCache
+
+# Sample rate of the PCM every backend returns (gTTS serves 24 kHz MP3)
+TTS_SAMPLE_RATE = 24000
+# Concurrent chunk requests; gTTS is network bound, so a few in flight hide latency
+TTS_NUM_PARALLEL = int(os.environ.get("TTS_NUM_PARALLEL", "4"))
+# gTTS splits anything longer than 100 characters into extra requests itself
+TTS_CHUNK_SIZE = int(os.environ.get("TTS_CHUNK_SIZE", "100"))
+# Silence inserted between chunks, in seconds, in place of the sentence break
+TTS_CHUNK_PAUSE = 0.15
+
+# Backend used unless a tone profile names one: "gtts" or "espeak"
+TTS_BACKEND = os.environ.get("TTS_BACKEND", "gtts")
+# espeak-ng voice and base speaking rate (words per minute) for the local backend
+ESPEAK_VOICE = os.environ.get("ESPEAK_VOICE", "cmn")
+ESPEAK_RATE = int(os.environ.get("ESPEAK_RATE", "175"))
+
+# Set TTS_CACHE=0 to always synthesise
+TTS_CACHE_ENABLED = os.environ.get("TTS_CACHE", "1") != "0"
+
+SENTENCE_END_PATTERN = re.compile(r'(?<=[。！？!?；;])')
+CLAUSE_END_PATTERN = re.compile(r'(?<=[，,、：:])')
+
+
+def split_tts_chunks(text: str, max_chars: int = TTS_CHUNK_SIZE) -> List[str]:
+    """
+    Split text into chunks of at most max_chars, breaking at sentence ends where possible
+
+    Sentences longer than max_chars are broken at clause punctuation, and
+    anything still too long is cut at max_chars.
+
+    Returns:
+        list: Non-empty chunks in order
+    """
+    pieces = []
+    for sentence in SENTENCE_END_PATTERN.split(text):
+        sentence = sentence.strip()
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        for clause in CLAUSE_END_PATTERN.split(sentence):
+            clause = clause.strip()
+            pieces.extend(clause[i:i + max_chars] for i in range(0, len(clause), max_chars))
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if not piece:
+            continue
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def decode_audio_bytes(data: bytes, sample_rate: int = TTS_SAMPLE_RATE) -> np.ndarray:
+    """Decode compressed audio (MP3 etc.) to mono float32 PCM at sample_rate with ffmpeg"""
+    from .video_tools import run_ffmpeg
+
+    raw = run_ffmpeg(['-i', 'pipe:0', '-f', 'f32le', '-ac', '1', '-ar', str(sample_rate), 'pipe:1'], input_bytes=data)
+    return np.frombuffer(raw, dtype=np.float32)
+
+
+class TTSBackend(ABC):
+    """
+    Speech synthesiser used by TTSEngine
+
+    Subclasses set a unique name (part of the cache key) and implement
+    synthesize(); it is called from several threads at once.
+    """
+
+    name = 'base'
+
+    def cache_params(self, settings: dict) -> dict:
+        """Backend-specific parameters that change the audio, added to the cache key"""
+        return {}
+
+    @abstractmethod
+    def synthesize(self, text: str, settings: dict, sample_rate: int = TTS_SAMPLE_RATE) -> np.ndarray:
+        """
+        Args:
+            text: One chunk of text
+            settings: Tone profile from tts_tools.get_tts_settings
+            sample_rate: Rate of the returned PCM
+
+        Returns:
+            numpy.ndarray: Mono float32 PCM
+        """
+
+
+class GTTSBackend(TTSBackend):
+    """Google Translate TTS over the network"""
+
+    name = 'gtts'
+
+    def synthesize(self, text: str, settings: dict, sample_rate: int = TTS_SAMPLE_RATE) -> np.ndarray:
+        from gtts import gTTS
+
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=settings['lang'], slow=False, tld=settings['tld']).write_to_fp(buffer)
+        return decode_audio_bytes(buffer.getvalue(), sample_rate)
+
+
+class EspeakBackend(TTSBackend):
+    """espeak-ng running locally; robotic next to gTTS, but offline and with no rate limits"""
+
+    name = 'espeak'
+
+    def __init__(self, voice: str = ESPEAK_VOICE, rate: int = ESPEAK_RATE):
+        """
+        Args:
+            voice: espeak-ng voice ("cmn" is Mandarin)
+            rate: Speaking rate in words per minute
+        """
+        self.voice = voice
+        self.rate = rate
+        self.binary = shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def cache_params(self, settings: dict) -> dict:
+        # slow profiles speak slower, as gTTS's slow=True would
+        return {'voice': settings.get('espeak_voice', self.voice),
+                'rate': int(self.rate * (0.8 if settings.get('slow') else 1.0))}
+
+    def synthesize(self, text: str, settings: dict, sample_rate: int = TTS_SAMPLE_RATE) -> np.ndarray:
+        if not self.binary:
+            raise RuntimeError("espeak-ng not found; install it (apt install espeak-ng / brew install espeak-ng) "
+                               "or use TTS_BACKEND=gtts")
+        params = self.cache_params(settings)
+        result = subprocess.run([self.binary, '-v', params['voice'], '-s', str(params['rate']),
+                                 '--stdout', text], capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"espeak-ng failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return decode_audio_bytes(result.stdout, sample_rate)
+
+
+TTS_BACKENDS = {
+    GTTSBackend.name: GTTSBackend,
+    EspeakBackend.name: EspeakBackend,
+}
+_backend_instances = {}
+_backend_lock = threading.Lock()
+
+
+def get_tts_backend(name: Optional[str] = None) -> TTSBackend:
+    """
+    Get the shared backend instance for a name
+
+    Args:
+        name: Key of TTS_BACKENDS (default: TTS_BACKEND)
+    """
+    name = name or TTS_BACKEND
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown TTS backend '{name}', use one of {sorted(TTS_BACKENDS)}")
+    with _backend_lock:
+        if name not in _backend_instances:
+            _backend_instances[name] = TTS_BACKENDS[name]()
+        return _backend_instances[name]
+
+
+class TTSEngine:
+    """Synthesise text chunk by chunk through a pluggable backend, concurrently and cached"""
+
+    def __init__(self, backend=None, max_workers: Optional[int] = None, cache: Optional[TTSCache] = None,
+                 sample_rate: int = TTS_SAMPLE_RATE, chunk_size: int = TTS_CHUNK_SIZE):
+        """
+        Args:
+            backend: TTSBackend for every request (default: the one the tone profile
+                names, else TTS_BACKEND)
+            max_workers: Chunks synthesised at once (default: TTS_NUM_PARALLEL)
+            cache: TTSCache consulted before the backend (optional)
+            sample_rate: Rate of the PCM returned by synthesize()
+            chunk_size: Maximum characters per backend request
+        """
+        self.backend = backend
+        self.max_workers = max(1, max_workers or TTS_NUM_PARALLEL)
+        self.cache = cache
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+
+    def synthesize(self, text: str, settings: dict, tone_style: str = 'default') -> Tuple[np.ndarray, int]:
+        """
+        Speak text with a tone profile
+
+        Args:
+            text: Chinese text
+            settings: Tone profile from tts_tools.get_tts_settings
+            tone_style: Tone name, part of the cache key
+
+        Returns:
+            tuple: (mono float32 PCM, sample rate)
+        """
+        chunks = split_tts_chunks(text, self.chunk_size)
+        if not chunks:
+            return np.zeros(0, dtype=np.float32), self.sample_rate
+
+        backend = self.backend_for(settings)
+        workers = min(self.max_workers, len(chunks))
+        print(f"🎙️  Synthesising {len(chunks)} chunks with {backend.name}, {workers} at a time...")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map() keeps chunk order whatever order they finish in
+            pcms = list(executor.map(lambda chunk: self.synthesize_chunk(chunk, settings, tone_style), chunks))
+
+        pcm = self._join(pcms)
+        elapsed = time.perf_counter() - start
+        audio_seconds = len(pcm) / self.sample_rate
+        print(f"⏱️  TTS: {len(text)} chars → {audio_seconds:.1f}s of audio in {elapsed:.2f}s "
+              f"({audio_seconds / max(elapsed, 1e-9):.1f}x real time)")
+        if self.cache is not None:
+            print(f"🗄️  TTS cache: {self.cache.stats()}")
+        return pcm, self.sample_rate
+
+    def synthesize_text(self, text: str, settings: dict, tone_style: str = 'default') -> np.ndarray:
+        """
+        Speak one short text on the calling thread, chunk after chunk
+
+        For callers that already parallelise across texts (see
+        utils.streaming_pipeline).
+
+        Returns:
+            numpy.ndarray: Mono float32 PCM at self.sample_rate, empty for blank text
+        """
+        chunks = split_tts_chunks(text, self.chunk_size)
+        if not chunks:
+            return np.zeros(0, dtype=np.float32)
+        return self._join([self.synthesize_chunk(chunk, settings, tone_style) for chunk in chunks])
+
+    def synthesize_segments(self, texts: List[str], settings: dict, tone_style: str = 'default') -> List[np.ndarray]:
+        """
+        Speak several texts (e.g. one per subtitle segment) as separate clips
+
+        Chunks of every text share one bounded pool, so short segments do not
+        leave workers idle.
+
+        Returns:
+            list: Mono float32 PCM per text at self.sample_rate, empty for blank texts
+        """
+        jobs = [(i, chunk) for i, text in enumerate(texts) for chunk in split_tts_chunks(text, self.chunk_size)]
+        if not jobs:
+            return [np.zeros(0, dtype=np.float32) for _ in texts]
+
+        backend = self.backend_for(settings)
+        workers = min(self.max_workers, len(jobs))
+        print(f"🎙️  Synthesising {len(texts)} segments ({len(jobs)} chunks) with {backend.name}, "
+              f"{workers} at a time...")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pcms = list(executor.map(lambda job: self.synthesize_chunk(job[1], settings, tone_style), jobs))
+
+        per_text = [[] for _ in texts]
+        for (i, _), pcm in zip(jobs, pcms):
+            per_text[i].append(pcm)
+        if self.cache is not None:
+            print(f"🗄️  TTS cache: {self.cache.stats()}")
+        return [self._join(chunks) if chunks else np.zeros(0, dtype=np.float32) for chunks in per_text]
+
+    def backend_for(self, settings: dict) -> TTSBackend:
+        """The engine's backend, else the one the tone profile names, else TTS_BACKEND"""
+        return self.backend or get_tts_backend(settings.get('backend'))
+
+    def synthesize_chunk(self, text: str, settings: dict, tone_style: str = 'default') -> np.ndarray:
+        """Synthesise one chunk, consulting the cache first"""
+        backend = self.backend_for(settings)
+        if self.cache is None:
+            return backend.synthesize(text, settings, self.sample_rate)
+
+        key = TTSCache.make_key(text, backend=backend.name, lang=settings['lang'], tld=settings['tld'],
+                                tone=tone_style, sample_rate=self.sample_rate, **backend.cache_params(settings))
+        pcm = self.cache.get(key)
+        if pcm is None:
+            pcm = backend.synthesize(text, settings, self.sample_rate)
+            self.cache.put(key, pcm)
+        return pcm
+
+    def _join(self, pcms: List[np.ndarray]) -> np.ndarray:
+        """Concatenate chunk PCM with a short pause between chunks into one preallocated buffer"""
+        pause = int(TTS_CHUNK_PAUSE * self.sample_rate)
+        total = sum(len(pcm) for pcm in pcms) + pause * (len(pcms) - 1)
+        joined = np.zeros(total, dtype=np.float32)
+        position = 0
+        for pcm in pcms:
+            joined[position:position + len(pcm)] = pcm
+            position += len(pcm) + pause
+        return joined
+
+
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+
+def get_tts_engine() -> TTSEngine:
+    """Get the process-wide TTSEngine, creating it on first use"""
+    global _default_engine
+    with _default_engine_lock:
+        if _default_engine is None:
+            _default_engine = TTSEngine(cache=TTSCache() if TTS_CACHE_ENABLED else None)
+        return _default_engine
+
+
+def benchmark_tts_backend(backend: TTSBackend, text: str, settings: dict, repeats: int = 1) -> dict:
+    """
+    Time one backend on a text, uncached and one chunk at a time
+
+    Returns:
+        dict: backend, chunks, chars, audio_seconds, seconds, chars_per_second,
+            real_time_factor (audio seconds produced per wall-clock second)
+    """
+    engine = TTSEngine(backend=backend, max_workers=1)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        pcm, sample_rate = engine.synthesize(text, settings)
+    elapsed = (time.perf_counter() - start) / repeats
+    audio_seconds = len(pcm) / sample_rate
+    return {
+        'backend': backend.name,
+        'chunks': len(split_tts_chunks(text, engine.chunk_size)),
+        'chars': len(text),
+        'audio_seconds': audio_seconds,
+        'seconds': elapsed,
+        'chars_per_second': len(text) / elapsed if elapsed else 0.0,
+        'real_time_factor': audio_seconds / elapsed if elapsed else 0.0,
+    }
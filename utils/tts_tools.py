@@ -2,15 +2,12 @@
 Chinese TTS tools using gTTS and dynamic audio processing with precise duration control
 """
 import os
-import numpy as np
-from gtts import gTTS
-from moviepy import VideoFileClip, AudioFileClip, AudioArrayClip
-from scipy import signal
+from moviepy import VideoFileClip
 from typing import Optional
 
-# Create temp directory if it doesn't exist
-TEMP_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'temp')
-os.makedirs(TEMP_DIR, exist_ok=True)
+from .audio_tools import build_aligned_track, time_stretch, write_wav
+from .tts_engine import TTS_BACKEND, get_tts_engine
+
 
 def get_tts_settings(tone_style: str = 'default'):
     """
@@ -90,112 +87,56 @@ def get_tts_settings(tone_style: str = 'default'):
         tone_style = 'default'
     
     profile = tts_profiles[tone_style]
-    print(f"🎭 Using TTS profile '{tone_style}': {profile['description']}")
+    # Synthesiser for this tone: TTS_BACKEND_<TONE>, else TTS_BACKEND ("gtts" or the local "espeak")
+    profile['backend'] = os.environ.get(f"TTS_BACKEND_{tone_style.upper()}", TTS_BACKEND)
+    print(f"🎭 Using TTS profile '{tone_style}': {profile['description']} ({profile['backend']})")
     return profile
 
 
-def loop_audio_to_duration(audio_path: str, target_duration: float, output_path: str) -> Optional[str]:
+def synthesize_chinese_speech(chinese_text: str, tone_style: str = 'default'):
     """
-    Loop/repeat audio to match target duration with natural pauses
-    This avoids audio quality degradation from extreme time-stretching
-    
+    Speak Chinese text with the tone profile's backend, pacing and speed
+
     Args:
-        audio_path: Path to input audio file
-        target_duration: Target duration in seconds
-        output_path: Path for output audio file
-    
+        chinese_text: Text to convert to speech
+        tone_style: Style/tone - 'default', 'sport', 'movie', 'nature', 'news', 'casual'
+
     Returns:
-        Path to looped audio file, or None if failed
+        tuple: (mono float32 PCM, sample rate)
     """
-    try:
-        print(f"🔁 Looping audio from {audio_path} to fill {target_duration:.2f}s...")
-        
-        # Load audio with MoviePy
-        audio_clip = AudioFileClip(audio_path)
-        current_duration = audio_clip.duration
-        
-        print(f"📊 Original audio duration: {current_duration:.2f}s, Target: {target_duration:.2f}s")
-        
-        # If audio is already longer than target, just trim it
-        if current_duration >= target_duration:
-            print(f"✂️  Audio is longer than target, trimming to {target_duration:.2f}s")
-            final_clip = audio_clip.subclipped(0, target_duration)
-            final_clip.write_audiofile(output_path)
-            audio_clip.close()
-            final_clip.close()
-            return output_path
-        
-        # Calculate how many loops we need
-        num_loops = int(np.ceil(target_duration / current_duration))
-        pause_duration = 1.0  # 1 second pause between loops
-        
-        print(f"🔄 Will loop audio {num_loops} times with {pause_duration:.1f}s pauses")
-        
-        # Get audio array
-        audio_array = audio_clip.to_soundarray()
-        fps = audio_clip.fps
-        
-        # Create silence array for pauses
-        pause_samples = int(pause_duration * fps)
-        if len(audio_array.shape) == 2:
-            # Stereo
-            silence = np.zeros((pause_samples, 2))
-        else:
-            # Mono
-            silence = np.zeros((pause_samples, 1))
-        
-        # Build looped audio with pauses
-        looped_arrays = []
-        for i in range(num_loops):
-            looped_arrays.append(audio_array)
-            if i < num_loops - 1:  # Don't add pause after last loop
-                looped_arrays.append(silence)
-        
-        # Concatenate all arrays
-        combined_array = np.vstack(looped_arrays)
-        
-        # Trim to exact target duration
-        target_samples = int(target_duration * fps)
-        if len(combined_array) > target_samples:
-            combined_array = combined_array[:target_samples]
-        elif len(combined_array) < target_samples:
-            # Pad with silence if needed
-            remaining_samples = target_samples - len(combined_array)
-            if len(audio_array.shape) == 2:
-                padding = np.zeros((remaining_samples, 2))
-            else:
-                padding = np.zeros((remaining_samples, 1))
-            combined_array = np.vstack([combined_array, padding])
-        
-        # Close original clip
-        audio_clip.close()
-        
-        # Create new audio clip with looped audio
-        looped_clip = AudioArrayClip(combined_array, fps=fps)
-        
-        # Export to file
-        looped_clip.write_audiofile(output_path)
-        looped_clip.close()
-        
-        # Verify final duration
-        final_clip = AudioFileClip(output_path)
-        final_duration = final_clip.duration
-        final_clip.close()
-        
-        print(f"✅ Audio looped to {final_duration:.2f}s (target: {target_duration:.2f}s, {num_loops} loops)")
-        
-        return output_path
-        
-    except Exception as e:
-        print(f"❌ Error looping audio: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+    # Get TTS settings for the specified tone
+    settings = get_tts_settings(tone_style)
+    print(f"🎵 Generating {tone_style} Chinese TTS for: {chinese_text[:50]}...")
+
+    # Break text into smaller chunks for more natural pauses
+    import re
+    # Split on Chinese sentence endings and conjunctions for natural pauses
+    sentences = re.split(r'[。！？，；、]', chinese_text)
+    sentences = [s.strip() for s in sentences if s.strip()]
+
+    # Don't truncate - use ALL sentences for full translation
+    # (The max_sentences setting was causing truncation to only first 10-15 seconds)
+
+    # Rejoin with tone-specific punctuation for natural speech rhythm
+    processed_text = settings['punctuation'].join(sentences)
+
+    # Chunks are synthesised concurrently and cached, then joined in memory
+    pcm, sample_rate = get_tts_engine().synthesize(processed_text, settings, tone_style)
+    if not len(pcm):
+        raise ValueError("no speakable text")
+
+    # Speed up with a phase-vocoder time-stretch so the voice keeps its pitch
+    speed_factor = settings.get('speed_factor', 1.0)
+    if speed_factor != 1.0:
+        print(f"🎚️  Applying {speed_factor}x speed for {tone_style} tone")
+        pcm = time_stretch(pcm, speed_factor)
+    print(f"🎵 Optimized male voice settings applied for {tone_style} tone")
+    return pcm, sample_rate
 
 
 def create_chinese_audio_from_text(chinese_text: str, output_audio_path: str, tone_style: str = 'default') -> Optional[str]:
     """
-    Create Chinese audio directly from text using gTTS with configurable tone settings
+    Create Chinese audio directly from text with the tone profile's TTS backend
     
     Args:
         chinese_text: Text to convert to speech
@@ -203,63 +144,8 @@ def create_chinese_audio_from_text(chinese_text: str, output_audio_path: str, to
         tone_style: Style/tone - 'default', 'sport', 'movie', 'nature', 'news', 'casual'
     """
     try:
-        # Get TTS settings for the specified tone
-        settings = get_tts_settings(tone_style)
-        print(f"🎵 Generating {tone_style} Chinese TTS for: {chinese_text[:50]}...")
-        
-        # Break text into smaller chunks for more natural pauses
-        import re
-        # Split on Chinese sentence endings and conjunctions for natural pauses
-        sentences = re.split(r'[。！？，；、]', chinese_text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        # Don't truncate - use ALL sentences for full translation
-        # (The max_sentences setting was causing truncation to only first 10-15 seconds)
-        
-        # Rejoin with tone-specific punctuation for natural speech rhythm
-        processed_text = settings['punctuation'].join(sentences)
-        
-        # Generate TTS with tone-specific settings
-        # For male voice effect, we use different TLD servers and slow=False for base speed
-        tts = gTTS(
-            text=processed_text, 
-            lang=settings['lang'], 
-            slow=False,  # Always use normal speed, we'll adjust with post-processing
-            tld=settings['tld']
-        )
-        
-        # Save to temporary MP3 file
-        temp_mp3_path = os.path.join(TEMP_DIR, f"tts_temp_2_{os.getpid()}.mp3")
-        tts.save(temp_mp3_path)
-        
-        # Convert MP3 to WAV using MoviePy
-        audio_clip = AudioFileClip(temp_mp3_path)
-        
-        # Apply speed modification using audio resampling
-        speed_factor = settings.get('speed_factor', 1.0)
-        if speed_factor != 1.0:
-            print(f"🎚️  Applying {speed_factor}x speed for {tone_style} tone")
-            # Speed up audio by changing the sample rate
-            # This effectively makes the audio play faster and slightly higher pitch
-            audio_array = audio_clip.to_soundarray()
-            import numpy as np
-            
-            # Resample the audio to achieve speed effect
-            original_fps = audio_clip.fps
-            new_fps = int(original_fps * speed_factor)
-            
-            # Create new audio clip with modified fps for speed effect
-            from moviepy import AudioArrayClip
-            audio_clip = AudioArrayClip(audio_array, fps=new_fps)
-            
-        print(f"🎵 Optimized male voice settings applied for {tone_style} tone")
-        
-        audio_clip.write_audiofile(output_audio_path)
-        audio_clip.close()
-        
-        # Clean up temp MP3
-        if os.path.exists(temp_mp3_path):
-            os.unlink(temp_mp3_path)
+        pcm, sample_rate = synthesize_chinese_speech(chinese_text, tone_style)
+        write_wav(output_audio_path, pcm, sample_rate)
         
         print(f"✅ Chinese audio generated: {output_audio_path}")
         return output_audio_path
@@ -268,148 +154,226 @@ def create_chinese_audio_from_text(chinese_text: str, output_audio_path: str, to
         print(f"❌ Error creating Chinese TTS: {e}")
         return None
 
-def create_dynamic_chinese_speaking_video(video_path: str, output_path: str, tone_style: str = 'default') -> Optional[str]:
+def get_tone_output_path(output_path: str, tone_style: str = 'default') -> str:
+    """
+    Build the tone-specific output filename for a speaking video
+
+    Args:
+        output_path: Requested output video path
+        tone_style: TTS tone style
+
+    Returns:
+        str: Output path with the tone suffix for non-default tones
+    """
+    base_path, ext = os.path.splitext(output_path)
+    if tone_style != 'default':
+        return f"{base_path}_{tone_style}{ext}"
+    return output_path
+
+
+def _speak_segments(engine, segments: list, tone_style: str) -> list:
+    """Speak each non-empty segment, returning (start, end, PCM) clips"""
+    spoken = [s for s in segments if s['text'].strip()]
+    if not spoken:
+        return []
+    # Each clip is fitted to its own slot, so the tone's speed factor is not applied
+    pcms = engine.synthesize_segments([s['text'] for s in spoken], get_tts_settings(tone_style), tone_style)
+    return [(s['start'], s['end'], pcm) for s, pcm in zip(spoken, pcms)]
+
+
+def synthesize_chinese_audio_track(chinese_text: str, video_duration: float, tone_style: str = 'default',
+                                   segments: Optional[list] = None, speech: Optional[list] = None):
+    """
+    Generate Chinese TTS audio laid out over the video duration, in memory
+
+    With translated segments, each segment is spoken separately and
+    time-stretched into its source segment's slot, so the dub follows the
+    original speech. Without them the whole text is spoken once and
+    stretched towards the video duration, with silence after it if it
+    is still short.
+
+    Args:
+        chinese_text: Translated Chinese text to speak
+        video_duration: Duration of the target video in seconds
+        tone_style: TTS tone style - 'default', 'sport', 'movie', 'nature', 'news', 'casual'
+        segments: Translated segments with start, end and text (optional)
+        speech: (start, end, PCM) clips already spoken at the TTS engine's rate, e.g. by
+            utils.streaming_pipeline; segments then lists only those still to be spoken (optional)
+
+    Returns:
+        tuple: (mono float32 PCM exactly video_duration long, sample rate)
+    """
+    print("🎵 Generating Chinese TTS...")
+    if speech is not None:
+        engine = get_tts_engine()
+        placed = sorted(list(speech) + _speak_segments(engine, segments or [], tone_style), key=lambda clip: clip[0])
+        sample_rate = engine.sample_rate
+        print(f"📐 Aligning {len(placed)} streamed segments to the source timing...")
+    elif segments:
+        engine = get_tts_engine()
+        placed = _speak_segments(engine, segments, tone_style)
+        sample_rate = engine.sample_rate
+        print(f"📐 Aligning {len(placed)} segments to the source timing...")
+    else:
+        pcm, sample_rate = synthesize_chinese_speech(chinese_text, tone_style)
+        placed = [(0.0, video_duration, pcm)]
+
+    # One preallocated track the length of the video
+    return build_aligned_track(placed, sample_rate, video_duration), sample_rate
+
+
+def create_chinese_audio_track(chinese_text: str, video_duration: float, output_path: str, tone_style: str = 'default',
+                               segments: Optional[list] = None, speech: Optional[list] = None) -> Optional[str]:
+    """
+    Generate the Chinese audio track and save it next to the speaking video
+
+    Used where the track has to outlive the process (the pipeline keeps it
+    as the tts stage checkpoint); see synthesize_chinese_audio_track() for
+    the in-memory version.
+
+    Args:
+        chinese_text: Translated Chinese text to speak
+        video_duration: Duration of the target video in seconds
+        output_path: Path of the speaking video this track is for
+        tone_style: TTS tone style - 'default', 'sport', 'movie', 'nature', 'news', 'casual'
+        segments: Translated segments with start, end and text (optional)
+        speech: Segments already spoken, see synthesize_chinese_audio_track() (optional)
+
+    Returns:
+        Path to the audio track matching the video duration, or None if failed
+    """
+    if tone_style != 'default':
+        audio_output_path = output_path.replace('.mp4', f'_{tone_style}_chinese_audio.wav')
+    else:
+        audio_output_path = output_path.replace('.mp4', '_chinese_audio.wav')
+
+    try:
+        track, sample_rate = synthesize_chinese_audio_track(chinese_text, video_duration, tone_style, segments, speech)
+        write_wav(audio_output_path, track, sample_rate)
+        print(f"✅ Chinese audio track: {audio_output_path} ({len(track) / sample_rate:.2f}s)")
+        return audio_output_path
+    except Exception as e:
+        print(f"❌ Failed to generate Chinese audio: {e}")
+        return None
+
+
+def mux_chinese_audio(video_path: str, audio, output_path: str, tone_style: str = 'default') -> Optional[str]:
+    """
+    Replace the soundtrack of a video with a Chinese audio track
+
+    Args:
+        video_path: Path to input video
+        audio: Path to the Chinese audio track, or a (PCM, sample rate) tuple
+            that is piped straight into ffmpeg
+        output_path: Path for output video
+        tone_style: TTS tone style, used for logging only
+
+    Returns:
+        Path to the output video, or None if failed
+    """
+    try:
+        from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+        from .output_planner import stream_copy_output
+        from .video_tools import probe_media
+
+        print("🎬 Combining video with Chinese audio...")
+        video_duration = ffmpeg_parse_infos(video_path)['duration']
+        if isinstance(audio, tuple):
+            pcm, sample_rate = audio
+            audio_duration = len(pcm) / sample_rate
+            audio_args = {'audio_pcm': audio}
+        else:
+            audio_duration = ffmpeg_parse_infos(audio)['duration']
+            audio_args = {'audio_path': audio}
+
+        print(f"🎬 Video duration: {video_duration:.2f}s, Audio duration: {audio_duration:.2f}s")
+        if abs(audio_duration - video_duration) > 0.5:
+            # ffmpeg pads a short track with silence and trims a long one to the video
+            print(f"⚠️  Duration mismatch detected, padding/trimming the audio to the video...")
+        else:
+            print(f"✅ Audio duration matches video duration perfectly!")
+
+        # Only the new AAC track is encoded; the video bitstream is copied as-is
+        print(f"💾 Saving video with dynamic Chinese audio ({tone_style} tone): {output_path}")
+        return stream_copy_output(video_path, output_path, probe_media(video_path), video_duration, **audio_args)
+
+    except Exception as e:
+        print(f"❌ Error muxing Chinese audio: {e}")
+        return None
+
+
+def create_dynamic_chinese_speaking_video(video_path: str, output_path: str, tone_style: str = 'default',
+                                          transcript: Optional[str] = None,
+                                          chinese_text: Optional[str] = None) -> Optional[str]:
     """
     Create a video with Chinese speech using dynamic transcription and translation
-    
+
+    Transcription and translation only run when they are not passed in, so a
+    caller that already has them (see utils.pipeline) does not pay for Whisper
+    and Ollama twice.
+
     Args:
         video_path: Path to input video
         output_path: Path for output video
         tone_style: TTS tone style - 'default', 'sport', 'movie', 'nature', 'news', 'casual'
+        transcript: Precomputed English transcript (optional)
+        chinese_text: Precomputed Chinese translation (optional)
     """
     try:
         print(f"🎬 Creating Chinese speaking video with dynamic pipeline ({tone_style} tone)...")
-        
+
         # Modify output path to include tone style in filename
-        import os
-        base_path, ext = os.path.splitext(output_path)
-        if tone_style != 'default':
-            tone_output_path = f"{base_path}_{tone_style}{ext}"
-        else:
-            tone_output_path = output_path
-        
+        tone_output_path = get_tone_output_path(output_path, tone_style)
         print(f"📁 Output will be saved as: {tone_output_path}")
-        
-        # Step 1: Extract audio from original video for transcription
-        print("🎧 Extracting audio for transcription...")
+
         video = VideoFileClip(video_path)
-        
         if video.audio is None:
             print("❌ Video has no audio track")
             video.close()
             return None
-        
-        # Extract audio for transcription
-        temp_audio_path = os.path.join(TEMP_DIR, f"full_audio_{os.getpid()}.wav")
-        video.audio.write_audiofile(temp_audio_path)
-        print(f"✅ Audio extracted: {temp_audio_path}")
-        
-        # Clean up video temporarily
-        video.close()
-        
-        # Step 2: Transcribe the audio
-        print("🗣️ Transcribing audio with Whisper...")
-        try:
-            from .whisper_tools import transcribe_audio
-            transcript = transcribe_audio(temp_audio_path)
-            print(f"📝 Transcript: {transcript[:100]}...")
-        except Exception as e:
-            print(f"❌ Transcription error: {e}")
-            os.remove(temp_audio_path)
-            return None
-        
-        # Step 3: Translate to Chinese
-        print("� Translating to Chinese...")
+        video_duration = video.duration
+
+        if chinese_text is None and transcript is None:
+            video.close()
+
+            # Steps 1-2: Decode the audio through an ffmpeg pipe and transcribe it, no temp WAV
+            print("🗣️ Transcribing audio with Whisper...")
+            try:
+                from .whisper_tools import transcribe_audio
+                transcript = transcribe_audio(video_path)
+                print(f"📝 Transcript: {transcript[:100]}...")
+            except Exception as e:
+                print(f"❌ Transcription error: {e}")
+                return None
+        else:
+            video.close()
+
+        if chinese_text is None:
+            # Step 3: Translate to Chinese
+            print("🌏 Translating to Chinese...")
+            try:
+                from .translate_tools import translate_text
+                chinese_text = translate_text(transcript)
+                print(f"🔊 Chinese translation: {chinese_text[:100]}...")
+            except Exception as e:
+                print(f"❌ Translation error: {e}")
+                return None
+
+        # Step 4: Generate Chinese TTS audio fitted to the video duration, kept in memory
         try:
-            from .translate_tools import translate_text
-            chinese_text = translate_text(transcript)
-            print(f"🔊 Chinese translation: {chinese_text[:100]}...")
+            chinese_audio = synthesize_chinese_audio_track(chinese_text, video_duration, tone_style)
         except Exception as e:
-            print(f"❌ Translation error: {e}")
-            os.remove(temp_audio_path)
+            print(f"❌ Failed to generate Chinese audio: {e}")
             return None
-        
-        # Step 4: Generate Chinese TTS audio
-        print("🎵 Generating Chinese TTS...")
-        if tone_style != 'default':
-            audio_output_path = tone_output_path.replace('.mp4', f'_{tone_style}_chinese_audio.wav')
-        else:
-            audio_output_path = tone_output_path.replace('.mp4', '_chinese_audio.wav')
-        chinese_audio_path = create_chinese_audio_from_text(chinese_text, audio_output_path, tone_style)
-        
-        # Clean up temp audio file
-        os.remove(temp_audio_path)
-        
-        if not chinese_audio_path:
-            print("❌ Failed to generate Chinese audio")
+
+        # Step 5: Create video with Chinese audio, piping the PCM into the mux
+        result = mux_chinese_audio(video_path, chinese_audio, tone_output_path, tone_style)
+        if not result:
             return None
-        
-        # Step 5: Loop audio to match video duration (instead of stretching which causes noise)
-        print("🎬 Combining video with Chinese audio...")
-        
-        # Reload video to get precise duration
-        video_clip = VideoFileClip(video_path)
-        video_duration = video_clip.duration
-        
-        # Create looped audio path
-        looped_audio_path = audio_output_path.replace('.wav', '_looped.wav')
-        
-        # Loop audio to match video duration exactly (repeats naturally instead of distorting)
-        looped_audio = loop_audio_to_duration(chinese_audio_path, video_duration, looped_audio_path)
-        
-        if not looped_audio:
-            print("⚠️  Audio looping failed, using original audio with padding/trimming")
-            chinese_audio_clip = AudioFileClip(chinese_audio_path)
-        else:
-            chinese_audio_clip = AudioFileClip(looped_audio)
-            # Clean up original audio
-            if os.path.exists(chinese_audio_path):
-                os.unlink(chinese_audio_path)
-        
-        # Step 6: Create video with looped Chinese audio
-        # Step 6: Create video with time-stretched Chinese audio
-        print(f"🎬 Video duration: {video_clip.duration:.2f}s, Audio duration: {chinese_audio_clip.duration:.2f}s")
-        
-        # Audio should now match video duration, but apply final adjustments if needed
-        if abs(chinese_audio_clip.duration - video_clip.duration) > 0.5:
-            print(f"⚠️  Duration mismatch detected, applying final adjustment...")
-            # If Chinese audio is shorter, pad with silence
-            if chinese_audio_clip.duration < video_clip.duration:
-                from moviepy.audio.AudioClip import CompositeAudioClip
-                from moviepy.audio.AudioClip import AudioClip
-                
-                # Create silence for the remaining duration
-                silence_duration = video_clip.duration - chinese_audio_clip.duration
-                silence = AudioClip(lambda t: 0, duration=silence_duration)
-                
-                # Concatenate Chinese audio with silence
-                chinese_audio_clip = CompositeAudioClip([chinese_audio_clip, silence.with_start(chinese_audio_clip.duration)])
-                chinese_audio_clip = chinese_audio_clip.with_duration(video_clip.duration)
-            elif chinese_audio_clip.duration > video_clip.duration:
-                # If longer, trim to video duration
-                chinese_audio_clip = chinese_audio_clip.with_duration(video_clip.duration)
-        else:
-            print(f"✅ Audio duration matches video duration perfectly!")
-        
-        # Create new video with Chinese audio
-        final_video = video_clip.with_audio(chinese_audio_clip)
-        
-        # Write the final video with tone-specific filename
-        print(f"💾 Saving video with dynamic Chinese audio ({tone_style} tone): {tone_output_path}")
-        final_video.write_videofile(tone_output_path, codec='libx264', audio_codec='aac')
-        
-        # Clean up
-        video_clip.close()
-        chinese_audio_clip.close()
-        final_video.close()
-        
-        # Remove temporary looped audio file
-        if os.path.exists(looped_audio_path):
-            os.unlink(looped_audio_path)
-        
+
         print(f"✅ Dynamic Chinese speaking video created successfully!")
         return tone_output_path
-        
+
     except Exception as e:
         print(f"❌ Error creating dynamic Chinese speaking video: {e}")
         return None
@@ -1,6 +1,143 @@
 import os
+import re
+import json
+import subprocess
 import yt_dlp
-from moviepy import VideoFileClip
+from moviepy.config import FFMPEG_BINARY
+
+# ffprobe is optional; without it probe_media parses `ffmpeg -i` output instead
+FFPROBE_BINARY = os.environ.get("FFPROBE_BINARY", "ffprobe")
+
+# Settings for the re-encodes that are still needed, e.g. VIDEO_ENCODE_PRESET=ultrafast
+ENCODE_SETTINGS = {
+    'video_codec': 'libx264',
+    'preset': os.environ.get("VIDEO_ENCODE_PRESET", "veryfast"),
+    'crf': os.environ.get("VIDEO_ENCODE_CRF", "23"),
+    'pix_fmt': 'yuv420p',
+    'audio_codec': 'aac',
+    'audio_bitrate': os.environ.get("AUDIO_ENCODE_BITRATE", "192k"),
+}
+
+COMPATIBLE_VIDEO_CODECS = ('h264',)
+COMPATIBLE_AUDIO_CODECS = ('aac',)
+
+
+def run_ffmpeg(args, input_bytes=None):
+    """
+    Run the ffmpeg binary MoviePy uses, raising RuntimeError with its stderr on failure
+
+    Args:
+        args: Arguments after the global options
+        input_bytes: Data written to ffmpeg's stdin (optional)
+
+    Returns:
+        bytes: ffmpeg's stdout
+    """
+    cmd = [FFMPEG_BINARY, '-y', '-hide_banner', '-loglevel', 'error', *args]
+    result = subprocess.run(cmd, input=input_bytes, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({result.returncode}): {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.stdout
+
+
+def video_encode_args():
+    """ffmpeg arguments for an H.264 encode using ENCODE_SETTINGS"""
+    return ['-c:v', ENCODE_SETTINGS['video_codec'], '-preset', ENCODE_SETTINGS['preset'],
+            '-crf', str(ENCODE_SETTINGS['crf']), '-pix_fmt', ENCODE_SETTINGS['pix_fmt']]
+
+
+def audio_encode_args():
+    """ffmpeg arguments for an AAC encode using ENCODE_SETTINGS"""
+    return ['-c:a', ENCODE_SETTINGS['audio_codec'], '-b:a', ENCODE_SETTINGS['audio_bitrate']]
+
+
+def probe_media(path):
+    """
+    Inspect the container and codecs of a media file
+
+    Returns:
+        dict: 'container', 'video_codec', 'audio_codec', 'pix_fmt' (None when absent)
+    """
+    try:
+        output = subprocess.run(
+            [FFPROBE_BINARY, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', path],
+            capture_output=True, check=True,
+        ).stdout
+        data = json.loads(output)
+        streams = data.get('streams', [])
+        video = next((st for st in streams if st.get('codec_type') == 'video'), {})
+        audio = next((st for st in streams if st.get('codec_type') == 'audio'), {})
+        return {
+            'container': data.get('format', {}).get('format_name', ''),
+            'video_codec': video.get('codec_name'),
+            'audio_codec': audio.get('codec_name'),
+            'pix_fmt': video.get('pix_fmt'),
+        }
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        pass
+
+    # `ffmpeg -i` exits non-zero without an output file; the stream list is on stderr
+    stderr = subprocess.run([FFMPEG_BINARY, '-hide_banner', '-i', path], capture_output=True).stderr
+    text = stderr.decode('utf-8', 'replace')
+    container = re.search(r"Input #0, (.+?), from", text)
+    video = re.search(r"Stream #\d+:\d+.*?: Video: (\w+)[^,]*,\s*(\w+)", text)
+    audio = re.search(r"Stream #\d+:\d+.*?: Audio: (\w+)", text)
+    return {
+        'container': container.group(1) if container else '',
+        'video_codec': video.group(1) if video else None,
+        'audio_codec': audio.group(1) if audio else None,
+        'pix_fmt': video.group(2) if video else None,
+    }
+
+
+def ensure_compatible_mp4(video_path):
+    """
+    Make a video H.264/AAC in an MP4 container with as little work as possible
+
+    - Already compatible: returned untouched
+    - Compatible codecs in another container: stream-copy remux
+    - Only the audio is incompatible: copy video, encode audio
+    - Otherwise: re-encode with ENCODE_SETTINGS
+
+    Returns:
+        str: Path to the compatible MP4 (same name with a .mp4 extension)
+    """
+    info = probe_media(video_path)
+    is_mp4 = 'mp4' in info['container']
+    video_ok = info['video_codec'] in COMPATIBLE_VIDEO_CODECS and info['pix_fmt'] in (None, 'yuv420p')
+    audio_ok = info['audio_codec'] is None or info['audio_codec'] in COMPATIBLE_AUDIO_CODECS
+    print(f"🔍 Probed {video_path}: container={info['container']}, video={info['video_codec']} "
+          f"({info['pix_fmt']}), audio={info['audio_codec']}")
+
+    if is_mp4 and video_ok and audio_ok and video_path.lower().endswith('.mp4'):
+        print("✅ Video already H.264/AAC MP4, no re-encode needed")
+        return video_path
+
+    base_path = os.path.splitext(video_path)[0]
+    target_path = base_path + '.mp4'
+    fixed_path = base_path + '_compatible.mp4'
+
+    video_args = ['-c:v', 'copy'] if video_ok else video_encode_args()
+    audio_args = ['-c:a', 'copy'] if audio_ok else audio_encode_args()
+    if video_ok and audio_ok:
+        print("🔧 Codecs compatible, remuxing into MP4 with stream copy...")
+    elif video_ok:
+        print("🔧 Copying H.264 video, re-encoding audio to AAC for compatibility...")
+    else:
+        print(f"🔧 Re-encoding video for compatibility (preset {ENCODE_SETTINGS['preset']})...")
+
+    try:
+        run_ffmpeg(['-i', video_path, '-map', '0:v:0', '-map', '0:a:0?', *video_args, *audio_args,
+                    '-movflags', '+faststart', fixed_path])
+    except Exception:
+        if os.path.exists(fixed_path):
+            os.remove(fixed_path)  # Clean up failed attempt
+        raise
+
+    os.remove(video_path)
+    os.replace(fixed_path, target_path)
+    print(f"✅ Video made compatible: {target_path}")
+    return target_path
 
 def download_video(url, out_dir="downloads"):
     os.makedirs(out_dir, exist_ok=True)
@@ -45,8 +182,9 @@ def download_video(url, out_dir="downloads"):
     ydl_opts = {
         "outtmpl": f"{out_dir}/{safe_title}.%(ext)s",
         "format": "best[ext=mp4]/best[height<=720]/best",  # Prefer mp4, limit quality for compatibility
+        # Remux only; ensure_compatible_mp4 decides whether any re-encode is needed
         "postprocessors": [{
-            "key": "FFmpegVideoConvertor",
+            "key": "FFmpegVideoRemuxer",
             "preferedformat": "mp4"
         }],
         "writesubtitles": False,
@@ -57,11 +195,15 @@ def download_video(url, out_dir="downloads"):
         info = ydl.extract_info(url, download=True)
         # Find the actual downloaded file instead of relying on title
         import glob
+        expected_file = os.path.join(out_dir, f"{safe_title}.mp4")
         pattern = os.path.join(out_dir, "*.mp4")
         files = glob.glob(pattern)
         
         downloaded_file = None
-        if files:
+        if os.path.exists(expected_file):
+            # Prefer this video's own file; other batch downloads may be landing in the same folder
+            downloaded_file = expected_file
+        elif files:
             # Return the most recently modified file
             downloaded_file = max(files, key=os.path.getmtime)
         else:
@@ -69,47 +211,80 @@ def download_video(url, out_dir="downloads"):
             fallback_ext = info.get('ext', 'mp4')
             downloaded_file = os.path.join(out_dir, f"{safe_title}.{fallback_ext}")
         
-        # Always re-encode downloaded videos for maximum compatibility
+        # Only re-encode when the download isn't already H.264/AAC in MP4
         if downloaded_file and os.path.exists(downloaded_file):
-            print(f"🔧 Re-encoding video for maximum compatibility...")
-            fixed_path = downloaded_file.replace('.mp4', '_compatible.mp4')
             try:
-                # Load and re-encode the video with standard settings
-                clip = VideoFileClip(downloaded_file)
-                clip.write_videofile(
-                    fixed_path, 
-                    codec='libx264', 
-                    audio_codec='aac',
-                    temp_audiofile='temp-audio.m4a',
-                    remove_temp=True
-                )
-                clip.close()
-                
-                # Remove original file and rename compatible version
-                os.remove(downloaded_file)
-                os.rename(fixed_path, downloaded_file)
-                print(f"✅ Video re-encoded for compatibility: {downloaded_file}")
-                return downloaded_file
-                
-            except Exception as re_encode_error:
-                print(f"⚠️  Re-encoding failed: {re_encode_error}")
-                # If re-encoding fails, try to return original file
-                if os.path.exists(fixed_path):
-                    os.remove(fixed_path)  # Clean up failed attempt
+                return ensure_compatible_mp4(downloaded_file)
+            except Exception as compat_error:
+                print(f"⚠️  Compatibility conversion failed: {compat_error}")
                 print(f"⚠️  Using original file (may have playback issues): {downloaded_file}")
                 return downloaded_file
-        
+
         return downloaded_file
 
-def split_video(video_path, out_dir="output", clip_length=60):
+def split_video(video_path, out_dir="output", clip_length=60, mode="accurate", max_workers=None):
+    """
+    Split a video into clip_length-second clips
+
+    Args:
+        video_path: Path to input video
+        out_dir: Folder for clip_<n>.mp4 files
+        clip_length: Clip length in seconds
+        mode: "fast" stream-copies and cuts on the first keyframe at or after each
+            boundary (no encode, clips may run slightly long); "accurate" cuts exactly
+            and encodes the clips in parallel, one ffmpeg process each
+        max_workers: Parallel encodes in accurate mode (default: CPU count)
+
+    Returns:
+        list: Clip paths in order
+    """
     os.makedirs(out_dir, exist_ok=True)
-    clip = VideoFileClip(video_path)
-    duration = int(clip.duration)
-    parts = []
+    if mode == "fast":
+        return _split_video_stream_copy(video_path, out_dir, clip_length)
+    if mode != "accurate":
+        raise ValueError(f"Unknown split mode '{mode}', use 'fast' or 'accurate'")
+
+    from concurrent.futures import ThreadPoolExecutor
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+    duration = int(ffmpeg_parse_infos(video_path)['duration'])
+    jobs = []
     for start in range(0, duration, clip_length):
         end = min(start + clip_length, duration)
-        subclip = clip.subclipped(start, end)
         out_path = os.path.join(out_dir, f"clip_{start//clip_length + 1}.mp4")
-        subclip.write_videofile(out_path, codec="libx264", audio_codec="aac")
-        parts.append(out_path)
-    return parts
+        jobs.append((start, end, out_path))
+    if not jobs:
+        return []
+
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(jobs)))
+    # Share the cores between the concurrent x264 encoders instead of oversubscribing
+    threads_per_encode = max(1, (os.cpu_count() or 1) // workers)
+    print(f"✂️  Encoding {len(jobs)} clips with {workers} parallel ffmpeg processes...")
+
+    def encode_clip(job):
+        start, end, out_path = job
+        # -ss before -i seeks to the nearest keyframe, then decodes up to the exact start
+        run_ffmpeg(['-ss', str(start), '-i', video_path, '-t', str(end - start),
+                    '-map', '0:v:0', '-map', '0:a:0?', *video_encode_args(), '-threads', str(threads_per_encode),
+                    *audio_encode_args(), '-movflags', '+faststart', out_path])
+        return out_path
+
+    # Each clip is its own ffmpeg process, so threads here only wait on subprocesses
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(encode_clip, jobs))
+
+
+def _split_video_stream_copy(video_path, out_dir, clip_length):
+    """Split on GOP boundaries with ffmpeg's segment muxer, copying both streams"""
+    pattern = os.path.join(out_dir, "clip_%d.mp4")
+    list_path = os.path.join(out_dir, f"clip_list_{os.getpid()}.txt")
+    print(f"✂️  Splitting into ~{clip_length}s clips on keyframes (stream copy)...")
+    try:
+        run_ffmpeg(['-i', video_path, '-map', '0:v:0', '-map', '0:a:0?', '-c', 'copy',
+                    '-f', 'segment', '-segment_time', str(clip_length), '-segment_start_number', '1',
+                    '-reset_timestamps', '1', '-segment_list', list_path, '-segment_list_type', 'flat', pattern])
+        with open(list_path, encoding="utf-8") as f:
+            return [os.path.join(out_dir, os.path.basename(line.strip())) for line in f if line.strip()]
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
@@ -1,42 +1,502 @@
-from faster_whisper import WhisperModel
+import bisect
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+from .cache_tools import TranscriptCache, media_fingerprint
+from .video_tools import probe_media, run_ffmpeg
+
+# Whisper model configuration, overridable from the environment so batch hosts
+# can size the model to their cores (e.g. WHISPER_COMPUTE_TYPE=int8)
+WHISPER_MODEL_SIZE = os.environ.get("WHISPER_MODEL_SIZE", "base")
+WHISPER_DEVICE = os.environ.get("WHISPER_DEVICE", "cpu")
+WHISPER_COMPUTE_TYPE = os.environ.get("WHISPER_COMPUTE_TYPE", "default")
+WHISPER_CPU_THREADS = int(os.environ.get("WHISPER_CPU_THREADS", "0"))  # 0 = ctranslate2 default
+# Transcriptions the shared model serves at once; by default one per
+# WHISPER_CPU_THREADS cores (ctranslate2 uses 4 threads per worker when unset)
+WHISPER_NUM_WORKERS = (int(os.environ.get("WHISPER_NUM_WORKERS", "0"))
+                       or max(1, (os.cpu_count() or 1) // (WHISPER_CPU_THREADS or 4)))
+
+# Whisper's input format: audio is decoded straight to this, so faster-whisper does not resample
+WHISPER_SAMPLE_RATE = 16000
+
+# Audio at least this long is split on silence (Silero VAD) and the chunks are
+# transcribed in parallel, WHISPER_NUM_WORKERS at a time, on the shared model
+WHISPER_CHUNK_THRESHOLD = float(os.environ.get("WHISPER_CHUNK_THRESHOLD", "300"))
+# Longest chunk handed to Whisper; speech is only ever cut in a pause
+WHISPER_CHUNK_SECONDS = float(os.environ.get("WHISPER_CHUNK_SECONDS", "120"))
+# Pauses longer than this are never transcribed, even inside a chunk
+WHISPER_MAX_CHUNK_GAP = 5.0
+
+# Without a language, it is detected once from speech in this opening stretch
+# and then fixed for the whole decode
+LANGUAGE_DETECTION_SCAN_SECONDS = 120
+
+# Whisper windows decoded together by transcribe_batch
+WHISPER_BATCH_SIZE = int(os.environ.get("WHISPER_BATCH_SIZE", "8"))
+# Whisper's fixed input window; batched clips are cut to at most this in pauses
+WHISPER_WINDOW_SECONDS = 30
+
+# Process-wide model registry keyed by (model size, compute_type, cpu_threads, num_workers)
+_MODEL_CACHE = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+
+# Set TRANSCRIPT_CACHE=0 to always run Whisper
+TRANSCRIPT_CACHE_ENABLED = os.environ.get("TRANSCRIPT_CACHE", "1") != "0"
+_transcript_cache = None
+
+
+def _model_key(model_size=None, compute_type=None, cpu_threads=None, num_workers=None):
+    return (
+        model_size or WHISPER_MODEL_SIZE,
+        compute_type or WHISPER_COMPUTE_TYPE,
+        WHISPER_CPU_THREADS if cpu_threads is None else cpu_threads,
+        num_workers or WHISPER_NUM_WORKERS,
+    )
+
+
+def get_whisper_model(model_size=None, compute_type=None, cpu_threads=None, num_workers=None):
+    """
+    Get a cached WhisperModel, loading it on first use
+
+    Models are shared by every caller in the process, so weights are read from
+    disk and ctranslate2 is initialised once per configuration.
+
+    Args:
+        model_size: Whisper model size (default: WHISPER_MODEL_SIZE)
+        compute_type: ctranslate2 compute type, e.g. "int8" (default: WHISPER_COMPUTE_TYPE)
+        cpu_threads: Threads per worker, 0 for the ctranslate2 default (default: WHISPER_CPU_THREADS)
+        num_workers: Parallel transcriptions the model can serve (default: WHISPER_NUM_WORKERS)
+
+    Returns:
+        WhisperModel: Loaded model
+    """
+    key = _model_key(model_size, compute_type, cpu_threads, num_workers)
+    with _MODEL_CACHE_LOCK:
+        model = _MODEL_CACHE.get(key)
+        if model is None:
+            size, ctype, threads, workers = key
+            print(f"🔧 Loading Whisper model '{size}' ({ctype}, cpu_threads={threads}, num_workers={workers})...")
+            model = WhisperModel(
+                size,
+                device=WHISPER_DEVICE,
+                compute_type=ctype,
+                cpu_threads=threads,
+                num_workers=workers,
+            )
+            _MODEL_CACHE[key] = model
+        return model
+
+
+def warmup_whisper_model(model_size=None, compute_type=None, cpu_threads=None, num_workers=None):
+    """
+    Load a model ahead of time so the first transcription does not pay for it
+
+    Runs one decode over a second of silence so ctranslate2 has allocated its
+    buffers before real work arrives.
+
+    Returns:
+        WhisperModel: Loaded model
+    """
+    model = get_whisper_model(model_size, compute_type, cpu_threads, num_workers)
+    segments, _ = model.transcribe(np.zeros(16000, dtype=np.float32), language="en")
+    list(segments)
+    return model
+
+
+def evict_whisper_model(model_size=None, compute_type=None, cpu_threads=None, num_workers=None):
+    """
+    Drop a cached model so its memory can be reclaimed
+
+    Returns:
+        bool: True if a model was evicted
+    """
+    key = _model_key(model_size, compute_type, cpu_threads, num_workers)
+    with _MODEL_CACHE_LOCK:
+        return _MODEL_CACHE.pop(key, None) is not None
+
+
+def clear_whisper_models():
+    """Drop every cached model"""
+    with _MODEL_CACHE_LOCK:
+        _MODEL_CACHE.clear()
+
+
+def _get_transcript_cache():
+    global _transcript_cache
+    if _transcript_cache is None and TRANSCRIPT_CACHE_ENABLED:
+        _transcript_cache = TranscriptCache()
+    return _transcript_cache
+
+
+def extract_audio_pcm(media_path):
+    """
+    Decode the first audio stream of a file to Whisper's input format
+
+    ffmpeg resamples to 16 kHz mono float32 and pipes the samples straight
+    into a NumPy buffer, so no WAV is written and faster-whisper has nothing
+    left to convert.
+
+    Args:
+        media_path: Path to audio or video file
+
+    Returns:
+        numpy.ndarray: float32 samples at WHISPER_SAMPLE_RATE, or None if the file has no audio
+    """
+    if probe_media(media_path)['audio_codec'] is None:
+        return None
+    raw = run_ffmpeg(['-i', media_path, '-map', '0:a:0', '-vn', '-ac', '1', '-ar', str(WHISPER_SAMPLE_RATE),
+                      '-f', 'f32le', '-'])
+    return np.frombuffer(raw, dtype='<f4')
+
+
+def detect_language(audio, model=None):
+    """
+    Detect the spoken language from the first 30 seconds of speech
+
+    Silence and music at the start are skipped with VAD, looking no further
+    than LANGUAGE_DETECTION_SCAN_SECONDS into the audio.
+
+    Args:
+        audio: float32 samples at WHISPER_SAMPLE_RATE
+        model: WhisperModel to use (default: the shared model)
+
+    Returns:
+        tuple: (language code, probability)
+    """
+    model = model or get_whisper_model()
+    head = audio[:int(LANGUAGE_DETECTION_SCAN_SECONDS * WHISPER_SAMPLE_RATE)]
+    language, probability, _ = model.detect_language(head, vad_filter=True)
+    return language, probability
+
+
+def audio_fingerprint(media_path):
+    """
+    Content fingerprint of the audio Whisper transcribes
+
+    Hashes the packets of the first audio stream, stream-copied by ffmpeg
+    without decoding, so a remuxed download or the same audio in another
+    container (MKV, MOV, WebM) still hits the transcript cache. A re-encoded
+    copy does not. Files without audio fall back to media_fingerprint().
+    Results are remembered per path, size and modification time.
+    """
+    stat = os.stat(media_path)
+    return _audio_fingerprint(os.path.abspath(media_path), stat.st_size, stat.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=256)
+def _audio_fingerprint(media_path, size, mtime_ns):
+    if probe_media(media_path)['audio_codec'] is None:
+        return media_fingerprint(media_path)
+    output = run_ffmpeg(['-i', media_path, '-map', '0:a:0', '-c', 'copy', '-f', 'hash', '-hash', 'sha256', '-'])
+    return output.decode('ascii').strip()
+
+
+def _transcript_key(audio_path, language=None, mode='sequential'):
+    # Batched decodes see fixed windows and no previous-text context, so their segments differ from
+    # iter_segments' and the two are cached apart
+    size, compute_type, _, _ = _model_key()
+    return TranscriptCache.make_key(
+        audio_fingerprint(audio_path), model_size=size, compute_type=compute_type, language=language, mode=mode
+    )
+
+
+def has_cached_transcript(audio_path, language=None):
+    """True if iter_segments would answer from the transcript cache without decoding the audio"""
+    cache = _get_transcript_cache()
+    return cache is not None and cache.contains(_transcript_key(audio_path, language))
+
+
+def iter_segments(audio_path, language=None, audio=None, detected=None):
+    """
+    Yield timestamped segments as Whisper finishes them, reusing cached results
+
+    faster-whisper decodes lazily, so the first segment is available long
+    before the file is done; utils.streaming_pipeline translates and speaks
+    segments while the rest are still being decoded.
+
+    Results are cached by a fingerprint of the audio stream plus the model and
+    language settings, so a rerun (or a second stage asking for the same
+    audio) does not decode it again. A transcript is only cached once every
+    segment has been consumed. On a miss the audio is decoded through an
+    ffmpeg pipe (see extract_audio_pcm) unless the caller already has it.
+
+    Without a language, it is detected from the opening speech (see
+    detect_language) and fixed for the rest of the decode.
+
+    Args:
+        audio_path: Path to audio or video file
+        language: Language code, or None to detect it
+        audio: audio_path already decoded by extract_audio_pcm (optional)
+        detected: Dict that receives the source language under 'language'
+            before the first segment is yielded (optional)
+
+    Yields:
+        dict: Segment with 'start', 'end', 'text' keys
+    """
+    detected = {} if detected is None else detected
+    detected['language'] = language
+    cache = _get_transcript_cache()
+    key = None
+    if cache is not None:
+        key = _transcript_key(audio_path, language)
+        entry = cache.get(key)
+        if entry is not None:
+            print(f"🗄️  Transcript cache hit for {audio_path}")
+            detected['language'] = entry.get('language') or language
+            yield from entry['segments']
+            return
+
+    if audio is None:
+        audio = extract_audio_pcm(audio_path)
+    if audio is None or not len(audio):
+        print(f"⚠️  No audio in {audio_path}, nothing to transcribe")
+        return
+
+    model = get_whisper_model()
+    if language is None:
+        language, probability = detect_language(audio, model)
+        print(f"🌐 Detected language '{language}' ({probability:.0%}), fixed for the rest of the decode")
+    detected['language'] = language
+
+    if len(audio) >= WHISPER_CHUNK_THRESHOLD * WHISPER_SAMPLE_RATE:
+        segments, info = transcribe_chunked(model, audio, language=language)
+    else:
+        segments, info = model.transcribe(audio, language=language)
+
+    subtitle_segments = []
+    for segment in segments:
+        subtitle_segment = {
+            'start': segment.start,
+            'end': segment.end,
+            'text': segment.text.strip()
+        }
+        subtitle_segments.append(subtitle_segment)
+        yield subtitle_segment
+
+    if cache is not None:
+        cache.put(key, subtitle_segments, info.language)
+
+
+def split_on_silence(audio, max_chunk_seconds=WHISPER_CHUNK_SECONDS, max_gap_seconds=WHISPER_MAX_CHUNK_GAP):
+    """
+    Find the speech in audio with Silero VAD and group it into chunks
+
+    Neighbouring speech regions are merged while the chunk stays under
+    max_chunk_seconds and the pause between them is short, so each Whisper
+    call still gets some context. Longer pauses fall between chunks and are
+    never transcribed.
+
+    Args:
+        audio: float32 samples at WHISPER_SAMPLE_RATE
+
+    Returns:
+        list: (start, end) sample offsets of each chunk, in order
+    """
+    options = VadOptions(min_silence_duration_ms=500, max_speech_duration_s=max_chunk_seconds)
+    max_length = int(max_chunk_seconds * WHISPER_SAMPLE_RATE)
+    max_gap = int(max_gap_seconds * WHISPER_SAMPLE_RATE)
+
+    chunks = []
+    for region in get_speech_timestamps(audio, options, sampling_rate=WHISPER_SAMPLE_RATE):
+        if chunks and region['start'] - chunks[-1][1] <= max_gap and region['end'] - chunks[-1][0] <= max_length:
+            chunks[-1] = (chunks[-1][0], region['end'])
+        else:
+            chunks.append((region['start'], region['end']))
+    return chunks
+
+
+def transcribe_chunked(model, audio, language=None, max_workers=None):
+    """
+    Transcribe long audio as silence-separated chunks, several at once
+
+    WhisperModel serves num_workers transcriptions in parallel, so the chunks
+    go to a thread pool of that size. Without a language the first chunk is
+    transcribed alone and its detected language is used for the rest, so
+    every chunk decodes the same way; with one, every chunk is submitted at
+    once.
+
+    Args:
+        model: WhisperModel loaded with num_workers >= max_workers
+        audio: float32 samples at WHISPER_SAMPLE_RATE
+        language: Language code, or None to detect it from the first chunk
+        max_workers: Chunks transcribed at once (default: WHISPER_NUM_WORKERS, the
+            shared model's num_workers)
+
+    Returns:
+        tuple: (iterator of segments with timestamps in the whole file, info with the language)
+    """
+    chunks = split_on_silence(audio)
+    duration = len(audio) / WHISPER_SAMPLE_RATE
+    speech = sum(end - start for start, end in chunks) / WHISPER_SAMPLE_RATE
+    workers = max(1, min(max_workers or WHISPER_NUM_WORKERS, len(chunks)))
+    print(f"✂️  {duration:.0f}s of audio split into {len(chunks)} chunks ({speech:.0f}s of speech), "
+          f"{workers} transcribed at a time")
+    if not chunks:
+        return iter(()), SimpleNamespace(language=language)
+
+    def transcribe_chunk(chunk, chunk_language):
+        start, end = chunk
+        segments, info = model.transcribe(audio[start:end], language=chunk_language)
+        offset = start / WHISPER_SAMPLE_RATE
+        return [SimpleNamespace(start=segment.start + offset, end=segment.end + offset, text=segment.text)
+                for segment in segments], info
+
+    info, first_segments, pending = SimpleNamespace(language=language), [], chunks
+    if language is None:
+        first_segments, info = transcribe_chunk(chunks[0], None)
+        language, pending = info.language, chunks[1:]
+
+    def stitched():
+        yield from first_segments
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map() returns chunks in order, so the stitched timestamps keep increasing
+            for segments, _ in executor.map(lambda chunk: transcribe_chunk(chunk, language), pending):
+                yield from segments
+
+    return stitched(), info
+
+
+def transcribe_segments(audio_path, language=None, audio=None, detected=None):
+    """
+    Transcribe an audio or video file into timestamped segments, reusing cached results
+
+    Args:
+        audio_path: Path to audio or video file
+        language: Language code, or None to detect it
+        audio: audio_path already decoded by extract_audio_pcm (optional)
+        detected: Dict that receives the source language under 'language' (optional)
+
+    Returns:
+        list: List of dicts with 'start', 'end', 'text' keys
+    """
+    return list(iter_segments(audio_path, language=language, audio=audio, detected=detected))
+
+
+def transcribe_batch(audios, language=None, batch_size=WHISPER_BATCH_SIZE, pipeline=None):
+    """
+    Transcribe many short buffers together on one loaded model
+
+    Each buffer is cut in its pauses into windows of at most 30 seconds, and
+    the windows of every buffer are decoded batch_size at a time by
+    faster-whisper's BatchedInferencePipeline, so a batch of Shorts pays for
+    one model and a few large decodes instead of a full call per clip.
+    Without a language each buffer's language is detected on its own, and
+    buffers are batched with others of the same language.
+
+    Args:
+        audios: float32 buffers at WHISPER_SAMPLE_RATE (see extract_audio_pcm)
+        language: Language code, or None to detect it per buffer
+        batch_size: Windows decoded together
+        pipeline: BatchedInferencePipeline to use (default: one over the shared model)
+
+    Returns:
+        list: Per buffer, a (segments, language) tuple: a list of dicts with 'start',
+            'end', 'text' keys and the language it was decoded as (None without audio)
+    """
+    pipeline = pipeline or BatchedInferencePipeline(get_whisper_model())
+    results = [[] for _ in audios]
+    languages = [None for _ in audios]
+    groups = {}
+    for i, audio in enumerate(audios):
+        if audio is None or not len(audio):
+            continue
+        languages[i] = language or detect_language(audio, pipeline.model)[0]
+        groups.setdefault(languages[i], []).append(i)
+
+    for group_language, indexes in groups.items():
+        print(f"📚 Transcribing {len(indexes)} clips ({group_language}) in batches of {batch_size}...")
+        # One buffer holding every clip, a second of silence apart so no window spans two clips
+        gap = np.zeros(WHISPER_SAMPLE_RATE, dtype=np.float32)
+        offsets, windows, parts, position = [], [], [], 0
+        for i in indexes:
+            offsets.append(position / WHISPER_SAMPLE_RATE)
+            for start, end in split_on_silence(audios[i], max_chunk_seconds=WHISPER_WINDOW_SECONDS):
+                windows.append({'start': (position + start) / WHISPER_SAMPLE_RATE,
+                                'end': (position + end) / WHISPER_SAMPLE_RATE})
+            parts += [audios[i], gap]
+            position += len(audios[i]) + len(gap)
+        if not windows:
+            continue
+
+        segments, _ = pipeline.transcribe(np.concatenate(parts), language=group_language, clip_timestamps=windows,
+                                          batch_size=batch_size)
+        for segment in segments:
+            n = max(bisect.bisect_right(offsets, segment.start + 0.01) - 1, 0)
+            results[indexes[n]].append({
+                'start': round(segment.start - offsets[n], 3),
+                'end': round(segment.end - offsets[n], 3),
+                'text': segment.text.strip()
+            })
+    return list(zip(results, languages))
+
+
+def transcribe_files(paths, language=None, batch_size=WHISPER_BATCH_SIZE):
+    """
+    Transcribe many short audio or video files with transcribe_batch, reusing cached results
+
+    Returns:
+        list: Per path, a list of dicts with 'start', 'end', 'text' keys
+    """
+    cache = _get_transcript_cache()
+    keys, results = [], []
+    for path in paths:
+        key = None
+        entry = None
+        if cache is not None:
+            key = _transcript_key(path, language, mode='batched')
+            entry = cache.get(key)
+        keys.append(key)
+        results.append(entry['segments'] if entry is not None else None)
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    print(f"🗄️  {len(paths) - len(missing)} of {len(paths)} transcripts cached")
+    if missing:
+        # ffmpeg decodes run as subprocesses, so a few at once keep the model fed
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            audios = list(executor.map(extract_audio_pcm, [paths[i] for i in missing]))
+        for i, (segments, clip_language) in zip(missing, transcribe_batch(audios, language=language,
+                                                                           batch_size=batch_size)):
+            results[i] = segments
+            if cache is not None:
+                # The detected language, so a later cache hit can still skip translating Chinese
+                cache.put(keys[i], segments, clip_language)
+    return results
+
+
+def segments_to_text(segments):
+    """Join segment texts into one transcript string"""
+    return " ".join(seg['text'] for seg in segments).strip()
+
 
 def transcribe_audio(video_path):
     """
     Transcribe audio from video and return full text
-    
+
     Args:
         video_path: Path to video file
-    
+
     Returns:
         str: Full transcribed text
     """
-    model = WhisperModel("base", device="cpu")
-    segments, _ = model.transcribe(video_path)
-    text = " ".join([seg.text for seg in segments])
-    return text.strip()
+    return segments_to_text(transcribe_segments(video_path))
 
 
-def transcribe_with_timestamps(video_path, language="zh"):
+def transcribe_with_timestamps(video_path, language=None):
     """
     Transcribe audio from video and return segments with timestamps
-    
+
     Args:
         video_path: Path to video file
-        language: Language code (default: "zh" for Chinese)
-    
+        language: Language code, or None to detect it from the opening speech
+
     Returns:
         list: List of dicts with 'start', 'end', 'text' keys
     """
-    model = WhisperModel("base", device="cpu")
-    segments, info = model.transcribe(video_path, language=language)
-    
-    subtitle_segments = []
-    for segment in segments:
-        subtitle_segments.append({
-            'start': segment.start,
-            'end': segment.end,
-            'text': segment.text.strip()
-        })
-    
-    return subtitle_segments
-
+    return transcribe_segments(video_path, language=language)